@@ -0,0 +1,79 @@
+"""Планы и время выполнения запросов таблицы до и после добавления индексов.
+
+Запуск: python -m benchmarks.query_plans [--rows 200000]
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import sqlalchemy as sa
+from data import db_session
+from data.queries import ItemFilter, query_items
+
+CASES = {
+    'по умолчанию': ItemFilter(),
+    'категория': ItemFilter(category='category_7'),
+    'цена по возрастанию': ItemFilter(sort='price'),
+    'сначала новые': ItemFilter(sort='date', descending=True),
+    'период': ItemFilter(start_date=datetime.date(2023, 3, 1), end_date=datetime.date(2023, 3, 7)),
+}
+
+
+def fill(session, rows, categories=20) -> None:
+    """Заполнение базы случайными записями"""
+    session.execute(sa.text('INSERT INTO categories (id, name) VALUES (:id, :name)'),
+                    [{'id': i, 'name': f'category_{i}'} for i in range(1, categories + 1)])
+    start = datetime.date(2022, 1, 1)
+    session.execute(
+        sa.text('INSERT INTO items (name, price, purchase_date, category_id) VALUES (:name, :price, :date, :category)'),
+        [{'name': f'item {i}', 'price': round(random.uniform(1, 10000), 2),
+          'date': start + datetime.timedelta(days=random.randrange(730)), 'category': random.randint(1, categories)}
+         for i in range(rows)])
+    session.commit()
+
+
+def report(session, title) -> None:
+    """Вывод плана и времени выполнения каждого запроса"""
+    print(f'=== {title} ===')
+    for name, items_filter in CASES.items():
+        query = query_items(session, items_filter).limit(100)
+        compiled = query.statement.compile(session.get_bind(), compile_kwargs={'literal_binds': True})
+        plan = session.execute(sa.text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+        started = time.perf_counter()
+        query.all()
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f'{name}: {elapsed:.2f} мс')
+        for row in plan:
+            print('    ', row[-1])
+        session.expunge_all()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_session.global_init(os.path.join(tmp_dir, 'bench.db'))
+        session = db_session.create_session()
+        indexes = session.execute(sa.text("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                          "AND name LIKE 'ix_%'")).scalars().all()
+        for index in indexes:  # схема до миграции
+            session.execute(sa.text(f'DROP INDEX {index}'))
+        session.execute(sa.text('PRAGMA user_version = 0'))
+        fill(session, args.rows)
+        report(session, 'без индексов')
+        session.close()
+        from data import migrations
+        engine = session.get_bind()
+        migrations.upgrade(engine)
+        engine.dispose()  # соединения из пула хранят подготовленные запросы со старыми планами
+        session = db_session.create_session()
+        report(session, 'с индексами')
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Воспроизведение сценария действий главного окна без дисплея (python main.py --replay SCRIPT --db bench.db).
+
+Сценарий - JSON-список шагов вида {"action": "search", "text": "кофе"}. Шаги выполняются через те же слоты
+и формы, что и нажатия пользователя; после каждого шага дожидаемся фоновых запросов и выгрузки файла.
+Пример сценария - benchmarks/replay.json.
+"""
+import json
+import time
+
+from PyQt5.QtCore import QDate, Qt
+from PyQt5.QtWidgets import QApplication
+from data.queries import ItemFilter
+from ui.table_model import CHECK_COLUMN
+
+SCRIPT = 'benchmarks/replay.json'
+FILTER_ORDERS = {
+    ('price', False): 'по возрастанию', ('price', True): 'по убыванию',
+    ('date', False): 'сначала старые', ('date', True): 'сначала новые',
+}  # (сортировка, по убыванию) -> пункт списка FilterForm
+
+
+def search(notebook, text='') -> None:
+    notebook.search_bar.setText(text)
+    notebook.to_search()
+
+
+def apply_filter(notebook, category=None, sort=None, descending=False, start=None, end=None) -> None:
+    """Фильтр через FilterForm: категория, сортировка price/date или период start-end (даты ISO)"""
+    notebook.to_filter()
+    form = notebook.new_window
+    if category is not None:
+        form.for_category.setChecked(True)
+        form.category_box.setCurrentText(category)
+    elif sort is not None:
+        (form.for_price if sort == 'price' else form.for_date).setChecked(True)
+        (form.price_box if sort == 'price' else form.date_box).setCurrentText(FILTER_ORDERS[sort, descending])
+    elif start is not None:
+        form.for_period.setChecked(True)
+        form.start_date.setDate(QDate.fromString(start, Qt.ISODate))
+        form.end_date.setDate(QDate.fromString(end or start, Qt.ISODate))
+    form.add_filter()
+
+
+def reset(notebook) -> None:
+    notebook.search_bar.setText('')
+    notebook.init_table(ItemFilter())
+
+
+def add(notebook, name, category, price, date=None, about='') -> None:
+    """Добавление записи через ItemAction (date - ISO, по умолчанию сегодня)"""
+    notebook.to_add_item()
+    form = notebook.new_window
+    form.name_line.setText(name)
+    form.category_line.setText(category)
+    form.price_line.setValue(price)
+    form.date_line.setDate(QDate.fromString(date, Qt.ISODate) if date else QDate.currentDate())
+    form.about_line.setPlainText(about)
+    form.add_item()
+
+
+def delete(notebook, count=1) -> None:
+    """Удаление первых count строк таблицы"""
+    model = notebook.table_model
+    model.set_all_checked(False)
+    for row in range(min(count, model.rowCount())):
+        model.setData(model.index(row, CHECK_COLUMN), Qt.Checked, Qt.CheckStateRole)
+    notebook.to_delete_item()
+
+
+def undo(notebook) -> None:
+    notebook.to_undo_delete()
+
+
+def scroll(notebook, pages=1) -> None:
+    """Чтение следующих страниц таблицы, как при прокрутке"""
+    for _ in range(pages):
+        if not notebook.table_model.canFetchMore():
+            return
+        notebook.table_model.fetchMore()
+        notebook.executor.wait()
+
+
+def export(notebook, format='csv') -> None:
+    notebook.export_format.setCurrentIndex(notebook.export_format.findData(format))
+    notebook.to_get_file()
+    notebook.export_worker.wait()
+
+
+ACTIONS = {
+    'search': search,
+    'filter': apply_filter,
+    'reset': reset,
+    'add': add,
+    'delete': delete,
+    'undo': undo,
+    'scroll': scroll,
+    'export': export,
+}  # шаг сценария -> функция (остальные ключи шага - её аргументы)
+
+
+def load_steps(path) -> list:
+    """Шаги сценария из файла JSON с проверкой названий действий"""
+    with open(path, encoding='utf-8') as file:
+        steps = json.load(file)
+    if not isinstance(steps, list):
+        raise ValueError('Сценарий должен быть списком шагов')
+    for number, step in enumerate(steps, 1):
+        action = step.get('action') if isinstance(step, dict) else None
+        if action not in ACTIONS:
+            raise ValueError(f'Шаг {number}: неизвестное действие {action!r}')
+    return steps
+
+
+def replay(notebook, steps, log=None) -> list:
+    """Выполнение шагов; возвращает время каждого шага в мс (с ожиданием фоновой работы)"""
+    timings = []
+    QApplication.processEvents()  # первая загрузка таблицы начинается после отрисовки окна
+    notebook.executor.wait()
+    for step in steps:
+        arguments = {key: value for key, value in step.items() if key != 'action'}
+        started = time.perf_counter()
+        ACTIONS[step['action']](notebook, **arguments)
+        notebook.executor.wait()
+        QApplication.processEvents()  # сигналы об изменениях и готовности файла
+        notebook.executor.wait()
+        timings.append((time.perf_counter() - started) * 1000)
+        if log is not None:
+            log(f'{step["action"]}: {timings[-1]:.1f} мс')
+    return timings
@@ -0,0 +1,70 @@
+"""Время поиска при вводе по триграммному индексу и без него.
+
+Запуск: python -m benchmarks.search [--rows 1000000] [--text "молоко"]
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import sqlalchemy as sa
+from data import db_session
+from data.items import Item
+from data.queries import ItemFilter, apply_filter
+
+WORDS = ('молоко', 'хлеб', 'сыр', 'кофе', 'чай', 'билет', 'кино', 'такси', 'книга', 'подарок', 'обед', 'ужин',
+         'бензин', 'лекарства', 'телефон', 'зарядка', 'кроссовки', 'куртка', 'шампунь', 'корм')
+
+
+def fill(session, rows, categories=20) -> None:
+    """Заполнение базы записями со случайными названиями из WORDS"""
+    session.execute(sa.text('INSERT INTO categories (id, name) VALUES (:id, :name)'),
+                    [{'id': i, 'name': f'category_{i}'} for i in range(1, categories + 1)])
+    start = datetime.date(2022, 1, 1)
+    connection = session.connection()
+    for offset in range(0, rows, 100_000):
+        connection.exec_driver_sql(
+            'INSERT INTO items (name, about, price, purchase_date, category_id) VALUES (?, ?, ?, ?, ?)',
+            [(f'{random.choice(WORDS)} {random.choice(WORDS)} {i}', random.choice(WORDS),
+              round(random.uniform(1, 10000), 2), (start + datetime.timedelta(days=random.randrange(730))).isoformat(),
+              random.randint(1, categories)) for i in range(offset, min(rows, offset + 100_000))])
+    session.commit()
+
+
+def measure(session, text, indexed) -> list:
+    """Время запроса id найденных записей для каждого набранного префикса text, мс"""
+    timings = []
+    for length in range(1, len(text) + 1):
+        statement = apply_filter(sa.select(Item.id), ItemFilter(search=text[:length]))
+        if not indexed:  # прежний поиск перебором всех названий
+            pattern = text[:length].casefold()
+            statement = sa.select(Item.id).where(sa.func.casefold(Item.name).contains(pattern, autoescape=True)) \
+                .order_by(Item.id.desc())
+        started = time.perf_counter()
+        found = len(session.execute(statement).all())
+        timings.append((text[:length], found, (time.perf_counter() - started) * 1000))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--text', default='кроссовки 12345')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_session.global_init(os.path.join(tmp_dir, 'bench.db'))
+        session = db_session.create_session()
+        started = time.perf_counter()
+        fill(session, args.rows)
+        print(f'Заполнение и индексация {args.rows} записей: {time.perf_counter() - started:.1f} с')
+        for title, indexed in (('перебор', False), ('индекс', True)):
+            print(f'=== {title} ===')
+            for prefix, found, elapsed in measure(session, args.text, indexed):
+                print(f'{prefix!r:<20}{found:>9} записей{elapsed:>10.1f} мс')
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
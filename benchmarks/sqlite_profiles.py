@@ -0,0 +1,69 @@
+"""Скорость записи и чтения для каждого профиля настроек SQLite.
+
+Запуск: python -m benchmarks.sqlite_profiles [--commits 500] [--rows 100000] [--dir DIR]
+Каталог --dir стоит указывать на том же диске, где лежит рабочая база: fsync на медленных дисках
+и составляет основную разницу между профилями.
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import sqlalchemy.orm as orm
+from data import db_session, migrations
+from data.catergories import Category
+from data.items import Item
+from data.queries import ItemFilter, query_items
+from benchmarks.query_plans import CASES, fill
+
+
+def measure(directory, profile, commits, rows) -> dict:
+    """Число транзакций и запросов в секунду на новой базе с профилем profile"""
+    engine = db_session.create_engine(os.path.join(directory, f'{profile}.db'), profile)
+    from data import __all_models
+    db_session.SqlAlchemyBase.metadata.create_all(engine)
+    migrations.upgrade(engine)  # поисковый индекс, итоги по месяцам и триггеры, как в global_init
+    session = orm.sessionmaker(bind=engine, expire_on_commit=False)()
+    fill(session, rows)
+
+    category = session.get(Category, 1)
+    started = time.perf_counter()
+    for i in range(commits):  # как при добавлении покупок из формы: одна запись - одна транзакция
+        session.add(Item(name=f'new item {i}', price=round(random.uniform(1, 100), 2),
+                         purchase_date=datetime.date.today(), category=category))
+        session.commit()
+    inserts = commits / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    queries = 0
+    for _ in range(5):
+        for items_filter in CASES.values():
+            query_items(session, items_filter).limit(100).all()
+            queries += 1
+    reads = queries / (time.perf_counter() - started)
+    search_started = time.perf_counter()
+    query_items(session, ItemFilter(search='item 99')).all()
+    search = (time.perf_counter() - search_started) * 1000
+
+    session.close()
+    engine.dispose()
+    return {'inserts': inserts, 'reads': reads, 'search': search}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commits', type=int, default=500, help='число транзакций с одной записью')
+    parser.add_argument('--rows', type=int, default=100_000, help='размер базы для запросов')
+    parser.add_argument('--dir', default=None, help='каталог для временных баз')
+    args = parser.parse_args()
+    print(f'{"профиль":<12}{"транзакций/с":>15}{"запросов/с":>13}{"поиск, мс":>12}')
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        for profile in db_session.PROFILES:
+            result = measure(tmp_dir, profile, args.commits, args.rows)
+            print(f'{profile:<12}{result["inserts"]:>15.0f}{result["reads"]:>13.1f}{result["search"]:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Время запуска приложения: импорт main по -X importtime, создание окна, первая отрисовка и первая страница таблицы.
+
+Запуск: python -m benchmarks.startup [--db FILE] [--rows 10000] [--repeat 5] [--top 15] [--output results.json]
+                                     [--baseline benchmarks/startup_baseline.json] [--save-baseline]
+Каждый замер - отдельный процесс Python с платформой Qt offscreen (файлы модулей уже в кэше ОС).
+Время считается от запуска процесса; код возврата 1 означает, что запуск стал медленнее эталона.
+"""
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'startup_baseline.json')
+CASES = ('python_startup', 'import_main', 'window_created', 'first_paint', 'table_loaded')  # по порядку запуска
+TIMEOUT = 60  # с на ожидание первой страницы таблицы
+
+
+def child(db, spawned) -> dict:
+    """Запуск окна в этом процессе; моменты этапов в мс от запуска процесса (spawned - time.time() родителя)"""
+    started, offset = time.perf_counter(), (time.time() - spawned) * 1000
+    moments = {'python_startup': 0.0}
+
+    def mark(name):
+        if name not in moments:  # только первое наступление этапа
+            moments[name] = (time.perf_counter() - started) * 1000
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import main as app
+    mark('import_main')
+    from PyQt5.QtCore import QEvent, QObject
+    from PyQt5.QtWidgets import QApplication
+    from data import db_session
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, watched, event) -> bool:
+            if event.type() == QEvent.Paint:
+                mark('first_paint')
+            return False
+
+    db_session.global_init(db, app.settings.get('DB_PROFILE', 'default'))
+    app.db_sess = db_session.create_session()
+    qt_app = QApplication(sys.argv[:1])
+    notebook = app.Notebook()
+    mark('window_created')
+    watcher = PaintWatcher()
+    notebook.shopping_list.viewport().installEventFilter(watcher)
+    notebook.table_model.modelReset.connect(lambda: mark('table_loaded'))  # первая страница в модели
+    notebook.show()
+    while not {'first_paint', 'table_loaded'} <= moments.keys() and time.perf_counter() - started < TIMEOUT:
+        qt_app.processEvents()
+        time.sleep(0.001)
+    notebook.executor.wait()
+    return {name: offset + value for name, value in moments.items()}
+
+
+def import_times(stderr) -> dict:
+    """Время импорта main и модулей, впервые импортированных им напрямую, из вывода -X importtime, мс
+
+    Вложенность видна по отступу названия (два пробела на уровень), модуль выводится после своих зависимостей."""
+    times, children = {}, {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():  # заголовок
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative) / 1000
+        elif depth == 0:
+            if name.strip() == 'main':
+                times = {'main': int(cumulative) / 1000, **children}
+            children = {}
+    return times
+
+
+def measure(db, repeat) -> tuple:
+    """Этапы запуска (медиана и минимум по repeat процессам) и среднее время импорта модулей"""
+    runs, modules = collections.defaultdict(list), collections.defaultdict(list)
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'benchmarks.startup', '--child',
+                                  '--db', db, '--spawned', repr(time.time())],
+                                 capture_output=True, text=True, check=True)
+        for name, value in json.loads(process.stdout.splitlines()[-1]).items():
+            runs[name].append(value)
+        for name, value in import_times(process.stderr).items():
+            modules[name].append(value)
+    results = {name: {'median': statistics.median(runs[name]), 'min': min(runs[name]), 'runs': runs[name]}
+               for name in CASES if name in runs}
+    return results, {name: statistics.mean(values) for name, values in modules.items()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=None, help='файл базы (по умолчанию временная база на --rows записей)')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5, help='число запусков')
+    parser.add_argument('--top', type=int, default=15, help='сколько самых долгих импортов показать')
+    parser.add_argument('--output', default=None, help='файл JSON для результатов')
+    parser.add_argument('--baseline', default=BASELINE, help='эталонные результаты JSON')
+    parser.add_argument('--save-baseline', action='store_true', help='сохранить результаты как эталон')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое замедление медианы (доля)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)  # один запуск окна
+    parser.add_argument('--spawned', type=float, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(child(args.db, args.spawned or time.time())))
+        return 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = args.db
+        if db is None:
+            db = os.path.join(tmp_dir, 'items.db')
+            subprocess.run([sys.executable, '-m', 'data.generator', '--db', db, '--rows', str(args.rows),
+                            '--seed', '1'], check=True, stdout=subprocess.DEVNULL)
+        results, modules = measure(db, args.repeat)
+    current = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'imports': dict(sorted(modules.items(), key=lambda item: -item[1])),  # мс, в среднем
+        },
+        'results': {'startup': results},
+    }
+    for path in filter(None, (args.output, args.baseline if args.save_baseline else None)):
+        with open(path, 'w') as file:
+            json.dump(current, file, ensure_ascii=False, indent=2)
+    print('Самые долгие импорты (мс, вместе с зависимостями):')
+    for name, value in list(current['meta']['imports'].items())[:args.top]:
+        print(f'  {name:<40}{value:>10.1f}')
+    if args.save_baseline or not os.path.exists(args.baseline):
+        for case, result in results.items():
+            print(f'{case:<22}{result["median"]:>12.1f} мс')
+        return 0
+    from benchmarks.suite import compare
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = 0
+    print(f'{"этап":<22}{"эталон, мс":>12}{"сейчас, мс":>12}{"":>8}')
+    for _, case, before, after, ratio, regressed in compare(current, baseline, args.tolerance):
+        regressions += regressed
+        print(f'{case:<22}{before:>12.1f}{after:>12.1f}{ratio:>7.2f}x' + ('  ЗАМЕДЛЕНИЕ' if regressed else ''))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
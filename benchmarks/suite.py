@@ -0,0 +1,222 @@
+"""Время основных действий главного окна на синтетических базах разного размера со сравнением с эталоном.
+
+Запуск: python -m benchmarks.suite [--sizes 1000 100000 1000000] [--repeat 5] [--dir DIR] [--output results.json]
+                                   [--baseline benchmarks/baseline.json] [--save-baseline] [--tolerance 0.25]
+Окно создаётся с платформой Qt offscreen, базы заполняются data.generator. С --dir базы сохраняются
+и используются повторно. Код возврата 1 означает, что какое-то действие стало медленнее эталона.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')  # до создания QApplication
+
+from PyQt5.QtCore import QDate, Qt
+from PyQt5.QtWidgets import QApplication
+import main as app
+from data import db_session, notifications
+from data.queries import ItemFilter
+from ui.table_model import CHECK_COLUMN
+from data.generator import generate
+
+SIZES = (1_000, 100_000, 1_000_000)
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DELETED = 100  # записей в одном удалении
+MIN_DELTA = 1.0  # разница меньше этой, мс, считается шумом
+FILTERS = {
+    'category': lambda form: (form.for_category.setChecked(True), form.category_box.setCurrentText('Дом')),
+    'price_asc': lambda form: (form.for_price.setChecked(True), form.price_box.setCurrentText('по возрастанию')),
+    'price_desc': lambda form: (form.for_price.setChecked(True), form.price_box.setCurrentText('по убыванию')),
+    'date_new': lambda form: (form.for_date.setChecked(True), form.date_box.setCurrentText('сначала новые')),
+    'date_old': lambda form: (form.for_date.setChecked(True), form.date_box.setCurrentText('сначала старые')),
+    'period': lambda form: (form.for_period.setChecked(True), form.start_date.setDate(QDate(2022, 3, 1)),
+                            form.end_date.setDate(QDate(2022, 3, 31))),
+}  # режимы FilterForm (выбор переключателя и значений)
+
+
+def timed(action, repeat, setup=None) -> dict:
+    """Медиана и минимум времени action() в мс; setup() выполняется перед каждым замером и не учитывается"""
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        action()
+        runs.append((time.perf_counter() - started) * 1000)
+    return {'median': statistics.median(runs), 'min': min(runs), 'runs': runs}
+
+
+def database(directory, rows) -> str:
+    """Файл базы на rows записей (созданная ранее база в directory используется повторно)"""
+    path = os.path.join(directory, f'items_{rows}.db')
+    exists = os.path.exists(path)
+    db_session.global_init(path, app.settings.get('DB_PROFILE', 'default'))
+    if not exists:
+        session = db_session.create_session()
+        generate(session, rows, seed=rows)  # одинаковые данные при каждом заполнении
+        session.close()
+    return path
+
+
+def measure(notebook, repeat, reports) -> dict:
+    """Замеры действий главного окна; после каждого действия дожидаемся фоновых запросов"""
+    executor = notebook.executor
+
+    def run(action):
+        def wrapped():
+            action()
+            executor.wait()
+        return wrapped
+
+    def reset():
+        notebook.init_table(ItemFilter())
+        executor.wait()
+
+    results = {'init_table': timed(run(notebook.init_table), repeat)}
+    for name, choose in FILTERS.items():
+        def apply_filter():
+            form = app.FilterForm(notebook)
+            choose(form)
+            form.add_filter()
+        results[f'filter_{name}'] = timed(run(apply_filter), repeat, setup=reset)
+
+    notebook.search_bar.setText('кофе')
+    notebook.search_timer.stop()
+    results['to_search'] = timed(run(notebook.to_search), repeat, setup=reset)
+
+    def check_rows():
+        reset()
+        model = notebook.table_model
+        for row in range(min(DELETED, model.rowCount())):
+            model.setData(model.index(row, CHECK_COLUMN), Qt.Checked, Qt.CheckStateRole)
+
+    def restore():
+        notebook.to_undo_delete()
+        executor.wait()
+
+    results['to_delete_item'] = timed(run(notebook.to_delete_item), repeat, setup=lambda: (restore(), check_rows()))
+    restore()
+    reset()
+    notebook.toggle()  # выбраны все загруженные строки
+    results['get_checked_items'] = timed(notebook.get_checked_items, repeat)
+    notebook.toggle()
+
+    notebook.summary_dock.show()
+    results['update_summary'] = timed(run(notebook.update_summary), repeat)
+    notebook.summary_dock.hide()
+
+    def get_file():
+        notebook.to_get_file()
+        notebook.export_worker.wait()
+        QApplication.processEvents()  # доставка сигнала о готовности файла
+    for name in reports:
+        notebook.export_format.setCurrentIndex(notebook.export_format.findData(name))
+        results[f'to_get_file_{name}'] = timed(get_file, repeat)
+    return results
+
+
+def run_size(rows, repeat, directory, report_dir, reports) -> dict:
+    """Замеры на базе из rows записей; db_session.global_init работает один раз, поэтому база одна на процесс"""
+    qt_app = QApplication.instance() or QApplication([])
+    app.report_path = lambda extension='xlsx', name='report': os.path.join(report_dir, f'{name}.{extension}')
+    started = time.perf_counter()
+    database(directory, rows)
+    print(f'база на {rows} записей: {time.perf_counter() - started:.1f} с', file=sys.stderr)
+    app.db_sess = db_session.create_session()
+    notebook = app.Notebook()
+    notebook.summary_dock.hide()  # итоги замеряются отдельно и не входят во время загрузки таблицы
+    notebook.executor.wait()
+    try:
+        return measure(notebook, repeat, reports)
+    finally:
+        notifications.unsubscribe(notebook.on_items_changed)
+        notebook.close()
+        app.db_sess.close()
+        qt_app.processEvents()
+
+
+def run_suite(sizes, repeat, directory, report_dir, reports) -> dict:
+    """Замеры для каждого размера базы (каждый в отдельном процессе) в виде словаря для сохранения в JSON"""
+    results = {}
+    for rows in sizes:
+        path = os.path.join(report_dir, f'results_{rows}.json')
+        subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--worker', '--sizes', str(rows),
+                        '--repeat', str(repeat), '--dir', directory, '--reports', *reports, '--output', path],
+                       check=True)
+        with open(path) as file:
+            results[str(rows)] = json.load(file)
+    return {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'profile': app.settings.get('DB_PROFILE', 'default'),
+            'snapshot': bool(app.settings.get('IN_MEMORY_SNAPSHOT')),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=0.25, min_delta=MIN_DELTA) -> list:
+    """Сравнение медиан с эталоном: (размер, действие, эталон, сейчас, отношение, замедление) для общих замеров"""
+    rows = []
+    for size, cases in current['results'].items():
+        for case, result in cases.items():
+            expected = baseline['results'].get(size, {}).get(case)
+            if expected is None:
+                continue
+            before, after = expected['median'], result['median']
+            ratio = after / before if before else float('inf')
+            rows.append((size, case, before, after, ratio, ratio > 1 + tolerance and after - before > min_delta))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='число записей в базах')
+    parser.add_argument('--repeat', type=int, default=5, help='замеров каждого действия')
+    parser.add_argument('--dir', default=None, help='каталог для баз (по умолчанию временный)')
+    parser.add_argument('--reports', nargs='*', default=['csv', 'xlsx'], help='форматы выгрузки для to_get_file')
+    parser.add_argument('--output', default=None, help='файл JSON для результатов')
+    parser.add_argument('--baseline', default=BASELINE, help='эталонные результаты JSON')
+    parser.add_argument('--save-baseline', action='store_true', help='сохранить результаты как эталон')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое замедление медианы (доля)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)  # один размер в этом процессе
+    args = parser.parse_args()
+    if args.worker:
+        with tempfile.TemporaryDirectory() as report_dir, open(args.output, 'w') as file:
+            json.dump(run_size(args.sizes[0], args.repeat, args.dir, report_dir, args.reports), file)
+        return 0
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        current = run_suite(args.sizes, args.repeat, args.dir or tmp_dir, tmp_dir, args.reports)
+    for path in filter(None, (args.output, args.baseline if args.save_baseline else None)):
+        with open(path, 'w') as file:
+            json.dump(current, file, ensure_ascii=False, indent=2)
+    if args.save_baseline or not os.path.exists(args.baseline):
+        for size, cases in current['results'].items():
+            for case, result in cases.items():
+                print(f'{size:>9} {case:<22}{result["median"]:>12.1f} мс')
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = 0
+    print(f'{"записей":>9} {"действие":<22}{"эталон, мс":>12}{"сейчас, мс":>12}{"":>8}')
+    for size, case, before, after, ratio, regressed in compare(current, baseline, args.tolerance):
+        regressions += regressed
+        print(f'{size:>9} {case:<22}{before:>12.1f}{after:>12.1f}{ratio:>7.2f}x'
+              + ('  ЗАМЕДЛЕНИЕ' if regressed else ''))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
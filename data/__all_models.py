@@ -1,2 +1,3 @@
 from . import items
-from . import catergories
\ No newline at end of file
+from . import catergories
+from . import monthly_totals
@@ -0,0 +1,197 @@
+"""Итоги по ценам покупок: суммы, количество, средние и перцентили по группам.
+
+Запуск без интерфейса: python -m data.analytics [--db db/notebook.db] [--group-by month] [--check]
+"""
+import argparse
+import collections
+import datetime
+import math
+
+import sqlalchemy as sa
+from data import db_session
+from data.items import Item
+from data.catergories import Category
+from data.monthly_totals import MonthlyTotal
+from data.queries import ItemFilter, apply_filter
+
+GROUPS = {
+    'category': Item.category_id,  # названия подставляются после группировки
+    'day': sa.func.substr(Item.purchase_date, 1, 10),  # строка ISO: без преобразования в date и обхода индекса даты
+    'week': sa.func.strftime('%Y-W%W', Item.purchase_date),  # недели с понедельника
+    'month': sa.func.substr(Item.purchase_date, 1, 7),
+    'year': sa.func.substr(Item.purchase_date, 1, 4),
+    'period': sa.literal('Итого'),  # одна строка за весь период фильтра
+}  # выражения для группировки записей (по индексу items без обращения к таблице категорий)
+GROUP_TITLES = {
+    'category': 'по категориям',
+    'day': 'по дням',
+    'week': 'по неделям',
+    'month': 'по месяцам',
+    'year': 'по годам',
+    'period': 'за период',
+}
+
+TOTALS_GROUPS = {
+    'category': MonthlyTotal.category_id,
+    'month': MonthlyTotal.month,
+    'year': sa.func.substr(MonthlyTotal.month, 1, 4),
+    'period': sa.literal('Итого'),
+}  # группировки, которые можно получить из итогов по месяцам
+CHUNK_SIZE = 10000  # строк, читаемых из курсора за раз при расчёте перцентилей
+
+Summary = collections.namedtuple('Summary', 'key count total average minimum maximum percentiles')
+
+
+def summarize(session, items_filter=None, group_by='category', percentiles=()) -> list:
+    """Количество, сумма, среднее, минимум, максимум и перцентили цен по группам записей выборки
+
+    Если выборку можно собрать из целых месяцев, итоги берутся из monthly_totals (минимум и максимум тогда None).
+    Оба способа дают одни итоги: записи без категории не учитываются (как в таблице и count_items), записи без даты
+    не попадают в выборку с границами дат, среднее - сумма на число записей (цена NULL считается нулевой)."""
+    items_filter = items_filter or ItemFilter()
+    if uses_totals(items_filter, group_by, percentiles):
+        return _named(session, _summarize_totals(session, items_filter, group_by), group_by)
+    key = GROUPS[group_by]
+    statement = _filtered(sa.select(key, sa.func.count(Item.id), sa.func.total(Item.price),
+                                    sa.func.min(Item.price), sa.func.max(Item.price)), items_filter) \
+        .group_by(key).order_by(key)
+    rows = session.execute(statement).all()
+    values = group_percentiles(session, items_filter, group_by, percentiles) if percentiles else {}
+    summaries = [Summary(key, count, total, total / count if count else None, minimum, maximum, values.get(key, ()))
+                 for key, count, total, minimum, maximum in rows]
+    return _named(session, summaries, group_by)
+
+
+def uses_totals(items_filter, group_by, percentiles=()) -> bool:
+    """Можно ли получить итоги из monthly_totals: нет поиска, перцентилей и период из целых месяцев"""
+    start, end = items_filter.start_date, items_filter.end_date
+    return (group_by in TOTALS_GROUPS and not percentiles
+            and not (items_filter.search and items_filter.search.strip())
+            and (start is None or start.day == 1)
+            and (end is None or (end + datetime.timedelta(days=1)).day == 1))
+
+
+def _summarize_totals(session, items_filter, group_by) -> list:
+    """Итоги из monthly_totals: O(категорий x месяцев) вместо O(записей)"""
+    key = TOTALS_GROUPS[group_by]
+    statement = sa.select(key, sa.func.sum(MonthlyTotal.count), sa.func.total(MonthlyTotal.total)) \
+        .where(MonthlyTotal.category_id != 0).group_by(key).order_by(key)  # 0 - записи без категории
+    if items_filter.category is not None:
+        statement = statement.join(Category, MonthlyTotal.category_id == Category.id) \
+            .where(Category.name == items_filter.category)
+    if items_filter.start_date is not None:
+        statement = statement.where(MonthlyTotal.month >= items_filter.start_date.strftime('%Y-%m'))
+    if items_filter.end_date is not None:
+        statement = statement.where(MonthlyTotal.month <= items_filter.end_date.strftime('%Y-%m'))
+    if items_filter.start_date is not None or items_filter.end_date is not None:
+        statement = statement.where(MonthlyTotal.month != '')  # записи без даты, как purchase_date NULL в items
+    return [Summary(None if key == '' else key, count, total, total / count if count else None, None, None, ())
+            for key, count, total in session.execute(statement)]  # '' - месяц и год записей без даты
+
+
+def _named(session, summaries, group_by) -> list:
+    """Названия категорий и даты вместо ключей группировки"""
+    if group_by == 'category':
+        names = dict(session.execute(sa.select(Category.id, Category.name)
+                                     .where(Category.id.in_([summary.key for summary in summaries]))).all())
+        summaries = sorted((summary._replace(key=names.get(summary.key)) for summary in summaries),
+                           key=lambda summary: summary.key or '')
+    elif group_by == 'day':
+        summaries = [summary._replace(key=datetime.date.fromisoformat(summary.key)) if summary.key else summary
+                     for summary in summaries]
+    return summaries
+
+
+def group_percentiles(session, items_filter, group_by, percentiles) -> dict:
+    """Перцентили цен каждой группы: ключ группы -> кортеж значений в порядке percentiles"""
+    statement = _filtered(sa.select(GROUPS[group_by], Item.price), items_filter).where(Item.price.isnot(None))
+    prices = collections.defaultdict(list)
+    for rows in db_session.driver_rows(session, statement, CHUNK_SIZE):
+        for key, price in rows:
+            prices[key].append(price)
+    numpy = _numpy()
+    if numpy is not None:
+        return {key: tuple(numpy.percentile(numpy.array(values), percentiles).tolist())
+                for key, values in prices.items()}
+    return {key: tuple(percentile(sorted(values), q) for q in percentiles) for key, values in prices.items()}
+
+
+def _numpy():
+    """NumPy при первом расчёте перцентилей, а не при запуске окна (None, если не установлен)"""
+    try:
+        import numpy
+    except ImportError:  # без NumPy перцентили считаются на Python
+        return None
+    return numpy
+
+
+def rebuild_totals(connection) -> None:
+    """Пересчёт monthly_totals с нуля по таблице items"""
+    connection.execute(sa.text('DELETE FROM monthly_totals'))
+    connection.execute(sa.text("INSERT INTO monthly_totals (category_id, month, count, total) "
+                               "SELECT coalesce(category_id, 0), coalesce(substr(purchase_date, 1, 7), ''), "
+                               "count(*), total(price) FROM items GROUP BY 1, 2"))
+
+
+def check_totals(session, repair=True) -> list:
+    """Сверка monthly_totals с таблицей items; возвращает расходящиеся ключи (категория, месяц)
+
+    При repair=True и найденных расхождениях итоги пересчитываются и изменения фиксируются."""
+    expected = {(category_id, month): (count, total) for category_id, month, count, total in session.execute(sa.text(
+        "SELECT coalesce(category_id, 0), coalesce(substr(purchase_date, 1, 7), ''), count(*), total(price) "
+        "FROM items GROUP BY 1, 2"))}
+    stored = {(category_id, month): (count, total) for category_id, month, count, total in session.execute(
+        sa.select(MonthlyTotal.category_id, MonthlyTotal.month, MonthlyTotal.count, MonthlyTotal.total))}
+    mismatched = sorted(key for key in expected.keys() | stored.keys()
+                        if key not in expected or key not in stored or expected[key][0] != stored[key][0]
+                        or not math.isclose(expected[key][1], stored[key][1], rel_tol=1e-9, abs_tol=0.005))
+    if mismatched and repair:
+        try:
+            rebuild_totals(session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+    return mismatched
+
+
+def percentile(values, q) -> float:
+    """Перцентиль отсортированного списка с линейной интерполяцией (как numpy.percentile)"""
+    position = (len(values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _filtered(statement, items_filter):
+    """Условия фильтра без сортировки; таблица категорий присоединяется только для фильтра по категории"""
+    statement = statement.select_from(Item)
+    if items_filter.category is not None:
+        statement = statement.join(Category, Item.category_id == Category.id)
+    else:
+        statement = statement.where(Item.category_id.isnot(None))  # как в count_items
+    return apply_filter(statement, items_filter).order_by(None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='db/notebook.db', help='файл базы данных')
+    parser.add_argument('--group-by', choices=GROUPS, default='category')
+    parser.add_argument('--percentiles', type=float, nargs='*', default=())
+    parser.add_argument('--check', action='store_true', help='сверить и при необходимости пересчитать monthly_totals')
+    args = parser.parse_args()
+    db_session.global_init(args.db)
+    session = db_session.create_session()
+    try:
+        if args.check:
+            mismatched = check_totals(session)
+            print(f'Расхождений в итогах по месяцам: {len(mismatched)}' + (' (пересчитано)' if mismatched else ''))
+        for summary in summarize(session, group_by=args.group_by, percentiles=tuple(args.percentiles)):
+            percentiles = ' '.join(f'{value:.2f}' for value in summary.percentiles)
+            print(f'{summary.key}\t{summary.count}\t{summary.total:.2f}\t{summary.average or 0:.2f}\t{percentiles}')
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
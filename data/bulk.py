@@ -0,0 +1,143 @@
+import collections
+import contextlib
+
+import sqlalchemy as sa
+from data import notifications
+from data.items import Item
+
+CHUNK_SIZE = 900  # не больше лимита SQLite на число параметров запроса (999 в старых версиях)
+BULK_SHARE = 0.25  # bulk_load выгоднее, когда добавляется больше этой доли от имеющихся записей
+BULK_MIN_ROWS = 10000  # и не меньше этого числа строк
+
+
+def chunks(values, size=CHUNK_SIZE):
+    """Разбиение списка на части для условий IN (...)"""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def delete_items(session, ids) -> list:
+    """Удаление записей одной транзакцией; возвращает удалённые строки для отмены"""
+    ids = list(ids)
+    table = Item.__table__
+    try:
+        deleted = []
+        for chunk in chunks(ids):
+            deleted.extend(dict(row) for row in session.execute(sa.select(table).where(table.c.id.in_(chunk)))
+                           .mappings())
+            session.execute(sa.delete(Item).where(Item.id.in_(chunk)))  # удалённые объекты исключаются из сессии
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    notifications.notify(removed=[row['id'] for row in deleted])
+    return deleted
+
+
+def restore_items(session, rows) -> list:
+    """Возврат удалённых записей одной транзакцией; возвращает id восстановленных записей
+
+    В items нет AUTOINCREMENT, поэтому id удалённой последней записи может уже занять новая: такие записи
+    вставляются с новым id, остальные - с прежним."""
+    if not rows:
+        return []
+    table = Item.__table__
+    try:
+        taken = set()
+        for chunk in chunks(row['id'] for row in rows):
+            taken.update(session.execute(sa.select(table.c.id).where(table.c.id.in_(chunk))).scalars())
+        free = [row for row in rows if row['id'] not in taken]
+        if free:
+            session.execute(sa.insert(table), free)
+        ids = [row['id'] for row in free]
+        for row in rows:
+            if row['id'] in taken:
+                values = {key: value for key, value in row.items() if key != 'id'}
+                ids.append(session.execute(sa.insert(table).values(values)).inserted_primary_key[0])
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    notifications.notify(added=ids)
+    return ids
+
+
+@contextlib.contextmanager
+def bulk_load(connection):
+    """Массовая вставка в items без построчного обновления индексов, поиска и итогов
+
+    Триггеры и индексы items снимаются на время вставки и создаются заново после неё в той же транзакции,
+    поисковый индекс и monthly_totals пересчитываются один раз."""
+    from data.analytics import rebuild_totals
+
+    if not connection.connection.in_transaction:  # pysqlite сам не начинает транзакцию перед DDL
+        connection.exec_driver_sql('BEGIN')
+    saved = connection.execute(sa.text("SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'items' "
+                                       "AND type IN ('trigger', 'index') AND sql IS NOT NULL")).all()
+    for kind, name, _ in saved:
+        connection.execute(sa.text(f'DROP {kind.upper()} "{name}"'))
+    yield
+    for kind, _, sql in sorted(saved, key=lambda row: row[0] != 'index'):  # сначала индексы, затем триггеры
+        connection.execute(sa.text(sql))
+    tables = set(connection.execute(sa.text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+    if 'items_search' in tables:
+        connection.execute(sa.text("INSERT INTO items_search (items_search) VALUES ('rebuild')"))
+    if 'monthly_totals' in tables:
+        rebuild_totals(connection)
+    connection.execute(sa.text('ANALYZE'))
+
+
+class Inserter:
+    """Пачки вставок в items одной транзакции с переходом на bulk_load для больших загрузок
+
+    bulk_load пересоздаёт индексы и итоги по всей таблице, поэтому включается, только когда вставлено больше
+    BULK_SHARE от числа записей до загрузки (но не меньше BULK_MIN_ROWS); до этого индексы обновляются построчно."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.inserted = 0
+        self.bulk = False
+        self.threshold = max(BULK_MIN_ROWS, BULK_SHARE * connection.exec_driver_sql('SELECT count(*) FROM items')
+                             .scalar())
+        self._stack = contextlib.ExitStack()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._stack.__exit__(*exc_info)  # индексы и триггеры создаются заново, если снимались
+
+    def insert(self, statement, rows) -> None:
+        """executemany для rows; части, начиная с превысившей порог, вставляются без индексов"""
+        if not self.bulk and self.inserted + len(rows) >= self.threshold:
+            self._stack.enter_context(bulk_load(self.connection))
+            self.bulk = True
+        self.connection.exec_driver_sql(statement, rows)
+        self.inserted += len(rows)
+
+
+class UndoBuffer:
+    """Буфер последних массовых удалений"""
+
+    def __init__(self, size=10):
+        self._actions = collections.deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    def push(self, rows) -> None:
+        if rows:
+            self._actions.append(rows)
+
+    def undo(self, session) -> int:
+        """Отмена последнего удаления; возвращает число восстановленных записей"""
+        if not self._actions:
+            return 0
+        rows = self._actions.pop()
+        try:
+            restore_items(session, rows)
+        except Exception:
+            self._actions.append(rows)  # удаление можно будет отменить повторно
+            raise
+        return len(rows)
@@ -0,0 +1,128 @@
+import datetime
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+from data.bulk import chunks
+from data.catergories import Category
+
+
+class CategoryRegistry:
+    """Кэш категорий: id -> название и название без учёта регистра -> id (загружается один раз)"""
+
+    def __init__(self):
+        self._names = {}  # id -> название
+        self._ids = {}  # casefold(название) -> id
+        self._loaded = False
+        self.version = 0  # увеличивается при каждом изменении списка категорий
+
+    def load(self, session) -> None:
+        """Загрузка всех категорий одним запросом (если кэш ещё не загружен)"""
+        if self._loaded:
+            return
+        self._names, self._ids = {}, {}
+        for category_id, name in session.execute(sa.select(Category.id, Category.name)):
+            self._put(category_id, name)
+        self._loaded = True
+        self.version += 1
+
+    def invalidate(self) -> None:
+        """Сброс кэша после изменений в обход ORM (например, массовой загрузки)"""
+        self._loaded = False
+        self.version += 1
+
+    def name(self, category_id):
+        """Название категории по id"""
+        return self._names.get(category_id)
+
+    def find(self, session, name):
+        """id категории по названию без учёта регистра или None"""
+        self.load(session)
+        return self._ids.get(name.strip().casefold())
+
+    def names(self, session) -> list:
+        """Названия всех категорий"""
+        self.load(session)
+        return list(self._names.values())
+
+    def resolve(self, session, names) -> dict:
+        """id категорий по названиям без учёта регистра (casefold -> id); отсутствующие добавляются одним запросом
+
+        Новые категории попадают в кэш после фиксации транзакции, как и добавленные через ORM."""
+        self.load(session)
+        ids, missing = {}, {}
+        for name in names:
+            name = name.strip()
+            key = name.casefold()
+            if key in ids or key in missing:
+                continue
+            if key in self._ids:
+                ids[key] = self._ids[key]
+            else:
+                missing[key] = name
+        if missing:
+            now = datetime.datetime.now()
+            session.execute(sqlite.insert(Category.__table__).on_conflict_do_nothing(),  # добавлена другим процессом
+                            [{'name': name, 'created_date': now} for name in missing.values()])
+            changes = session.info.setdefault('category_changes', [])
+            for names_chunk in chunks(missing.values()):
+                for category_id, name in session.execute(
+                        sa.select(Category.id, Category.name).where(Category.name.in_(names_chunk))):
+                    ids[name.casefold()] = category_id
+                    changes.append((category_id, name))
+        return ids
+
+    def _put(self, category_id, name) -> None:
+        old_name = self._names.get(category_id)
+        if old_name is not None:
+            self._ids.pop(old_name.casefold(), None)
+        self._names[category_id] = name
+        self._ids[name.casefold()] = category_id
+
+    def _remove(self, category_id) -> None:
+        name = self._names.pop(category_id, None)
+        if name is not None:
+            self._ids.pop(name.casefold(), None)
+
+    def apply(self, changes) -> None:
+        """Применение зафиксированных изменений: список пар (id, название или None при удалении)"""
+        if not self._loaded:
+            return
+        for category_id, name in changes:
+            if name is None:
+                self._remove(category_id)
+            else:
+                self._put(category_id, name)
+        self.version += 1
+
+
+categories = CategoryRegistry()  # общий кэш для всех окон
+
+
+def _pending(target) -> list:
+    return sa.inspect(target).session.info.setdefault('category_changes', [])
+
+
+@event.listens_for(Category, 'after_insert')
+@event.listens_for(Category, 'after_update')
+def _category_saved(mapper, connection, target) -> None:
+    _pending(target).append((target.id, target.name))
+
+
+@event.listens_for(Category, 'after_delete')
+def _category_deleted(mapper, connection, target) -> None:
+    _pending(target).append((target.id, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session) -> None:
+    """Кэш меняется только после фиксации транзакции"""
+    changes = session.info.pop('category_changes', None)
+    if changes:
+        categories.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_changes(session) -> None:
+    session.info.pop('category_changes', None)
@@ -1,3 +1,10 @@
+import contextlib
+import datetime
+import gc
+import sqlite3
+import threading
+import time
+
 import sqlalchemy as sa
 import sqlalchemy.orm as orm
 from sqlalchemy.orm import Session
@@ -6,10 +13,38 @@ import sqlalchemy.ext.declarative as dec
 SqlAlchemyBase = dec.declarative_base()
 
 __factory = None
+_counters = threading.local()  # активные счётчики запросов текущего потока
+
+PROFILES = {
+    # режим журнала не меняется: переключение требует монопольного доступа, а базу может держать открытой
+    # окно или data.server в режиме WAL
+    'default': {'synchronous': 'FULL', 'busy_timeout': 5000},
+    'safe': {'journal_mode': 'WAL', 'synchronous': 'FULL', 'busy_timeout': 5000},
+    'performance': {
+        'journal_mode': 'WAL',  # читатели не блокируют запись, fsync только при checkpoint
+        'synchronous': 'NORMAL',  # в режиме WAL не теряет целостность, только последние транзакции при сбое ОС
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # в КиБ (отрицательное значение)
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+}  # профили настроек соединения (PRAGMA), выбираются ключом DB_PROFILE в settings.json
+
+LOADERS = {
+    'lazy': orm.lazyload,  # отдельный SELECT при первом обращении (по умолчанию)
+    'joined': orm.joinedload,  # LEFT JOIN в том же запросе
+    'selectin': orm.selectinload,  # второй запрос SELECT ... WHERE id IN (...) на всю выборку
+    'contains': orm.contains_eager,  # связь берётся из явного JOIN запроса
+    'raise': orm.raiseload,  # обращение к незагруженной связи - ошибка (поиск N+1 при отладке)
+}
+LOADING_STRATEGIES = {
+    'table': {'category': 'contains'},  # queries.query_items: категории присоединяются для фильтра
+    'categories': {'items': 'selectin'},  # категории со всеми записями
+}  # стратегии загрузки связей для каждого сценария (запросы объектов ORM нужны только тестам и benchmarks)
 
 
-def global_init(db_file):
-    """Инициализация БД"""
+def global_init(db_file, profile='default', echo=False):
+    """Инициализация БД (echo=True - вывод всех SQL-запросов в консоль)"""
     global __factory
 
     if __factory:
@@ -18,18 +53,167 @@ def global_init(db_file):
     if not db_file or not db_file.strip():
         raise Exception("Необходимо указать файл базы данных.")
 
-    conn_str = f'sqlite:///{db_file.strip()}?check_same_thread=False'
-    print(f"Подключение к базе данных по адресу {conn_str}")
-
-    engine = sa.create_engine(conn_str, echo=False)
-    __factory = orm.sessionmaker(bind=engine)
+    engine = create_engine(db_file, profile, echo)
+    print(f"Подключение к базе данных по адресу {engine.url} (профиль {profile})")
+    __factory = orm.sessionmaker(bind=engine, expire_on_commit=False)  # строки таблицы не перечитываются после commit
 
     from . import __all_models
+    from . import migrations
 
     SqlAlchemyBase.metadata.create_all(engine)
+    migrations.upgrade(engine)  # индексы и прочие изменения схемы для уже существующих файлов
+
+
+def create_engine(db_file, profile='default', echo=False):
+    """Движок SQLite с пулом соединений и настройками профиля, применяемыми к каждому соединению"""
+    if profile not in PROFILES:
+        raise Exception(f"Неизвестный профиль базы данных: {profile}")
+    conn_str = f'sqlite:///{db_file.strip()}?check_same_thread=False'
+    options = {}
+    if db_file.strip() != ':memory:':  # соединения с файлом переиспользуются, а не открываются заново
+        options = {'poolclass': sa.pool.QueuePool, 'pool_size': 5, 'max_overflow': 10}
+    engine = sa.create_engine(conn_str, echo=echo, connect_args={'factory': _Connection}, **options)
+    pragmas = PROFILES[profile]
+
+    @sa.event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record) -> None:
+        _register_functions(dbapi_connection)
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+    return engine
+
+
+class _Cursor(sqlite3.Cursor):
+    """Курсор sqlite3, передающий число прочитанных строк активным счётчикам (см. count_statements)"""
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            _rows_fetched(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = super().fetchmany(*args, **kwargs)
+        _rows_fetched(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _rows_fetched(len(rows))
+        return rows
+
+
+class _Connection(sqlite3.Connection):
+    def cursor(self, factory=_Cursor):
+        return super().cursor(factory)
+
+
+def _register_functions(dbapi_connection) -> None:
+    """Регистрация пользовательских SQL-функций для нового соединения"""
+    dbapi_connection.create_function('casefold', 1, _casefold, deterministic=True)
+
+
+def _casefold(value):
+    """Приведение строки к нижнему регистру с поддержкой Unicode"""
+    return value.casefold() if isinstance(value, str) else value
 
 
 def create_session() -> Session:
     """Создание сессии"""
     global __factory
     return __factory()
+
+
+def query(session, model, use_case=None, **strategies):
+    """Запрос модели со стратегиями загрузки связей сценария use_case (их можно переопределить аргументами)"""
+    strategies = {**LOADING_STRATEGIES.get(use_case, {}), **strategies}
+    options = [LOADERS[strategy](getattr(model, relation)) for relation, strategy in strategies.items()
+               if hasattr(model, relation)]
+    return session.query(model).options(*options)
+
+
+def _driver_value(value):
+    """Значение параметра в формате хранения типов Date и DateTime в SQLite"""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def driver_rows(session, statement, chunk_size=10000):
+    """Строки запроса кортежами драйвера sqlite3 частями, без объектов Row и преобразования типов SQLAlchemy"""
+    compiled = statement.compile(session.get_bind(), compile_kwargs={'render_postcompile': True})  # раскрытие IN (...)
+    parameters = tuple(_driver_value(compiled.params[name]) for name in compiled.positiontup)
+    cursor = session.connection().exec_driver_sql(str(compiled), parameters).cursor
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """Отключение циклического сборщика мусора на время создания миллионов кортежей (без циклических ссылок)"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class StatementCounter:
+    """Число SQL-запросов, прочитанных строк и время выполнения запросов внутри count_statements()"""
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.elapsed = 0.0  # с
+
+    def add_statement(self, statement, started, elapsed) -> None:
+        """Выполненный запрос; started - время начала по time.perf_counter()"""
+        self.count += 1
+        self.elapsed += elapsed
+
+    def add_rows(self, count) -> None:
+        self.rows += count
+
+
+@contextlib.contextmanager
+def count_statements(counter=None):
+    """Подсчёт SQL-запросов, выполненных в текущем потоке (counter - продолжить счёт в другом потоке)"""
+    counter = counter if counter is not None else StatementCounter()
+    stack = _counters.__dict__.setdefault('stack', [])
+    stack.append(counter)
+    try:
+        yield counter
+    finally:
+        stack.remove(counter)
+
+
+def _rows_fetched(count) -> None:
+    for counter in getattr(_counters, 'stack', ()):
+        counter.add_rows(count)
+
+
+@sa.event.listens_for(sa.engine.Engine, 'before_cursor_execute')
+def _statement_started(conn, cursor, statement, parameters, context, executemany) -> None:
+    if getattr(_counters, 'stack', None):  # без активных счётчиков время не замеряется
+        conn.info.setdefault('statements_started', []).append(time.perf_counter())
+
+
+@sa.event.listens_for(sa.engine.Engine, 'after_cursor_execute')
+def _statement_finished(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info.get('statements_started')
+    if not started:
+        return
+    started = started.pop()
+    elapsed = time.perf_counter() - started
+    for counter in getattr(_counters, 'stack', ()):
+        counter.add_statement(statement, started, elapsed)
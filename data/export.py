@@ -0,0 +1,181 @@
+import array
+import collections
+import csv
+import datetime
+import importlib.util
+import json
+import os
+
+import sqlalchemy as sa
+from data.items import Item
+from data.catergories import Category
+from data.queries import ItemFilter, apply_filter
+
+
+LABELS = ('Название покупки', 'Категория', 'Цена/руб.', 'Дата покупки', 'Описание')
+FIELDS = ('name', 'category', 'price', 'purchase_date', 'about')  # имена столбцов для машинных форматов
+CHUNK_SIZE = 2000  # число строк, читаемых из базы за раз
+
+
+class ExportCancelled(Exception):
+    """Выгрузка прервана пользователем"""
+
+
+Exporter = collections.namedtuple('Exporter', 'name title extension write')
+EXPORTERS = {}  # зарегистрированные форматы выгрузки
+
+
+def exporter(name, title, extension):
+    """Регистрация функции write(path, chunks, progress) как формата выгрузки"""
+    def register(write):
+        EXPORTERS[name] = Exporter(name, title, extension, write)
+        return write
+    return register
+
+
+def export_statement(items_filter: ItemFilter):
+    """SELECT выгружаемых столбцов с учётом текущих фильтра и сортировки"""
+    statement = sa.select(Item.name, Category.name, Item.price, Item.purchase_date, Item.about) \
+        .join_from(Item, Category, Item.category_id == Category.id)
+    return apply_filter(statement, items_filter)
+
+
+def count_rows(session, items_filter: ItemFilter) -> int:
+    """Число выгружаемых записей (для индикатора выполнения)"""
+    statement = export_statement(items_filter).order_by(None).with_only_columns(sa.func.count())
+    return session.execute(statement).scalar()
+
+
+def iter_chunks(session, items_filter: ItemFilter, chunk_size=CHUNK_SIZE):
+    """Потоковое чтение строк частями без создания ORM-объектов"""
+    result = session.execute(export_statement(items_filter), execution_options={'stream_results': True})
+    yield from result.partitions(chunk_size)
+
+
+def export(name, path, chunks, progress=None) -> int:
+    """Выгрузка строк в файл указанного формата; возвращает число записанных строк"""
+    try:
+        return EXPORTERS[name].write(path, chunks, progress)
+    except ExportCancelled:
+        if os.path.exists(path):
+            os.remove(path)  # недописанный файл не оставляем
+        raise
+
+
+def _tracked(chunks, progress):
+    """Передача числа обработанных строк в progress; False прерывает выгрузку"""
+    written = 0
+    for chunk in chunks:
+        yield chunk
+        written += len(chunk)
+        if progress is not None and progress(written) is False:
+            raise ExportCancelled()
+
+
+@exporter('xlsx', 'xlsx (Excel)', 'xlsx')
+def write_xlsx(path, chunks, progress=None) -> int:
+    """Запись строк в книгу excel в режиме write-only (ячейки не хранятся в памяти)"""
+    import openpyxl  # импорт занимает около 0,1 с, поэтому не при запуске окна
+
+    wb = openpyxl.Workbook(write_only=True)  # создание книги
+    sheet = wb.create_sheet('Отчёт')
+    now = datetime.datetime.today()
+    sheet.append(LABELS + (None, 'ПРОГРАММА ДЛЯ КОНТРОЛЯ ДЕНЕЖНЫХ СРЕДСТВ'))
+    subtitle = f'ОТЧЁТ ОТ {now.strftime("%H:%M %d.%m.%Y")}'  # в ячейке G2, как и раньше
+    written = 0
+    for chunk in _tracked(chunks, progress):
+        for row in chunk:
+            if subtitle:
+                sheet.append(tuple(row) + (None, subtitle))
+                subtitle = None
+            else:
+                sheet.append(tuple(row))
+        written += len(chunk)
+    if subtitle:
+        sheet.append((None,) * (len(LABELS) + 1) + (subtitle,))
+    wb.save(path)
+    return written
+
+
+@exporter('csv', 'CSV', 'csv')
+def write_csv(path, chunks, progress=None) -> int:
+    """Запись строк в CSV (даты в формате ISO)"""
+    written = 0
+    with open(path, mode='w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(FIELDS)
+        for chunk in _tracked(chunks, progress):
+            writer.writerows(chunk)
+            written += len(chunk)
+    return written
+
+
+@exporter('jsonl', 'JSON Lines', 'jsonl')
+def write_jsonl(path, chunks, progress=None) -> int:
+    """Запись строк в JSON Lines: один объект на строку"""
+    written = 0
+    with open(path, mode='w', encoding='utf-8') as file:
+        for chunk in _tracked(chunks, progress):
+            file.writelines(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False, default=str) + '\n'
+                            for row in chunk)
+            written += len(chunk)
+    return written
+
+
+def _write_parquet(path, chunks, progress=None) -> int:
+    """Запись строк в parquet по одной группе строк на часть"""
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = pyarrow.schema([('name', pyarrow.string()), ('category', pyarrow.string()),
+                             ('price', pyarrow.float64()), ('purchase_date', pyarrow.date32()),
+                             ('about', pyarrow.string())])
+    written = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for chunk in _tracked(chunks, progress):
+            columns = list(zip(*chunk)) if chunk else [[] for _ in FIELDS]
+            writer.write_table(pyarrow.Table.from_arrays([pyarrow.array(column, type=field.type)
+                                                          for column, field in zip(columns, schema)], schema=schema))
+            written += len(chunk)
+    return written
+
+
+def _write_npz(path, chunks, progress=None) -> int:
+    """Запись строк в сжатый .npz: числа и даты в типизированных массивах, категории словарём"""
+    import numpy
+
+    names, abouts = [], []
+    prices, days, codes = array.array('d'), array.array('q'), array.array('i')
+    categories = {}  # название категории -> код
+    epoch = datetime.date(1970, 1, 1)
+    for chunk in _tracked(chunks, progress):
+        for name, category, price, purchase_date, about in chunk:
+            names.append(name or '')
+            abouts.append(about or '')
+            prices.append(numpy.nan if price is None else price)
+            days.append((purchase_date - epoch).days if purchase_date else -2 ** 63)  # NaT
+            codes.append(categories.setdefault(category, len(categories)))
+    numpy.savez_compressed(
+        path, name=numpy.array(names, dtype=str), about=numpy.array(abouts, dtype=str),
+        price=numpy.frombuffer(prices, dtype=numpy.float64),
+        purchase_date=numpy.frombuffer(days, dtype=numpy.int64).astype('datetime64[D]'),
+        category_code=numpy.frombuffer(codes, dtype=numpy.int32),
+        categories=numpy.array(list(categories), dtype=str))
+    return len(prices)
+
+
+def _installed(name) -> bool:
+    """Установлен ли необязательный модуль (сам модуль импортируется только при выгрузке)"""
+    return importlib.util.find_spec(name) is not None
+
+
+if _installed('pyarrow'):  # колоночная выгрузка в parquet необязательна
+    exporter('columnar', 'Parquet', 'parquet')(_write_parquet)
+elif _installed('numpy'):
+    exporter('columnar', 'NumPy (.npz)', 'npz')(_write_npz)
+
+
+def report_path(extension='xlsx', name='report') -> str:
+    """Путь к файлу отчёта в папке reports (без расширения - к папке)"""
+    path = f'reports/{name}_{datetime.datetime.today().strftime("%H_%M_%d_%m_%Y")}'
+    return f'{path}.{extension}' if extension else path
@@ -0,0 +1,118 @@
+"""Генерация синтетических покупок для нагрузочных тестов и замеров.
+
+Запуск без интерфейса: python -m data.generator --db bench.db [--rows 1000000] [--categories 10]
+                       [--start 2022-01-01] [--end 2023-12-31] [--prices lognormal] [--seed 1]
+"""
+import argparse
+import datetime
+import itertools
+import math
+import random
+import time
+
+from data.bulk import bulk_load
+from data.category_registry import categories as category_registry
+
+CHUNK_SIZE = 100_000  # строк, вставляемых одним executemany
+CATEGORIES = (
+    ('Продукты', 350, ('молоко', 'хлеб', 'сыр', 'кофе', 'чай', 'яблоки', 'курица', 'макароны', 'йогурт')),
+    ('Кафе', 600, ('обед', 'ужин', 'кофе', 'пицца', 'бизнес-ланч', 'десерт')),
+    ('Транспорт', 250, ('такси', 'метро', 'автобус', 'бензин', 'парковка', 'каршеринг')),
+    ('Дом', 700, ('шампунь', 'порошок', 'лампочка', 'посуда', 'полотенце', 'губки')),
+    ('Здоровье', 1200, ('лекарства', 'витамины', 'анализы', 'стоматолог', 'пластырь')),
+    ('Одежда', 3000, ('куртка', 'кроссовки', 'футболка', 'джинсы', 'носки', 'шапка')),
+    ('Досуг', 800, ('кино', 'театр', 'концерт', 'книга', 'музей', 'боулинг')),
+    ('Связь', 500, ('интернет', 'мобильная связь', 'подписка', 'облако')),
+    ('Подарки', 1500, ('подарок', 'цветы', 'открытка', 'игрушка', 'сертификат')),
+    ('Электроника', 5000, ('телефон', 'зарядка', 'наушники', 'ноутбук', 'кабель', 'мышь')),
+)  # название, медиана цены в рублях, слова для названий покупок (в порядке убывания частоты категорий)
+NOTES = ('по акции', 'для дома', 'на работу', 'в подарок', 'онлайн', 'с доставкой', 'на выходных')
+ABOUT_SHARE = 0.3  # доля покупок с описанием
+PRICE_DISTRIBUTIONS = {
+    'lognormal': lambda rng, median, spread: median * rng.lognormvariate(0, spread),  # много дешёвых, редко дорогие
+    'exponential': lambda rng, median, spread: rng.expovariate(math.log(2) / median),
+    'uniform': lambda rng, median, spread: rng.uniform(0.01, 2 * median),
+}  # распределение цены покупки вокруг медианы категории
+WEEKEND_WEIGHT = 1.5  # в выходные покупок больше
+GROWTH = 1.0  # к концу периода покупок в 1 + GROWTH раз больше, чем в начале
+
+
+def category_names(count) -> list:
+    """Названия count категорий: сначала из CATEGORIES, затем с номерами"""
+    return [CATEGORIES[i % len(CATEGORIES)][0] + (f' {i // len(CATEGORIES) + 1}' if i >= len(CATEGORIES) else '')
+            for i in range(count)]
+
+
+def generate(session, rows, categories=len(CATEGORIES), start=datetime.date(2022, 1, 1),
+             end=datetime.date(2023, 12, 31), prices='lognormal', price_scale=1.0, price_spread=0.8, seed=None,
+             chunk_size=CHUNK_SIZE, progress=None) -> int:
+    """Вставка rows случайных покупок одной транзакцией; возвращает число вставленных записей
+
+    Популярность категорий убывает по закону Ципфа, цены распределены вокруг медианы категории (price_scale
+    умножает медианы), даты покупок - в [start, end] с перевесом выходных и ростом числа покупок к концу периода."""
+    rng = random.Random(seed)
+    price = PRICE_DISTRIBUTIONS[prices]
+    names = category_names(categories)
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(categories)))
+    days = [start + datetime.timedelta(days=offset) for offset in range((end - start).days + 1)]
+    day_weights = list(itertools.accumulate(
+        (1 + GROWTH * offset / len(days)) * (WEEKEND_WEIGHT if day.weekday() >= 5 else 1)
+        for offset, day in enumerate(days)))
+    days = [day.isoformat() for day in days]
+    insert = 'INSERT INTO items (name, price, purchase_date, about, created_date, category_id) ' \
+             'VALUES (?, ?, ?, ?, ?, ?)'
+    try:
+        category_ids = category_registry.resolve(session, names)
+        kinds = [(category_ids[name.casefold()], CATEGORIES[i % len(CATEGORIES)][1] * price_scale,
+                  CATEGORIES[i % len(CATEGORIES)][2]) for i, name in enumerate(names)]
+        connection = session.connection()
+        written = 0
+        with bulk_load(connection):
+            while written < rows:
+                size = min(chunk_size, rows - written)
+                chunk = []
+                for (category_id, median, words), day in zip(rng.choices(kinds, cum_weights=weights, k=size),
+                                                             rng.choices(days, cum_weights=day_weights, k=size)):
+                    chunk.append((rng.choice(words), round(price(rng, median, price_spread), 2), day,
+                                  rng.choice(NOTES) if rng.random() < ABOUT_SHARE else None, f'{day} 12:00:00.000000',
+                                  category_id))
+                connection.exec_driver_sql(insert, chunk)
+                written += size
+                if progress is not None:
+                    progress(written)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return written
+
+
+def main() -> None:
+    from data import db_session
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='файл базы данных (записи добавляются к имеющимся)')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=len(CATEGORIES))
+    parser.add_argument('--start', type=datetime.date.fromisoformat, default=datetime.date(2022, 1, 1))
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=datetime.date(2023, 12, 31))
+    parser.add_argument('--prices', choices=PRICE_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--price-scale', type=float, default=1.0, help='множитель медиан цен категорий')
+    parser.add_argument('--price-spread', type=float, default=0.8, help='разброс логнормального распределения')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--profile', choices=db_session.PROFILES, default='default', help='настройки SQLite')
+    args = parser.parse_args()
+    db_session.global_init(args.db, args.profile)
+    session = db_session.create_session()
+    started = time.perf_counter()
+    try:
+        written = generate(session, args.rows, args.categories, args.start, args.end, args.prices, args.price_scale,
+                           args.price_spread, args.seed,
+                           progress=lambda written: print(f'\rСгенерировано записей: {written}', end=''))
+    finally:
+        session.close()
+    print(f'\nГотово: {written} записей за {time.perf_counter() - started:.1f} с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Массовая загрузка покупок из CSV или xlsx.
+
+Запуск без интерфейса: python -m data.importers FILE [--db db/notebook.db]
+"""
+import argparse
+import collections
+import csv
+import datetime
+import functools
+import itertools
+import os
+
+from data.category_registry import categories as category_registry
+from data.bulk import Inserter
+from data.export import FIELDS, LABELS
+
+CHUNK_SIZE = 10000  # число строк, вставляемых одним executemany
+HEADERS = {label.casefold(): field for label, field in zip(LABELS, FIELDS)}  # заголовки выгрузки в xlsx
+HEADERS.update({field: field for field in FIELDS})
+HEADERS.update({'category_name': 'category', 'date': 'purchase_date', 'дата': 'purchase_date'})
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S')
+
+ImportResult = collections.namedtuple('ImportResult', 'imported skipped')
+
+
+def read_csv(path, chunk_size=CHUNK_SIZE):
+    """Чтение CSV частями (разделитель определяется автоматически)"""
+    with open(path, encoding='utf-8-sig', newline='') as file:
+        sample = file.read(4096)
+        file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from _chunked(csv.reader(file, dialect), chunk_size)
+
+
+def read_xlsx(path, chunk_size=CHUNK_SIZE):
+    """Чтение первого листа книги excel частями в режиме read-only"""
+    import openpyxl  # только при загрузке xlsx
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from _chunked(wb.worksheets[0].iter_rows(values_only=True), chunk_size)
+    finally:
+        wb.close()
+
+
+READERS = {'.csv': read_csv, '.xlsx': read_xlsx}  # форматы по расширению файла
+
+
+def _chunked(rows, chunk_size):
+    """Строки как словари по заголовку первой строки, частями по chunk_size"""
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = [HEADERS.get(str(title).strip().casefold()) if title is not None else None for title in header]
+    if 'name' not in columns or 'category' not in columns:
+        raise ValueError('В файле должны быть столбцы с названием покупки и категорией.')
+    while True:
+        chunk = [{field: value for field, value in zip(columns, row) if field}
+                 for row in itertools.islice(rows, chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_price(value) -> float:
+    """Цена из числа или строки (допускаются пробелы и десятичная запятая)"""
+    if value is None or value == '':
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(str(value).replace(' ', '').replace('\xa0', '').replace(',', '.'))
+
+
+def parse_date(value) -> datetime.date:
+    """Дата покупки из даты excel или строки в одном из DATE_FORMATS"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if value is None or not str(value).strip():
+        return datetime.date.today()
+    return _parse_date_text(str(value).strip())
+
+
+@functools.lru_cache(maxsize=4096)  # в выписках мало различных дат, а strptime медленный
+def _parse_date_text(text) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Неизвестный формат даты: {text}')
+
+
+def import_rows(session, rows_chunks, progress=None) -> ImportResult:
+    """Вставка строк пачками в одной транзакции; некорректные строки пропускаются
+
+    Большие загрузки идут через bulk.Inserter без построчного обновления индексов, поиска и итогов."""
+    imported = skipped = 0
+    created = datetime.datetime.now().isoformat(sep=' ')  # формат хранения DateTime в SQLite
+    insert = 'INSERT INTO items (name, price, purchase_date, about, created_date, category_id) ' \
+             'VALUES (?, ?, ?, ?, ?, ?)'
+    try:
+        with Inserter(session.connection()) as inserter:
+            for chunk in rows_chunks:
+                rows = []
+                for row in chunk:
+                    name, category = str(row.get('name') or '').strip(), str(row.get('category') or '').strip()
+                    try:
+                        if not name or not category:
+                            raise ValueError('пустое название или категория')
+                        rows.append((name, category, parse_price(row.get('price')),
+                                     parse_date(row.get('purchase_date')).isoformat(),
+                                     str(row.get('about') or '').strip()))
+                    except ValueError:
+                        skipped += 1
+                categories = category_registry.resolve(session, (row[1] for row in rows))
+                if rows:  # executemany без преобразования типов на стороне SQLAlchemy
+                    inserter.insert(insert, [
+                        (name, price, purchase_date, about, created, categories[category.casefold()])
+                        for name, category, price, purchase_date, about in rows])
+                imported += len(rows)
+                if progress is not None:
+                    progress(imported)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return ImportResult(imported, skipped)
+
+
+def import_file(session, path, chunk_size=CHUNK_SIZE, progress=None) -> ImportResult:
+    """Загрузка покупок из файла CSV или xlsx"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f'Неподдерживаемый формат файла: {extension}')
+    return import_rows(session, READERS[extension](path, chunk_size), progress)
+
+
+def main() -> None:
+    from data import db_session
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('file', help='файл CSV или xlsx')
+    parser.add_argument('--db', default='db/notebook.db', help='файл базы данных')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    db_session.global_init(args.db)
+    session = db_session.create_session()
+    try:
+        result = import_file(session, args.file, args.chunk_size,
+                             progress=lambda imported: print(f'\rЗагружено записей: {imported}', end=''))
+    finally:
+        session.close()
+    print(f'\nГотово: загружено {result.imported}, пропущено {result.skipped}')
+
+
+if __name__ == '__main__':
+    main()
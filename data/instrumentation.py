@@ -0,0 +1,154 @@
+"""Замеры действий пользователя: время, SQL-запросы, прочитанные строки и перерисовка таблицы.
+
+Записи выгружаются в JSON или в формате Chrome trace (открывается в chrome://tracing и Perfetto).
+"""
+import collections
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+import weakref
+
+from data import db_session
+
+MAX_ACTIONS = 1000  # хранятся только последние действия
+MAX_SPANS = 1000  # интервалов (запросов, фоновых задач) на одно действие
+
+
+class ActionRecord(db_session.StatementCounter):
+    """Замер одного действия вместе с его фоновыми запросами и доставкой их результатов"""
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+        self.created = datetime.datetime.now()
+        self.started = time.perf_counter()
+        self.duration = 0.0  # с, от начала действия до окончания последней связанной с ним работы
+        self.repaint = 0.0  # с, перерисовка таблицы
+        self.spans = []  # (категория, название, поток, начало, длительность, параметры)
+        self._lock = threading.Lock()  # запросы действия могут выполняться в нескольких потоках
+
+    def add_statement(self, statement, started, elapsed) -> None:
+        with self._lock:
+            super().add_statement(statement, started, elapsed)
+            self._add_span('sql', statement.split(None, 1)[0] if statement else 'SQL', started, elapsed,
+                           {'sql': statement})
+
+    def add_rows(self, count) -> None:
+        with self._lock:
+            super().add_rows(count)
+
+    def add_span(self, category, name, started, elapsed, args=None) -> None:
+        """Интервал работы действия (category: action, task, delivery, repaint)"""
+        with self._lock:
+            if category == 'repaint':
+                self.repaint += elapsed
+            self._add_span(category, name, started, elapsed, args)
+            self.duration = max(self.duration, started + elapsed - self.started)
+
+    def _add_span(self, category, name, started, elapsed, args) -> None:
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((category, name, threading.get_ident(), started, elapsed, args))
+
+    def as_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'created': self.created.isoformat(timespec='milliseconds'),
+            'duration_ms': round(self.duration * 1000, 3),
+            'statements': self.count,
+            'sql_ms': round(self.elapsed * 1000, 3),
+            'rows': self.rows,
+            'repaint_ms': round(self.repaint * 1000, 3),
+        }
+
+
+class Recorder:
+    """Журнал замеров последних действий (по умолчанию выключен)"""
+
+    def __init__(self, size=MAX_ACTIONS):
+        self.enabled = False
+        self.profiler = None  # профилировщик действий (data.profiling.ActionProfiler)
+        self.actions = collections.deque(maxlen=size)
+        self._local = threading.local()
+        self._listeners = []
+
+    def current(self):
+        """Замер, к которому относится работа текущего потока (None вне действий)"""
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    @contextlib.contextmanager
+    def action(self, name):
+        """Замер действия name; действие, вызванное из другого действия, входит в него интервалом"""
+        current = self.current()
+        if not self.enabled or current is not None:
+            with self.resume(current, name, 'action'):
+                yield current
+            return
+        record = ActionRecord(name)
+        self.actions.append(record)
+        with self.resume(record, name, 'action'):
+            yield record
+
+    @contextlib.contextmanager
+    def resume(self, record, name, category='task'):
+        """Продолжение замера record в текущем потоке (фоновая задача или доставка её результата)"""
+        if record is None:
+            yield
+            return
+        stack = self._local.__dict__.setdefault('stack', [])
+        counting = record not in stack  # повторное добавление счётчика удвоило бы число запросов
+        stack.append(record)
+        started = time.perf_counter()
+        try:
+            if counting:
+                with db_session.count_statements(record), self._profiled(record):
+                    yield
+            else:
+                yield
+        finally:
+            stack.pop()
+            record.add_span(category, name, started, time.perf_counter() - started)
+            if threading.current_thread() is threading.main_thread():  # подписчики - виджеты окна
+                for listener in [ref() for ref in self._listeners]:
+                    if listener is not None:
+                        listener(record)
+
+    def _profiled(self, record):
+        return self.profiler.profile(record) if self.profiler is not None else contextlib.nullcontext()
+
+    def subscribe(self, callback) -> None:
+        """Подписка на обновления замеров: callback(record) в основном потоке (хранится слабая ссылка)"""
+        self._listeners.append(weakref.WeakMethod(callback) if hasattr(callback, '__self__') else weakref.ref(callback))
+
+    def unsubscribe(self, callback) -> None:
+        self._listeners[:] = [ref for ref in self._listeners if ref() is not None and ref() != callback]
+
+    def clear(self) -> None:
+        self.actions.clear()
+
+    def dump_json(self, path) -> str:
+        """Сохранение итогов действий в JSON"""
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump([record.as_dict() for record in list(self.actions)], file, ensure_ascii=False, indent=2)
+        return path
+
+    def dump_trace(self, path) -> str:
+        """Сохранение действий с их интервалами в формате Chrome trace"""
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'Действия'}}]
+        for record in list(self.actions):
+            events.append({'name': record.name, 'cat': 'action', 'ph': 'X', 'pid': pid, 'tid': 0,
+                           'ts': record.started * 1e6, 'dur': record.duration * 1e6, 'args': record.as_dict()})
+            for category, name, thread, started, elapsed, args in list(record.spans):
+                events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': thread,
+                               'ts': started * 1e6, 'dur': elapsed * 1e6,
+                               'args': {'action': record.name, **(args or {})}})
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file, ensure_ascii=False)
+        return path
+
+
+recorder = Recorder()  # общий журнал приложения
@@ -7,16 +7,20 @@ from data.db_session import SqlAlchemyBase
 class Item(SqlAlchemyBase):
     """Модели записи"""
     __tablename__ = 'items'
+    __table_args__ = (
+        sqlalchemy.Index('ix_items_category_id_purchase_date_price', 'category_id', 'purchase_date',
+                         'price'),  # фильтр категории; покрывает итоги по категориям без чтения таблицы
+    )
 
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
-    name = sqlalchemy.Column(sqlalchemy.String)
-    price = sqlalchemy.Column(sqlalchemy.Float)
-    purchase_date = sqlalchemy.Column(sqlalchemy.Date)
+    name = sqlalchemy.Column(sqlalchemy.String, index=True)
+    price = sqlalchemy.Column(sqlalchemy.Float, index=True)
+    purchase_date = sqlalchemy.Column(sqlalchemy.Date, index=True)
     about = sqlalchemy.Column(sqlalchemy.String, nullable=True)
     created_date = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now)
     category_id = sqlalchemy.Column(sqlalchemy.Integer,
                                     sqlalchemy.ForeignKey("categories.id"))  # внешний ключ id категории
-    category = orm.relation('Category')  # привязываем запись к категории
+    category = orm.relation('Category', back_populates='items')  # привязываем запись к категории
 
     def __repr__(self):
         return f'<Item> {self.name}'
@@ -0,0 +1,96 @@
+import sqlalchemy as sa
+
+
+def add_indexes(connection) -> None:
+    """Версия 1: индексы для сортировки, фильтров и поиска категорий"""
+    from data.items import Item
+    from data.catergories import Category
+
+    for table in (Item.__table__, Category.__table__):
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)  # существующие индексы не пересоздаются
+    connection.execute(sa.text('ANALYZE'))  # статистика для планировщика запросов
+
+
+def add_search_index(connection) -> None:
+    """Версия 2: триграммный полнотекстовый индекс по названию и описанию, обновляемый триггерами"""
+    connection.execute(sa.text("CREATE VIRTUAL TABLE IF NOT EXISTS items_search USING fts5("
+                               "name, about, content='items', content_rowid='id', "
+                               "tokenize='trigram case_sensitive 0')"))  # сами строки хранятся только в items
+    connection.execute(sa.text("CREATE TRIGGER IF NOT EXISTS items_search_insert AFTER INSERT ON items BEGIN "
+                               "INSERT INTO items_search (rowid, name, about) VALUES (new.id, new.name, new.about); "
+                               "END"))
+    connection.execute(sa.text("CREATE TRIGGER IF NOT EXISTS items_search_delete AFTER DELETE ON items BEGIN "
+                               "INSERT INTO items_search (items_search, rowid, name, about) "
+                               "VALUES ('delete', old.id, old.name, old.about); "
+                               "END"))
+    connection.execute(sa.text("CREATE TRIGGER IF NOT EXISTS items_search_update AFTER UPDATE OF name, about ON items "
+                               "BEGIN "
+                               "INSERT INTO items_search (items_search, rowid, name, about) "
+                               "VALUES ('delete', old.id, old.name, old.about); "
+                               "INSERT INTO items_search (rowid, name, about) VALUES (new.id, new.name, new.about); "
+                               "END"))
+    connection.execute(sa.text("INSERT INTO items_search (items_search) VALUES ('rebuild')"))  # уже имеющиеся записи
+
+
+def add_price_to_category_index(connection) -> None:
+    """Версия 3: цена в составном индексе категории и даты для итогов без чтения строк таблицы"""
+    connection.execute(sa.text('DROP INDEX IF EXISTS ix_items_category_id_purchase_date'))
+    add_indexes(connection)
+
+
+def add_monthly_totals(connection) -> None:
+    """Версия 4: итоги по категориям и месяцам, пересчитываемые триггерами при каждом изменении items"""
+    from data.monthly_totals import MonthlyTotal
+    from data.analytics import rebuild_totals
+
+    MonthlyTotal.__table__.create(connection, checkfirst=True)
+    add = "INSERT INTO monthly_totals (category_id, month, count, total) " \
+          "VALUES (coalesce(new.category_id, 0), coalesce(substr(new.purchase_date, 1, 7), ''), 1, " \
+          "coalesce(new.price, 0)) " \
+          "ON CONFLICT (category_id, month) DO UPDATE SET count = count + 1, total = total + excluded.total; "
+    subtract = "UPDATE monthly_totals SET count = count - 1, total = total - coalesce(old.price, 0) " \
+               "WHERE category_id = coalesce(old.category_id, 0) " \
+               "AND month = coalesce(substr(old.purchase_date, 1, 7), ''); " \
+               "DELETE FROM monthly_totals WHERE category_id = coalesce(old.category_id, 0) " \
+               "AND month = coalesce(substr(old.purchase_date, 1, 7), '') AND count <= 0; "
+    connection.execute(sa.text(f"CREATE TRIGGER IF NOT EXISTS monthly_totals_insert AFTER INSERT ON items "
+                               f"BEGIN {add}END"))
+    connection.execute(sa.text(f"CREATE TRIGGER IF NOT EXISTS monthly_totals_delete AFTER DELETE ON items "
+                               f"BEGIN {subtract}END"))
+    connection.execute(sa.text(f"CREATE TRIGGER IF NOT EXISTS monthly_totals_update "
+                               f"AFTER UPDATE OF price, purchase_date, category_id ON items "
+                               f"BEGIN {subtract}{add}END"))
+    rebuild_totals(connection)  # итоги уже имеющихся записей
+
+
+def drop_category_nocase_index(connection) -> None:
+    """Версия 5: индекс названий категорий с NOCASE не используется: NOCASE не работает с кириллицей, а поиск
+    без учёта регистра идёт по кэшу категорий (casefold), точный - по уникальному индексу name"""
+    connection.execute(sa.text('DROP INDEX IF EXISTS ix_categories_name_nocase'))
+
+
+MIGRATIONS = [
+    add_indexes,
+    add_search_index,
+    add_price_to_category_index,
+    add_monthly_totals,
+    drop_category_nocase_index,
+]  # номер версии схемы = индекс миграции + 1
+
+
+def get_version(connection) -> int:
+    """Текущая версия схемы базы данных"""
+    return connection.execute(sa.text('PRAGMA user_version')).scalar()
+
+
+def upgrade(engine) -> int:
+    """Применение недостающих миграций; каждая выполняется в своей транзакции"""
+    with engine.connect() as connection:
+        version = get_version(connection)
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with engine.begin() as connection:
+            migration(connection)
+            connection.execute(sa.text(f'PRAGMA user_version = {number}'))
+        print(f"Схема базы данных обновлена до версии {number}")
+    return max(version, len(MIGRATIONS))
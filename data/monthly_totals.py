@@ -0,0 +1,16 @@
+import sqlalchemy
+from data.db_session import SqlAlchemyBase
+
+
+class MonthlyTotal(SqlAlchemyBase):
+    """Модель итогов по категории за месяц (обновляется триггерами таблицы items)"""
+    __tablename__ = 'monthly_totals'
+    __table_args__ = {'sqlite_with_rowid': False}  # таблица хранится в порядке первичного ключа
+
+    category_id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=False)  # 0 - без категории
+    month = sqlalchemy.Column(sqlalchemy.String, primary_key=True)  # 'ГГГГ-ММ', пустая строка - без даты
+    count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    total = sqlalchemy.Column(sqlalchemy.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f'<MonthlyTotal> {self.category_id} {self.month}'
@@ -0,0 +1,27 @@
+import weakref
+
+_listeners = []  # слабые ссылки на обработчики изменений записей
+
+
+def subscribe(callback) -> None:
+    """Подписка на изменения записей: callback(added, updated, removed) со списками id"""
+    ref = weakref.WeakMethod(callback) if hasattr(callback, '__self__') else weakref.ref(callback)
+    _listeners.append(ref)
+
+
+def unsubscribe(callback) -> None:
+    """Отписка от изменений записей"""
+    _listeners[:] = [ref for ref in _listeners if ref() is not None and ref() != callback]
+
+
+def notify(added=(), updated=(), removed=()) -> None:
+    """Оповещение подписчиков; вызывается функциями записи data.service и data.bulk после фиксации транзакции
+
+    Изменения через объекты ORM и загрузки из файла (data.importers, data.generator) не оповещают."""
+    if not (added or updated or removed):
+        return
+    _listeners[:] = [ref for ref in _listeners if ref() is not None]
+    for ref in list(_listeners):
+        callback = ref()
+        if callback is not None:
+            callback(list(added), list(updated), list(removed))
@@ -0,0 +1,104 @@
+"""Профилирование действий пользователя (режим python main.py --profile).
+
+Для каждого действия сохраняется файл pstats (.prof) с его кодом в потоке интерфейса и в фоновых потоках
+(с Python 3.12 - только в потоке интерфейса, см. ActionProfiler): его открывают python -m pstats, snakeviz,
+а flameprof и gprof2dot строят по нему flame graph и граф вызовов.
+Если установлен сэмплирующий профилировщик py-spy, весь процесс записывается им в SVG flame graph.
+"""
+import contextlib
+import cProfile
+import os
+import pstats
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+
+MAIN_THREAD_ONLY = sys.version_info >= (3, 12)  # cProfile работает через sys.monitoring: один на процесс
+
+
+def _file_name(name) -> str:
+    return re.sub(r'[^\w.-]+', '_', name)
+
+
+class ActionProfiler:
+    """cProfile для каждого замера data.instrumentation (подключается как recorder.profiler)
+
+    С Python 3.12 второй включённый cProfile вызывает ValueError, поэтому профилируется только поток
+    интерфейса, а фоновые задачи в нём видны как вызовы из всех потоков процесса."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._profiles = []  # (замер, cProfile.Profile) в порядке окончания
+        self._lock = threading.Lock()  # профили фоновых задач добавляются из потоков пула
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def profile(self, record):
+        """Профилирование работы замера record в текущем потоке"""
+        if getattr(self._local, 'active', False) or (MAIN_THREAD_ONLY and
+                                                     threading.current_thread() is not threading.main_thread()):
+            yield  # в потоке может работать только один профилировщик
+            return
+        profile = cProfile.Profile()
+        self._local.active = True
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._local.active = False
+            with self._lock:
+                self._profiles.append((record, profile))
+
+    def save(self) -> list:
+        """Файлы .prof по действиям, общий session.prof и сводка session.txt; возвращает пути файлов действий"""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return []
+        os.makedirs(self.directory, exist_ok=True)
+        grouped = {}  # id замера -> (замер, профили его потоков)
+        for record, profile in profiles:
+            grouped.setdefault(id(record), (record, []))[1].append(profile)
+        paths = []
+        for number, (record, group) in enumerate(sorted(grouped.values(), key=lambda value: value[0].started), 1):
+            path = os.path.join(self.directory, f'{number:04d}_{_file_name(record.name)}.prof')
+            pstats.Stats(*group).dump_stats(path)
+            paths.append(path)
+        path = os.path.join(self.directory, 'session.prof')
+        pstats.Stats(*(profile for _, profile in profiles)).dump_stats(path)
+        with open(os.path.join(self.directory, 'session.txt'), 'w', encoding='utf-8') as file:
+            pstats.Stats(path, stream=file).sort_stats('cumulative').print_stats(50)
+        return paths
+
+
+class SamplingProfiler:
+    """Сэмплирующий профилировщик py-spy, подключённый к текущему процессу"""
+    executable = 'py-spy'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'py-spy.svg')
+        self._process = None
+
+    @classmethod
+    def available(cls) -> bool:
+        return shutil.which(cls.executable) is not None
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._process = subprocess.Popen([shutil.which(self.executable), 'record', '--pid', str(os.getpid()),
+                                          '--threads', '--format', 'flamegraph', '--output', self.path])
+        time.sleep(0.5)  # py-spy подключается к процессу не сразу
+
+    def stop(self) -> str:
+        """Остановка записи (py-spy сохраняет flame graph по SIGINT); возвращает путь к SVG"""
+        if self._process is not None and self._process.poll() is None:
+            self._process.send_signal(signal.SIGINT)
+            self._process.wait(timeout=60)
+        return self.path
@@ -0,0 +1,152 @@
+import collections
+import dataclasses
+import datetime
+from typing import Optional
+
+import sqlalchemy as sa
+from data import db_session
+from data.items import Item
+from data.catergories import Category
+
+SORT_COLUMNS = {
+    'price': Item.price,
+    'date': Item.purchase_date,
+}  # допустимые ключи сортировки
+SORT_ATTRIBUTES = {
+    'price': 'price',
+    'date': 'purchase_date',
+}  # атрибуты записи, соответствующие ключам сортировки
+ItemRow = collections.namedtuple('ItemRow', 'id name category_id category price purchase_date about')  # только чтение
+PAGE_SIZE = 500  # строк таблицы, читаемых за один запрос при прокрутке
+SEARCH_MIN_LENGTH = 3  # триграммный индекс находит только подстроки не короче трёх символов
+search_index = sa.table('items_search', sa.column('rowid'))  # создаётся миграцией add_search_index
+
+
+@dataclasses.dataclass(frozen=True)
+class ItemFilter:
+    """Параметры выборки записей: фильтр, сортировка и поиск"""
+    category: Optional[str] = None  # точное название категории
+    sort: Optional[str] = None  # ключ из SORT_COLUMNS, без него сначала идут последние добавленные записи
+    descending: bool = False
+    start_date: Optional[datetime.date] = None  # период покупки (границы включительно)
+    end_date: Optional[datetime.date] = None
+    search: Optional[str] = None  # подстрока названия или описания покупки без учёта регистра
+
+    def replace(self, **changes) -> 'ItemFilter':
+        """Копия фильтра с изменёнными параметрами"""
+        return dataclasses.replace(self, **changes)
+
+    def sort_key(self):
+        """Ключ сортировки записи в Python, совпадающий с ORDER BY из apply_filter"""
+        if self.sort is None:
+            return lambda item: item.id
+        attribute = SORT_ATTRIBUTES[self.sort]
+
+        def key(item):
+            value = getattr(item, attribute)
+            return value is not None, value, item.id  # в SQLite NULL меньше любого значения
+        return key
+
+    @property
+    def reverse(self) -> bool:
+        """Строки таблицы идут по убыванию ключа сортировки"""
+        return self.sort is None or self.descending
+
+
+def apply_filter(query, items_filter: ItemFilter):
+    """Добавление условий WHERE и ORDER BY к запросу, в котором уже присоединена таблица категорий"""
+    if items_filter.category is not None:
+        query = query.filter(Category.name == items_filter.category)
+    if items_filter.start_date is not None:
+        query = query.filter(Item.purchase_date >= items_filter.start_date)
+    if items_filter.end_date is not None:
+        query = query.filter(Item.purchase_date <= items_filter.end_date)
+    if items_filter.search and items_filter.search.strip():
+        query = query.filter(search_clause(items_filter.search.strip()))
+    if items_filter.sort is None:
+        return query.order_by(Item.id.desc())
+    column = SORT_COLUMNS[items_filter.sort]
+    if items_filter.descending:
+        return query.order_by(column.desc(), Item.id.desc())
+    return query.order_by(column.asc(), Item.id.asc())
+
+
+def search_clause(text):
+    """Условие поиска подстроки в названии или описании без учёта регистра"""
+    if len(text) >= SEARCH_MIN_LENGTH:  # по индексу items_search
+        phrase = '"' + text.replace('"', '""') + '"'  # фраза целиком, без синтаксиса запросов FTS5
+        return Item.id.in_(sa.select(search_index.c.rowid)
+                           .where(sa.literal_column('items_search').op('MATCH')(phrase)))
+    pattern = text.casefold()
+    # casefold регистрируется в db_session, т.к. встроенный lower() в SQLite не работает с кириллицей
+    return sa.or_(sa.func.casefold(Item.name).contains(pattern, autoescape=True),
+                  sa.func.casefold(Item.about).contains(pattern, autoescape=True))
+
+
+def rows_statement(items_filter: Optional[ItemFilter] = None):
+    """SELECT столбцов ItemRow с учётом фильтра и сортировки"""
+    statement = sa.select(Item.id, Item.name, Item.category_id, Category.name, Item.price, Item.purchase_date,
+                          Item.about).join_from(Item, Category, Item.category_id == Category.id)
+    return apply_filter(statement, items_filter or ItemFilter())
+
+
+def keyset_clause(items_filter: ItemFilter, after):
+    """Условие для записей, идущих в порядке apply_filter после записи after (постраничное чтение без OFFSET)"""
+    if items_filter.sort is None:
+        return Item.id < after.id
+    column, value = SORT_COLUMNS[items_filter.sort], getattr(after, SORT_ATTRIBUTES[items_filter.sort])
+    # NULL в SQLite меньше любого значения: при возрастании такие записи идут первыми, при убывании - последними
+    if items_filter.descending:
+        if value is None:
+            return sa.and_(column.is_(None), Item.id < after.id)
+        return sa.or_(sa.tuple_(column, Item.id) < sa.tuple_(sa.literal(value, column.type), after.id),
+                      column.is_(None))
+    if value is None:
+        return sa.or_(sa.and_(column.is_(None), Item.id > after.id), column.isnot(None))
+    return sa.tuple_(column, Item.id) > sa.tuple_(sa.literal(value, column.type), after.id)
+
+
+def query_rows(session, items_filter: Optional[ItemFilter] = None, ids=None, after=None, limit=None) -> list:
+    """Записи ItemRow для экранов только для чтения: без объектов ORM, identity map и отложенной загрузки
+
+    after и limit задают страницу: не более limit записей, следующих за записью after."""
+    items_filter = items_filter or ItemFilter()
+    statement = rows_statement(items_filter).limit(limit)
+    if ids is not None:
+        statement = statement.where(Item.id.in_(ids))
+    if after is not None:
+        statement = statement.where(keyset_clause(items_filter, after))
+    dates = {}
+    with db_session.gc_paused():
+        return [ItemRow(id_, name, category_id, category, price, _date(purchase_date, dates), about)
+                for chunk in db_session.driver_rows(session, statement)
+                for id_, name, category_id, category, price, purchase_date, about in chunk]
+
+
+def count_items(session, items_filter: Optional[ItemFilter] = None) -> int:
+    """Число записей выборки (по индексам items, категории присоединяются только для фильтра по категории)"""
+    items_filter = items_filter or ItemFilter()
+    statement = sa.select(sa.func.count()).select_from(Item)
+    if items_filter.category is not None:
+        statement = statement.join(Category, Item.category_id == Category.id)
+    else:
+        statement = statement.where(Item.category_id.isnot(None))  # как внутреннее соединение в rows_statement
+    return session.execute(apply_filter(statement, items_filter).order_by(None)).scalar()
+
+
+def _date(value, cache):
+    """Дата из строки ISO в базе (одинаковые даты разбираются один раз)"""
+    if value is None:
+        return None
+    if value not in cache:
+        cache[value] = datetime.date.fromisoformat(value)
+    return cache[value]
+
+
+def query_items(session, items_filter: Optional[ItemFilter] = None):
+    """Запрос объектов Item с категориями одним SELECT в порядке отображения
+
+    Окно и data.service читают строки через query_rows и меняют записи пачками без ORM; запрос объектов остаётся
+    для замеров планов запросов и профилей SQLite (benchmarks) и для сверки с query_rows в тестах."""
+    query = db_session.query(session, Item, 'table').join(Item.category)
+    return apply_filter(query, items_filter or ItemFilter())
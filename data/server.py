@@ -0,0 +1,210 @@
+"""Локальный HTTP-сервер с JSON API над data.service для загрузки и чтения покупок из других программ.
+
+Запуск: python -m data.server [--db db/notebook.db] [--host 127.0.0.1] [--port 8765] [--profile performance]
+
+    GET    /items?category=&sort=&descending=&start_date=&end_date=&search=&after_id=&limit=
+    GET    /items/count?...                      {"count": N}
+    POST   /items         [{запись}, ...]        {"ids": [...]}, одна транзакция на запрос
+    PATCH  /items         [{"id": 1, ...}, ...]  {"updated": N}
+    DELETE /items         {"ids": [...]}         {"deleted": N}
+    GET    /summary?group_by=category&percentiles=25,50,75&...
+    GET    /export?format=csv&...                файл выгрузки
+    GET    /categories
+    PATCH  /categories    {"id": 1, "name": "..."}
+
+Каждый запрос выполняется в своём потоке со своей сессией; соединения SQLite берутся из пула движка
+(db_session.create_engine), а не открываются заново. Запись в базу идёт по одному запросу за раз:
+SQLite всё равно допускает одного пишущего, а общая блокировка избавляет от ожидания busy_timeout.
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import urllib.parse
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from data import db_session, service
+from data.export import EXPORTERS
+
+MAX_BODY = 256 * 1024 * 1024  # байт в теле запроса
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson',
+                 'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'}
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Обработка запросов API; ошибки проверки данных возвращаются с кодом 400"""
+    server_version = 'notebook'
+    protocol_version = 'HTTP/1.1'  # соединение с клиентом сохраняется между запросами
+    disable_nagle_algorithm = True  # иначе ответ на небольшой запрос ждёт подтверждения TCP (~40 мс)
+    routes = {
+        ('GET', '/items'): 'find_items',
+        ('GET', '/items/count'): 'count_items',
+        ('POST', '/items'): 'add_items',
+        ('PATCH', '/items'): 'edit_items',
+        ('DELETE', '/items'): 'delete_items',
+        ('GET', '/summary'): 'summary',
+        ('GET', '/export'): 'export',
+        ('GET', '/categories'): 'categories',
+        ('PATCH', '/categories'): 'rename_category',
+    }  # (метод, путь) -> метод обработчика
+    writes = {'add_items', 'edit_items', 'delete_items', 'rename_category'}  # выполняются под write_lock
+
+    def do_GET(self) -> None:
+        self.dispatch()
+
+    def do_POST(self) -> None:
+        self.dispatch()
+
+    def do_PATCH(self) -> None:
+        self.dispatch()
+
+    def do_DELETE(self) -> None:
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        self.params = dict(urllib.parse.parse_qsl(url.query))
+        name = self.routes.get((self.command, url.path.rstrip('/') or '/'))
+        session = db_session.create_session()
+        try:
+            body = self.read_body(required=name is not None and self.command in ('POST', 'PATCH', 'DELETE'))
+            if name is None:  # тело прочитано: иначе оно сбило бы следующий запрос соединения
+                self.send_json({'error': f'Неизвестный запрос: {self.command} {url.path}'}, HTTPStatus.NOT_FOUND)
+                return
+            lock = self.server.write_lock if name in self.writes else contextlib.nullcontext()
+            with lock:
+                result = getattr(self, name)(session, body)
+            if result is not None:
+                self.send_json(*result)
+        except service.ValidationError as error:
+            self.send_json({'error': str(error)}, HTTPStatus.BAD_REQUEST)
+        except Exception as error:  # сервер продолжает работу после ошибки запроса
+            self.log_error('%s', error)
+            self.send_json({'error': str(error)}, HTTPStatus.INTERNAL_SERVER_ERROR)
+        finally:
+            session.close()
+
+    def read_body(self, required):
+        """Тело запроса JSON или None"""
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise service.ValidationError('Слишком большой запрос')
+        if not length:
+            if required:
+                raise service.ValidationError('Нет данных в теле запроса')
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            raise service.ValidationError('Некорректный JSON') from None
+
+    def send_json(self, value, status=HTTPStatus.OK) -> None:
+        data = json.dumps(value, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def int_param(self, name, default=None):
+        value = self.params.get(name)
+        try:
+            return int(value) if value else default
+        except ValueError:
+            raise service.ValidationError(f'Параметр {name} должен быть целым числом') from None
+
+    def find_items(self, session, body) -> tuple:
+        rows = service.find_items(session, service.parse_filter(self.params), self.int_param('after_id'),
+                                  self.int_param('limit', service.PAGE_SIZE))
+        return {'items': [service.row_dict(row) for row in rows]},
+
+    def count_items(self, session, body) -> tuple:
+        return {'count': service.count(session, service.parse_filter(self.params))},
+
+    def add_items(self, session, body) -> tuple:
+        records = body.get('items') if isinstance(body, dict) else body
+        if not isinstance(records, list):
+            raise service.ValidationError('Ожидается список записей')
+        return {'ids': service.add_items(session, records)}, HTTPStatus.CREATED
+
+    def edit_items(self, session, body) -> tuple:
+        changes = body.get('items') if isinstance(body, dict) else body
+        if not isinstance(changes, list):
+            raise service.ValidationError('Ожидается список изменений')
+        return {'updated': service.edit_items(session, changes)},
+
+    def delete_items(self, session, body) -> tuple:
+        ids = body.get('ids') if isinstance(body, dict) else body
+        if not isinstance(ids, list) or not all(isinstance(item_id, int) for item_id in ids):
+            raise service.ValidationError('Ожидается список id')
+        return {'deleted': len(service.delete_items(session, ids))},
+
+    def summary(self, session, body) -> tuple:
+        try:
+            percentiles = [float(value) for value in self.params.get('percentiles', '').split(',') if value]
+        except ValueError:
+            raise service.ValidationError('Перцентили должны быть числами') from None
+        rows = service.aggregate(session, service.parse_filter(self.params),
+                                 self.params.get('group_by', 'category'), percentiles)
+        return {'groups': [service.summary_dict(row) for row in rows]},
+
+    def export(self, session, body) -> None:
+        """Выгрузка во временный файл и передача его клиенту"""
+        name = self.params.get('format', 'csv')
+        if name not in EXPORTERS:
+            raise service.ValidationError(f'Неизвестный формат выгрузки: {name}')
+        extension = EXPORTERS[name].extension
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'report.{extension}')
+            service.export_items(session, name, path, service.parse_filter(self.params))
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', CONTENT_TYPES.get(extension, 'application/octet-stream'))
+            self.send_header('Content-Length', str(os.path.getsize(path)))
+            self.send_header('Content-Disposition', f'attachment; filename="report.{extension}"')
+            self.end_headers()
+            with open(path, 'rb') as file:
+                shutil.copyfileobj(file, self.wfile)
+
+    def categories(self, session, body) -> tuple:
+        return {'categories': service.list_categories(session)},
+
+    def rename_category(self, session, body) -> tuple:
+        if not isinstance(body, dict) or not isinstance(body.get('id'), int):
+            raise service.ValidationError('Ожидается объект с id и name')
+        return {'id': body['id'], 'name': service.rename_category(session, body['id'], body.get('name'))},
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True  # потоки запросов не задерживают остановку сервера
+
+    def __init__(self, address, handler=Handler):
+        super().__init__(address, handler)
+        self.write_lock = threading.Lock()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='db/notebook.db', help='файл базы данных')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--profile', choices=db_session.PROFILES, default=service.default_profile(),
+                        help='настройки SQLite')
+    args = parser.parse_args()
+    db_session.global_init(args.db, args.profile)
+    server = Server((args.host, args.port))
+    print(f'Сервер запущен: http://{args.host}:{server.server_port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
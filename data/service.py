@@ -0,0 +1,369 @@
+"""Операции с покупками без интерфейса: добавление, изменение, удаление, поиск, итоги и выгрузка пачками.
+
+Функции принимают сессию и используются главным окном, командной строкой и HTTP-сервером (data.server).
+Запуск без интерфейса: python -m data.service [--db db/notebook.db] КОМАНДА ...
+    add [FILE]                  записи JSON Lines или JSON-списком из файла или stdin
+    edit [FILE]                 изменения записей в том же формате (обязателен ключ id)
+    delete ID [ID ...]
+    search | count | summary    с параметрами фильтра --category, --sort, --start-date, --search и др.
+    export FORMAT PATH
+    categories
+"""
+import argparse
+import contextlib
+import datetime
+import itertools
+import json
+import math
+import sys
+import time
+from typing import Optional
+
+import sqlalchemy as sa
+from data import bulk, db_session, notifications
+from data.analytics import GROUPS, summarize
+from data.catergories import Category
+from data.category_registry import categories as category_registry
+from data.export import EXPORTERS, export, iter_chunks
+from data.importers import CHUNK_SIZE, parse_date, parse_price
+from data.items import Item
+from data.queries import PAGE_SIZE, SORT_COLUMNS, ItemFilter, count_items, query_rows
+
+MIN_NAME_LENGTH = 3  # символов в названии покупки и категории
+MIN_PRICE = 0.5  # пределы цены и даты покупки, как в окне записи (ui/item_action.py)
+MAX_PRICE = 10 ** 10
+EXPENSIVE_PRICE = 10 ** 8  # дороже - только если в settings.json "ABRAMOVICH": 1
+MIN_DATE = datetime.date(2022, 1, 1)
+MAX_LIMIT = 10000  # записей на одной странице поиска
+COLUMNS = {'name': 'name', 'category': 'category_id', 'price': 'price', 'purchase_date': 'purchase_date',
+           'about': 'about'}  # поле записи -> столбец items
+
+
+class ValidationError(ValueError):
+    """Некорректные данные записи или параметры запроса (текст ошибки показывается пользователю)"""
+
+
+def check_record(record, partial=False, max_price=MAX_PRICE) -> dict:
+    """Значения полей записи в формате хранения; partial - проверяются только переданные поля (изменение)
+
+    Правила те же, что в окне записи: цена от MIN_PRICE до max_price, дата от MIN_DATE до сегодняшней."""
+    values = {}
+    for field, label in (('name', 'покупки'), ('category', 'категории')):
+        if partial and field not in record:
+            continue
+        text = str(record.get(field) or '').strip()
+        if len(text) < MIN_NAME_LENGTH:
+            raise ValidationError(f'Слишком короткое название {label}!')
+        values[field] = text
+    for field, label in (('price', 'цена'), ('purchase_date', 'дата покупки')):
+        if (not partial or field in record) and record.get(field) in (None, ''):
+            raise ValidationError(f'Не указана {label}!')
+    try:
+        if not partial or 'price' in record:
+            values['price'] = parse_price(record['price'])
+        if not partial or 'purchase_date' in record:
+            values['purchase_date'] = parse_date(record['purchase_date'])
+    except (TypeError, ValueError) as error:
+        raise ValidationError(f'Некорректное значение: {error}') from None
+    if 'price' in values:
+        if not math.isfinite(values['price']) or values['price'] < MIN_PRICE:
+            raise ValidationError(f'Цена должна быть числом не меньше {MIN_PRICE}!')
+        if values['price'] > max_price:
+            raise ValidationError('Слишком дорогая покупка! Смиритесь, у вас нет столько денег...')
+    if 'purchase_date' in values:
+        if not MIN_DATE <= values['purchase_date'] <= datetime.date.today():
+            raise ValidationError(f'Дата покупки должна быть с {MIN_DATE:%d.%m.%Y} по сегодняшний день!')
+        values['purchase_date'] = values['purchase_date'].isoformat()
+    if not partial or 'about' in record:
+        values['about'] = str(record.get('about') or '').strip()
+    return values
+
+
+def price_limit() -> float:
+    """Наибольшая цена для записей без окна: дорогие покупки разрешает только "ABRAMOVICH": 1 в settings.json"""
+    return MAX_PRICE if settings().get('ABRAMOVICH') == 1 else EXPENSIVE_PRICE
+
+
+def _checked(records, partial=False, max_price=None):
+    """Проверка записей пачки с номером первой некорректной (с 1)"""
+    if max_price is None:
+        max_price = price_limit()
+    for number, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            raise ValidationError(f'Запись {number}: ожидается объект JSON')
+        try:
+            values = check_record(record, partial, max_price)
+            if partial:
+                values['id'] = int(record['id'])
+        except (KeyError, TypeError, ValueError) as error:
+            message = 'не указан id' if isinstance(error, KeyError) else error
+            raise ValidationError(f'Запись {number}: {message}') from None
+        yield values
+
+
+def add_items(session, records, chunk_size=CHUNK_SIZE, max_price=None) -> list:
+    """Добавление записей одной транзакцией; возвращает их id в порядке records
+
+    records - словари с ключами name, category, price, purchase_date, about (итератор читается частями),
+    max_price - наибольшая цена (по умолчанию price_limit()).
+    При ошибке в любой записи не добавляется ни одна. В одной транзакции SQLite выдаёт новым строкам id подряд,
+    поэтому id части получаются из last_insert_rowid() без RETURNING для каждой строки. Большие пачки
+    вставляются через bulk.Inserter без построчного обновления индексов."""
+    created = datetime.datetime.now().isoformat(sep=' ')  # формат хранения DateTime в SQLite
+    insert = 'INSERT INTO items (name, price, purchase_date, about, created_date, category_id) ' \
+             'VALUES (?, ?, ?, ?, ?, ?)'
+    ids = []
+    records = _checked(records, max_price=max_price)
+    try:
+        connection = session.connection()
+        with bulk.Inserter(connection) as inserter:
+            while True:
+                chunk = list(itertools.islice(records, chunk_size))
+                if not chunk:
+                    break
+                categories = category_registry.resolve(session, (values['category'] for values in chunk))
+                inserter.insert(insert, [
+                    (values['name'], values['price'], values['purchase_date'], values['about'], created,
+                     categories[values['category'].casefold()]) for values in chunk])
+                last = connection.exec_driver_sql('SELECT last_insert_rowid()').scalar()
+                ids.extend(range(last - len(chunk) + 1, last + 1))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    notifications.notify(added=ids)
+    return ids
+
+
+def edit_items(session, changes, max_price=None) -> int:
+    """Изменение записей одной транзакцией: словари с id и изменяемыми полями; возвращает число изменённых записей
+
+    Записи с одинаковым набором полей изменяются одним executemany; max_price - как в add_items."""
+    changes = list(_checked(changes, partial=True, max_price=max_price))
+    groups = {}  # изменяемые столбцы -> строки параметров
+    try:
+        categories = category_registry.resolve(session, (values['category'] for values in changes
+                                                         if 'category' in values))
+        for values in changes:
+            if 'category' in values:
+                values['category'] = categories[values['category'].casefold()]
+            fields = tuple(field for field in COLUMNS if field in values)
+            groups.setdefault(fields, []).append(tuple(values[field] for field in fields) + (values['id'],))
+        updated = 0
+        for fields, rows in groups.items():
+            if not fields:
+                continue
+            assignments = ', '.join(f'{COLUMNS[field]} = ?' for field in fields)
+            updated += session.connection().exec_driver_sql(f'UPDATE items SET {assignments} WHERE id = ?',
+                                                            rows).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    ids = {values['id'] for values in changes}
+    for item in [item for item in session.identity_map.values() if isinstance(item, Item) and item.id in ids]:
+        session.expire(item)  # объекты ORM этой сессии изменены в обход неё
+    notifications.notify(updated=sorted(ids))
+    return updated
+
+
+def delete_items(session, ids) -> list:
+    """Удаление записей одной транзакцией; возвращает удалённые строки для restore_items"""
+    return bulk.delete_items(session, ids)
+
+
+def restore_items(session, rows) -> list:
+    """Возврат удалённых записей (с прежними id, если они не заняты); возвращает их id"""
+    return bulk.restore_items(session, rows)
+
+
+def parse_filter(values) -> ItemFilter:
+    """Фильтр из словаря строк: параметров запроса HTTP или аргументов командной строки"""
+    sort = values.get('sort') or None
+    if sort is not None and sort not in SORT_COLUMNS:
+        raise ValidationError(f'Неизвестная сортировка: {sort}')
+    try:
+        start_date, end_date = (datetime.date.fromisoformat(values[key]) if values.get(key) else None
+                                for key in ('start_date', 'end_date'))
+    except (TypeError, ValueError) as error:
+        raise ValidationError(f'Некорректная дата: {error}') from None
+    return ItemFilter(category=values.get('category') or None, sort=sort,
+                      descending=str(values.get('descending') or '').lower() in ('1', 'true', 'yes'),
+                      start_date=start_date, end_date=end_date, search=values.get('search') or None)
+
+
+def find_items(session, items_filter: Optional[ItemFilter] = None, after_id=None, limit=PAGE_SIZE) -> list:
+    """Страница записей ItemRow выборки: не более limit записей после записи after_id в порядке сортировки"""
+    items_filter = items_filter or ItemFilter()
+    if not 0 < limit <= MAX_LIMIT:
+        raise ValidationError(f'Число записей на странице должно быть от 1 до {MAX_LIMIT}')
+    after = None
+    if after_id is not None:
+        found = query_rows(session, ids=[after_id])  # значения ключа сортировки, даже если запись вне фильтра
+        if not found:
+            raise ValidationError(f'Запись {after_id} не найдена')
+        after = found[0]
+    return query_rows(session, items_filter, after=after, limit=limit)
+
+
+def count(session, items_filter: Optional[ItemFilter] = None) -> int:
+    return count_items(session, items_filter)
+
+
+def aggregate(session, items_filter: Optional[ItemFilter] = None, group_by='category', percentiles=()) -> list:
+    """Итоги цен по группам выборки (см. data.analytics.summarize)"""
+    if group_by not in GROUPS:
+        raise ValidationError(f'Неизвестная группировка: {group_by}')
+    if any(not 0 <= q <= 100 for q in percentiles):
+        raise ValidationError('Перцентили должны быть от 0 до 100')
+    return summarize(session, items_filter, group_by, tuple(percentiles))
+
+
+def export_items(session, name, path, items_filter: Optional[ItemFilter] = None, progress=None) -> int:
+    """Выгрузка выборки в файл формата name из EXPORTERS; возвращает число строк"""
+    if name not in EXPORTERS:
+        raise ValidationError(f'Неизвестный формат выгрузки: {name}')
+    return export(name, path, iter_chunks(session, items_filter or ItemFilter()), progress)
+
+
+def list_categories(session) -> list:
+    """Категории с числом записей: словари id, name, items"""
+    statement = sa.select(Category.id, Category.name, sa.func.count(Item.id)) \
+        .outerjoin(Item, Item.category_id == Category.id).group_by(Category.id).order_by(Category.name)
+    return [{'id': category_id, 'name': name, 'items': items}
+            for category_id, name, items in session.execute(statement)]
+
+
+def rename_category(session, category_id, name) -> str:
+    """Переименование категории (названия без учёта регистра не повторяются); возвращает новое название"""
+    name = str(name or '').strip()
+    if len(name) < MIN_NAME_LENGTH:
+        raise ValidationError('Слишком короткое название категории!')
+    category = session.get(Category, category_id)
+    if category is None:
+        raise ValidationError(f'Категория {category_id} не найдена')
+    if category_registry.find(session, name) not in (None, category_id):
+        raise ValidationError(f'Категория {name} уже существует')
+    category.name = name  # кэш категорий обновится после фиксации
+    session.commit()
+    return name
+
+
+def row_dict(row) -> dict:
+    """Запись ItemRow для JSON"""
+    values = row._asdict()
+    if values['purchase_date'] is not None:
+        values['purchase_date'] = values['purchase_date'].isoformat()
+    return values
+
+
+def summary_dict(summary) -> dict:
+    """Итог группы для JSON"""
+    return {**summary._asdict(), 'percentiles': list(summary.percentiles)}
+
+
+def read_records(file):
+    """Записи из JSON-списка или JSON Lines
+
+    JSON Lines читается по строке, а JSON-список загружается целиком, поэтому большие пачки передаются строками."""
+    first = file.read(1)
+    while first.isspace():
+        first = file.read(1)
+    if first == '[':
+        yield from json.loads(first + file.read())
+        return
+    lines = itertools.chain([first + file.readline()], file)
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                raise ValidationError(f'Строка {number}: некорректный JSON') from None
+
+
+def settings() -> dict:
+    """Настройки окна из settings.json (пустые, если файла нет)"""
+    try:
+        with open('settings.json') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def default_profile() -> str:
+    """Профиль SQLite окна (DB_PROFILE в settings.json): командная строка и сервер открывают базу так же"""
+    return settings().get('DB_PROFILE', 'performance')
+
+
+def _print_json(value) -> None:
+    print(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='db/notebook.db', help='файл базы данных')
+    parser.add_argument('--profile', choices=db_session.PROFILES, default=default_profile(), help='настройки SQLite')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name in ('add', 'edit'):
+        commands.add_parser(name).add_argument('file', nargs='?', default='-', help='файл (по умолчанию stdin)')
+    commands.add_parser('delete').add_argument('ids', type=int, nargs='+')
+    filtered = argparse.ArgumentParser(add_help=False)
+    for option in ('category', 'start-date', 'end-date', 'search'):
+        filtered.add_argument(f'--{option}')
+    filtered.add_argument('--sort', choices=SORT_COLUMNS)
+    filtered.add_argument('--descending', action='store_true')
+    search = commands.add_parser('search', parents=[filtered])
+    search.add_argument('--after-id', type=int)
+    search.add_argument('--limit', type=int, default=PAGE_SIZE)
+    commands.add_parser('count', parents=[filtered])
+    summary = commands.add_parser('summary', parents=[filtered])
+    summary.add_argument('--group-by', choices=GROUPS, default='category')
+    summary.add_argument('--percentiles', type=float, nargs='*', default=())
+    exported = commands.add_parser('export', parents=[filtered])
+    exported.add_argument('format', choices=EXPORTERS)
+    exported.add_argument('path')
+    commands.add_parser('categories')
+    args = parser.parse_args(argv)
+    with contextlib.redirect_stdout(sys.stderr):  # в stdout выводятся только результаты команды
+        db_session.global_init(args.db, args.profile)
+    session = db_session.create_session()
+    started = time.perf_counter()
+    try:
+        items_filter = parse_filter({key: value for key, value in vars(args).items()
+                                     if key in ('category', 'sort', 'descending', 'start_date', 'end_date', 'search')})
+        if args.command in ('add', 'edit'):
+            file = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')
+            with file:
+                if args.command == 'add':
+                    written = len(add_items(session, read_records(file)))
+                else:
+                    written = edit_items(session, read_records(file))
+            elapsed = time.perf_counter() - started
+            print(f'Записей: {written} за {elapsed:.2f} с ({written / max(elapsed, 1e-9):.0f} в секунду)',
+                  file=sys.stderr)
+        elif args.command == 'delete':
+            print(f'Удалено записей: {len(delete_items(session, args.ids))}', file=sys.stderr)
+        elif args.command == 'search':
+            for row in find_items(session, items_filter, args.after_id, args.limit):
+                _print_json(row_dict(row))
+        elif args.command == 'count':
+            print(count(session, items_filter))
+        elif args.command == 'summary':
+            for row in aggregate(session, items_filter, args.group_by, args.percentiles):
+                _print_json(summary_dict(row))
+        elif args.command == 'export':
+            print(f'Выгружено записей: {export_items(session, args.format, args.path, items_filter)}',
+                  file=sys.stderr)
+        elif args.command == 'categories':
+            for category in list_categories(session):
+                _print_json(category)
+    except ValidationError as error:
+        print(f'Ошибка: {error}', file=sys.stderr)
+        return 1
+    finally:
+        session.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import datetime
+import operator
+import sys
+import threading
+
+import sqlalchemy as sa
+from data import db_session
+from data.bulk import chunks
+from data.items import Item
+from data.catergories import Category
+from data.queries import PAGE_SIZE, ItemFilter, ItemRow, search_clause
+
+try:
+    import numpy
+except ImportError:  # снимок в памяти необязателен, без NumPy записи читаются из базы
+    numpy = None
+
+EPOCH = datetime.date(1970, 1, 1).toordinal()
+NO_DATE = -2 ** 31  # дни с 1970-01-01; значение для записей без даты
+CHUNK_SIZE = 10000  # строк, читаемых из курсора за раз
+
+
+class Columns:
+    """Неизменяемые столбцы записей, упорядоченные по id (при изменениях создаётся новый набор)"""
+    __slots__ = ('ids', 'names', 'abouts', 'prices', 'days', 'category_ids')
+
+    def __init__(self, ids, names, abouts, prices, days, category_ids):
+        self.ids, self.names, self.abouts = ids, names, abouts
+        self.prices, self.days, self.category_ids = prices, days, category_ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows) -> 'Columns':
+        """Столбцы из кортежей (id, название, описание, цена, дата ISO, id категории)"""
+        ids, names, abouts, prices, dates, category_ids = zip(*rows) if rows else ((),) * 6
+        return cls(numpy.array(ids, dtype=numpy.int64),
+                   numpy.array([_intern(name) for name in names], dtype=object),
+                   numpy.array([_intern(about) for about in abouts], dtype=object),
+                   numpy.array([numpy.nan if price is None else price for price in prices], dtype=numpy.float64),
+                   numpy.array([_days(date) for date in dates], dtype=numpy.int32),
+                   numpy.array([0 if category_id is None else category_id for category_id in category_ids],
+                               dtype=numpy.int64))
+
+    def take(self, positions) -> 'Columns':
+        return Columns(*(getattr(self, name)[positions] for name in self.__slots__))
+
+    def concat(self, other) -> 'Columns':
+        """Объединение со столбцами other с сохранением порядка по id"""
+        merged = Columns(*(numpy.concatenate((getattr(self, name), getattr(other, name))) for name in self.__slots__))
+        if len(self) and len(other) and other.ids.min() < self.ids[-1]:  # обычно новые id больше имеющихся
+            merged = merged.take(numpy.argsort(merged.ids, kind='stable'))
+        return merged
+
+    def rows(self, positions, category_names) -> list:
+        """Записи ItemRow для позиций (без создания объектов ORM); category_names: id категории -> название"""
+        dates = {}
+        with db_session.gc_paused():
+            return [ItemRow(id_, name, category_id or None, category_names.get(category_id),
+                            None if price != price else price, _date(day, dates), about)  # NaN - нет цены
+                    for id_, name, category_id, price, day, about in zip(
+                        self.ids[positions].tolist(), self.names[positions].tolist(),
+                        self.category_ids[positions].tolist(), self.prices[positions].tolist(),
+                        self.days[positions].tolist(), self.abouts[positions].tolist())]
+
+
+def _intern(value):
+    """Повторяющиеся названия и описания хранятся одной строкой"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _days(value) -> int:
+    """Дата ISO из базы -> число дней с 1970-01-01"""
+    if not value:
+        return NO_DATE
+    return datetime.date.fromisoformat(value[:10]).toordinal() - EPOCH
+
+
+def _date(day, cache):
+    if day == NO_DATE:
+        return None
+    if day not in cache:
+        cache[day] = datetime.date.fromordinal(day + EPOCH)
+    return cache[day]
+
+
+class ItemSnapshot:
+    """Записи в памяти в виде массивов NumPy: фильтры - маски, сортировка - argsort, изменения - заплатки"""
+
+    def __init__(self):
+        self.columns = None  # None - снимок ещё не загружен
+        self._pending = set()  # id, изменённые во время загрузки
+        self._selection = None  # (столбцы, фильтр, позиции) последней выборки для чтения по страницам
+        self._generation = 0  # увеличивается при сбросе снимка (invalidate)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # таблица читается одной задачей, остальные ждут её
+
+    @staticmethod
+    def available() -> bool:
+        """Снимок можно использовать только при установленном NumPy"""
+        return numpy is not None
+
+    @property
+    def loaded(self) -> bool:
+        return self.columns is not None
+
+    def load(self, session) -> None:
+        """Загрузка всех записей одним запросом (выполняется один раз, обычно в фоновом потоке)"""
+        if self.loaded:
+            return
+        with self._load_lock:  # задачи выборки, подсчёта и итогов не читают всю таблицу одновременно
+            while not self.loaded:
+                generation = self._generation
+                with db_session.gc_paused():
+                    rows = []
+                    for chunk in db_session.driver_rows(session, self._statement(), CHUNK_SIZE):
+                        rows.extend(chunk)
+                    columns = Columns.from_rows(rows)
+                with self._lock:
+                    if generation != self._generation:  # снимок сброшен во время чтения - читаем заново
+                        continue
+                    self.columns, pending = columns, self._pending
+                    self._pending = set()
+                if pending:  # изменения, зафиксированные во время загрузки
+                    self.apply(session, updated=list(pending))
+
+    def invalidate(self) -> None:
+        """Сброс снимка после изменений без оповещений (массовая загрузка); перечитывается при следующей выборке"""
+        with self._lock:
+            self.columns = self._selection = None
+            self._pending = set()
+            self._generation += 1
+
+    def apply(self, session, added=(), updated=(), removed=()) -> None:
+        """Применение зафиксированных изменений записей (см. data.notifications)"""
+        changed = list(added) + list(updated)
+        with self._lock:
+            if not self.loaded:
+                self._pending.update(changed, removed)
+                return
+            rows = []
+            for ids in chunks(changed):
+                for chunk in db_session.driver_rows(session, self._statement().where(Item.id.in_(ids)), CHUNK_SIZE):
+                    rows.extend(chunk)
+            columns = self.columns
+            dropped = numpy.isin(columns.ids, numpy.array(changed + list(removed), dtype=numpy.int64))
+            if dropped.any():
+                columns = columns.take(~dropped)
+            if rows:
+                columns = columns.concat(Columns.from_rows(sorted(rows)))
+            self.columns = columns  # читающие потоки продолжают работать с прежним набором
+
+    def select(self, session, items_filter=None, ids=None):
+        """Столбцы и позиции записей выборки в порядке отображения"""
+        self.load(session)
+        items_filter = items_filter or ItemFilter()
+        columns = self.columns
+        mask = numpy.ones(len(columns), dtype=bool)
+        if ids is not None:
+            mask &= numpy.isin(columns.ids, numpy.array(list(ids), dtype=numpy.int64))
+        if items_filter.category is not None:
+            category_id = session.execute(sa.select(Category.id).where(Category.name == items_filter.category)) \
+                .scalar()
+            mask &= columns.category_ids == (-1 if category_id is None else category_id)
+        if items_filter.start_date is not None:
+            mask &= columns.days >= items_filter.start_date.toordinal() - EPOCH
+        if items_filter.end_date is not None:
+            mask &= (columns.days <= items_filter.end_date.toordinal() - EPOCH) & (columns.days != NO_DATE)
+        if items_filter.search and items_filter.search.strip():  # поиск по индексу items_search в базе
+            found = session.execute(sa.select(Item.id).where(search_clause(items_filter.search.strip()))).scalars()
+            mask &= numpy.isin(columns.ids, numpy.fromiter(found, dtype=numpy.int64))
+        positions = numpy.flatnonzero(mask)
+        if items_filter.sort is None:
+            return columns, positions[::-1]  # сначала последние добавленные
+        values = columns.prices[positions] if items_filter.sort == 'price' else columns.days[positions]
+        missing = numpy.isnan(values) if items_filter.sort == 'price' else values == NO_DATE
+        # как ORDER BY в SQLite: записи без значения первыми, затем по значению и по id
+        order = numpy.lexsort((columns.ids[positions], numpy.where(missing, 0, values), ~missing))
+        if items_filter.descending:
+            order = order[::-1]
+        return columns, positions[order]
+
+    def rows(self, session, items_filter=None, ids=None) -> list:
+        """Записи выборки ItemRow в порядке отображения"""
+        columns, positions = self.select(session, items_filter, ids)
+        return columns.rows(positions, _category_names(session))
+
+    def page(self, session, items_filter=None, after=None, limit=PAGE_SIZE) -> list:
+        """Не более limit записей выборки, следующих за записью after (как queries.query_rows)"""
+        items_filter = items_filter or ItemFilter()
+        columns, positions = self._selected(session, items_filter)
+        start = 0
+        if after is not None:  # позиции упорядочены, поэтому записи после after идут сплошным хвостом
+            start = len(positions) - numpy.count_nonzero(_after(columns, positions, items_filter, after))
+        return columns.rows(positions[start:start + limit], _category_names(session))
+
+    def count(self, session, items_filter=None) -> int:
+        """Число записей выборки"""
+        return len(self._selected(session, items_filter or ItemFilter())[1])
+
+    def _selected(self, session, items_filter):
+        """Выборка для страниц; пересчитывается только при смене фильтра или изменении записей"""
+        selection = self._selection
+        if selection is None or selection[0] is not self.columns or selection[1] != items_filter:
+            columns, positions = self.select(session, items_filter)
+            selection = self._selection = (columns, items_filter, positions)
+        return selection[0], selection[2]
+
+    def export_chunks(self, session, items_filter=None, chunk_size=CHUNK_SIZE):
+        """Строки выгрузки (название, категория, цена, дата, описание) частями, как data.export.iter_chunks"""
+        columns, positions = self.select(session, items_filter)
+        names = _category_names(session)
+        for start in range(0, len(positions), chunk_size):
+            yield [(row.name, row.category, row.price, row.purchase_date, row.about)
+                   for row in columns.rows(positions[start:start + chunk_size], names)]
+
+    @staticmethod
+    def _statement():
+        return sa.select(Item.id, Item.name, Item.about, Item.price, Item.purchase_date, Item.category_id) \
+            .order_by(Item.id)
+
+
+def _after(columns, positions, items_filter, after):
+    """Маска записей, идущих после записи after в порядке ItemFilter.sort_key (как queries.keyset_clause)"""
+    ids = columns.ids[positions]
+    if items_filter.sort is None:
+        return ids < after.id
+    if items_filter.sort == 'price':
+        values, value = columns.prices[positions], after.price
+        present = ~numpy.isnan(values)
+    else:
+        values, value = columns.days[positions], after.purchase_date
+        present = values != NO_DATE
+        value = None if value is None else value.toordinal() - EPOCH
+    values = numpy.where(present, values, 0)
+    has_value, value = value is not None, 0 if value is None else value
+    later = operator.lt if items_filter.descending else operator.gt
+    return later(present, has_value) | ((present == has_value) & (later(values, value)
+                                                                  | ((values == value) & later(ids, after.id))))
+
+
+def _category_names(session) -> dict:
+    return dict(session.execute(sa.select(Category.id, Category.name)).all())
@@ -1,23 +1,70 @@
-import datetime
+import argparse
+import functools
+import inspect
+import os
 import sys
+import time
 import traceback
 import json
-import openpyxl
+import weakref
 
-from PyQt5.QtWidgets import QApplication, QMainWindow, QTableWidgetItem, QCheckBox, QStyledItemDelegate
-from PyQt5.QtWidgets import QWidget, QHBoxLayout, QDoubleSpinBox, QDateEdit
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QMainWindow, QStyledItemDelegate, QWidget, QHeaderView, QShortcut
+from PyQt5.QtWidgets import QProgressDialog, QFileDialog, QLabel
+from PyQt5.QtGui import QFont, QKeySequence
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThread, QThreadPool, QTimer, pyqtSignal
 from ui.main_window import Ui_MainWindow
+from ui.table_model import ItemTableModel, PriceDelegate, DateDelegate, CheckBoxDelegate
+from ui.table_model import SUMMARY_COLUMNS, SUMMARY_PERCENTILES, SummaryTableModel, ActionTableModel
 from ui.item_action import Ui_ItemAction
 from ui.filter_form import Ui_FilterForm
 from ui.msg_form import Ui_MessageForm
 from ui.price_error import Ui_PriceErrorForm
-from data import db_session
+from data import db_session, notifications
+from data.analytics import GROUP_TITLES, summarize
+from data.bulk import UndoBuffer, chunks
+from data.export import EXPORTERS, ExportCancelled, count_rows, export, iter_chunks, report_path
+from data.importers import import_file
+from data.instrumentation import recorder
 from data.items import Item
-from data.catergories import Category
+from data.queries import PAGE_SIZE, SEARCH_MIN_LENGTH, ItemFilter, count_items, query_rows
+from data.category_registry import categories
+from data import service
 
 with open('settings.json') as file:
     settings = json.load(file)  # выгружаем настройки из json-файла
+SEARCH_DELAY = 250  # пауза после ввода в строке поиска перед запросом, мс
+profiling = False  # режим --profile: действия замеряются и профилируются всегда
+
+
+def debug_action(method):
+    """Замер действия пользователя для панели отладки (Ctrl+Shift+D) и вывод числа SQL-запросов при "DEBUG": true"""
+    arguments = len(inspect.signature(method).parameters) - 1  # без self
+
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        args = args[:arguments]  # лишние аргументы сигналов (например, checked у clicked) отбрасываются
+        if not recorder.enabled:
+            return method(self, *args)
+        nested = recorder.current() is not None  # вызов из другого действия входит в его замер
+        with recorder.action(f'{type(self).__name__}.{method.__name__}') as record:
+            result = method(self, *args)
+            if not nested:
+                repaint_table(getattr(self, 'main_window', self), record)
+        if settings.get('DEBUG') and not nested:
+            print(f'{record.name}: SQL-запросов {record.count}, строк {record.rows}, '
+                  f'{record.duration * 1000:.1f} мс')
+        return result
+    return wrapper
+
+
+def repaint_table(window, record) -> None:
+    """Немедленная перерисовка видимой таблицы покупок с замером её времени"""
+    view = getattr(window, 'shopping_list', None)
+    if record is None or view is None or not view.isVisible():
+        return
+    started = time.perf_counter()
+    view.viewport().repaint()
+    record.add_span('repaint', 'repaint', started, time.perf_counter() - started)
 
 
 class AlignDelegate(QStyledItemDelegate):
@@ -34,149 +81,520 @@ class Notebook(QMainWindow, Ui_MainWindow):
     def __init__(self):
         super().__init__()
         self.setupUi(self)
+        self.items_filter = ItemFilter()  # текущие фильтр, сортировка и поиск
+        self.undo_buffer = UndoBuffer()  # последние удаления для отмены по Ctrl+Z
+        self.export_worker = self.import_worker = None
+        self.executor = DbExecutor(self)  # запросы к базе выполняются вне потока интерфейса
+        self.forms = FormPool(self)  # вспомогательные окна создаются один раз
+        self.snapshot = None  # записи в памяти в виде массивов NumPy ("IN_MEMORY_SNAPSHOT": true в settings.json)
+        if settings.get('IN_MEMORY_SNAPSHOT'):
+            from data.snapshot import ItemSnapshot  # NumPy загружается только при включённом снимке
+            if ItemSnapshot.available():
+                self.snapshot = ItemSnapshot()
+        self.loaded = False  # таблица загружается после первой отрисовки окна (см. showEvent)
         self.init_buttons()
-        self.shopping_list.horizontalHeader().sectionClicked.connect(
-            self.toggle)  # смена состояния всех записей при нажатии на заголовки таблицы
+        self.init_view()
+        notifications.subscribe(self.on_items_changed)  # изменения записей применяются к таблице точечно
+
+    def showEvent(self, event) -> None:
+        """Первая загрузка таблицы откладывается до отрисовки окна: окно появляется сразу, данные - следом"""
+        super().showEvent(event)
+        if not self.loaded:
+            self.loaded = True
+            QTimer.singleShot(0, self.init_table)  # после событий отрисовки, уже поставленных в очередь
+
+    def init_view(self) -> None:
+        """Инициализация модели таблицы и делегатов для отрисовки ячеек"""
+        self.table_model = ItemTableModel(self.shopping_list)
+        self.table_model.more_requested.connect(self.fetch_more)  # следующая страница при прокрутке
+        self.shopping_list.setModel(self.table_model)
+        self.count_label = QLabel(self)
+        self.statusBar().addPermanentWidget(self.count_label)
+        header = self.shopping_list.horizontalHeader()  # свойства заголовков, которые не задаются в main_window.ui
+        header_font = QFont('Calibri', 12)
+        header_font.setBold(True)
+        header.setFont(header_font)
+        header.setDefaultAlignment(Qt.AlignCenter)
+        for view in (self.shopping_list, self.summary_view, self.debug_view):  # строки одной высоты
+            view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        header.sectionClicked.connect(self.toggle)  # смена состояния всех записей при нажатии на заголовки таблицы
+        for column in range(self.table_model.columnCount()):
+            header.setSectionResizeMode(column, QHeaderView.Stretch if column == 1 else QHeaderView.ResizeToContents)
         delegate = AlignDelegate(self.shopping_list)
         self.shopping_list.setItemDelegateForColumn(0, delegate)
         self.shopping_list.setItemDelegateForColumn(2, delegate)
-        self.init_table()
+        self.shopping_list.setItemDelegateForColumn(3, PriceDelegate(self.shopping_list))
+        self.shopping_list.setItemDelegateForColumn(4, DateDelegate(self.shopping_list))
+        self.shopping_list.setItemDelegateForColumn(5, CheckBoxDelegate(self.shopping_list))
+        for exporter in EXPORTERS.values():  # доступные форматы выгрузки
+            self.export_format.addItem(exporter.title, exporter.name)
+        self.summary_model = SummaryTableModel(self.summary_view)
+        self.summary_view.setModel(self.summary_model)
+        self.summary_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        for group, title in GROUP_TITLES.items():
+            self.summary_group.addItem(f'Итоги {title}', group)
+        self.summary_group.currentIndexChanged.connect(self.update_summary)
+        self.summary_percentiles.toggled.connect(self.on_percentiles_toggled)
+        self.on_percentiles_toggled(False)
+        self.summary_dock.visibilityChanged.connect(self.update_summary)
+        self.action_model = ActionTableModel(self.debug_view)
+        self.debug_view.setModel(self.action_model)
+        self.debug_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.debug_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.debug_dock.setVisible(bool(settings.get('DEBUG')))
+        self.debug_dock.visibilityChanged.connect(self.on_debug_toggled)
+        recorder.enabled = bool(settings.get('DEBUG')) or profiling
+        recorder.subscribe(self.on_action_recorded)
+
+    @debug_action
+    def init_table(self, items_filter=None) -> None:
+        """Инициализация таблицы: первая страница строк только для чтения из SQL-запроса в фоновом потоке"""
+        if items_filter is not None:
+            self.items_filter = items_filter
+        categories.load(db_sess)  # названия категорий для отрисовки строк
+        self.executor.submit(self.page_loader(None), self.on_table_loaded, self.on_query_failed,
+                             key='table')  # предыдущий поиск или фильтр отменяется
+        self.statusBar().showMessage('Загрузка...')
+        self.update_count()
+        self.update_summary()
+
+    def page_loader(self, after):
+        """Функция чтения страницы текущей выборки, следующей за записью after"""
+        items_filter, snapshot = self.items_filter, self.snapshot
+        if snapshot is not None:  # фильтр и сортировка по массивам в памяти
+            return lambda session: snapshot.page(session, items_filter, after, PAGE_SIZE)
+        return lambda session: query_rows(session, items_filter, after=after, limit=PAGE_SIZE)
+
+    def fetch_more(self) -> None:
+        """Чтение следующей страницы при прокрутке к концу таблицы"""
+        self.executor.submit(self.page_loader(self.table_model.cursor), self.on_page_loaded, self.on_page_failed,
+                             key='table')
+
+    def update_count(self) -> None:
+        """Число записей выборки отдельным запросом COUNT"""
+        items_filter, snapshot = self.items_filter, self.snapshot
+        if snapshot is not None:
+            count = lambda session: snapshot.count(session, items_filter)
+        else:
+            count = lambda session: count_items(session, items_filter)
+        self.executor.submit(count, lambda total: self.count_label.setText(f'Записей: {total}'),
+                             self.on_query_failed, key='count')
 
-    def init_table(self, key=None, reverse=False, mode=None) -> None:
-        """Инициализация таблицы"""
-        for i in range(self.shopping_list.rowCount()):
-            self.shopping_list.removeRow(0)  # очищаем таблицу
-        items = db_sess.query(Item)
-        if mode == 'sort':  # если указан модификатор "сортировка"
-            items = sorted(items, key=key, reverse=reverse)
-        elif mode == 'filter':  # если указан модификатор "фильтр"
-            items = list(filter(key, items))
-        for item in items:
-            self.add_item_to_table(item)  # добавляем каждый элемент
+    def update_summary(self) -> None:
+        """Пересчёт итогов по текущей выборке в фоновом потоке (если панель итогов открыта)"""
+        if self.summary_dock.isHidden():
+            return
+        items_filter, group = self.items_filter, self.summary_group.currentData()
+        self.executor.cancel('summary_percentiles')  # перцентили прежней выборки уже не нужны
+        self.executor.submit(lambda session: summarize(session, items_filter, group),
+                             lambda rows: self.on_summary_loaded(rows, items_filter, group), self.on_query_failed,
+                             key='summary')
+
+    def on_summary_loaded(self, rows, items_filter, group) -> None:
+        """Итоги (обычно из monthly_totals) показываются сразу; перцентили, требующие чтения всех записей выборки,
+        досчитываются отдельным запросом, только если включены на панели"""
+        self.summary_model.set_rows(rows)
+        if self.summary_percentiles.isChecked():
+            self.executor.submit(lambda session: summarize(session, items_filter, group, SUMMARY_PERCENTILES),
+                                 self.summary_model.set_rows, self.on_query_failed, key='summary_percentiles')
+
+    def on_percentiles_toggled(self, checked) -> None:
+        """Показ столбцов перцентилей и их расчёт по текущей выборке"""
+        for column in range(len(SUMMARY_COLUMNS) - len(SUMMARY_PERCENTILES), len(SUMMARY_COLUMNS)):
+            self.summary_view.setColumnHidden(column, not checked)
+        if checked:
+            self.update_summary()
+
+    def on_table_loaded(self, items) -> None:
+        """Заполнение таблицы первой страницей выборки"""
+        self.table_model.set_items(items, more=len(items) == PAGE_SIZE)
+        self.statusBar().clearMessage()
+
+    def on_page_loaded(self, items) -> None:
+        """Добавление следующей страницы в конец таблицы"""
+        self.table_model.append_items(items, more=len(items) == PAGE_SIZE)
+
+    def on_page_failed(self, error) -> None:
+        """Ошибка чтения следующей страницы: таблица снова запросит её при прокрутке"""
+        self.table_model.fetch_failed()
+        self.on_query_failed(error)
+
+    def on_query_failed(self, error) -> None:
+        """Сообщение об ошибке запроса к базе"""
+        self.statusBar().clearMessage()
+        self.error_window = self.forms.show(MessageForm, f'Ошибка при обращении к базе данных: {error}')
+
+    @debug_action
+    def on_items_changed(self, added, updated, removed) -> None:
+        """Обновление только затронутых строк таблицы с сохранением текущих фильтра и сортировки"""
+        if self.snapshot is not None:
+            self.snapshot.apply(db_sess, added, updated, removed)
+        if self.executor.pending('table'):  # загружаемая выборка могла не увидеть изменений
+            self.init_table()
+            return
+        self.update_count()
+        self.update_summary()
+        self.table_model.remove_ids(updated + removed)
+        changed = added + updated
+        if not changed:
+            return
+        key, reverse = self.items_filter.sort_key(), self.items_filter.reverse
+        for ids in chunks(changed):
+            if self.snapshot is not None:
+                rows = self.snapshot.rows(db_sess, self.items_filter, ids=ids)
+            else:
+                rows = query_rows(db_sess, self.items_filter, ids=ids)
+            for row in rows:
+                self.table_model.insert_sorted(row, key, reverse)  # только записи, подходящие под фильтр
 
     def init_buttons(self) -> None:
         """Инициализация кнопок (привязываем к каждой кнопке функцию)"""
         self.search.clicked.connect(self.to_search)
+        self.search_timer = QTimer(self)  # поиск при вводе запускается после паузы в наборе
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        self.search_timer.timeout.connect(self.on_search_typed)
+        self.search_bar.textChanged.connect(self.search_timer.start)
+        self.search_bar.returnPressed.connect(self.to_search)
         self.add_item.clicked.connect(self.to_add_item)
         self.delete_item.clicked.connect(self.to_delete_item)
         self.edit_item.clicked.connect(self.to_edit_item)
         self.filter.clicked.connect(self.to_filter)
         self.get_file.clicked.connect(self.to_get_file)
-
+        self.load_file.clicked.connect(self.to_load_file)
+        QShortcut(QKeySequence.Undo, self, activated=self.to_undo_delete)
+        QShortcut(QKeySequence('Ctrl+Shift+D'), self, activated=self.debug_dock.toggleViewAction().trigger)
+        self.save_actions.clicked.connect(self.to_save_actions)
+        self.save_trace.clicked.connect(self.to_save_trace)
+        self.clear_actions.clicked.connect(self.to_clear_actions)
+
+    @debug_action
     def to_search(self) -> None:
-        """Поиск по названию"""
-        self.init_table(key=lambda x: self.search_bar.text().lower() in str(x.name).lower(), mode='filter')
-
+        """Поиск по названию и описанию"""
+        self.search_timer.stop()
+        search = self.search_bar.text().strip() or None
+        if search != self.items_filter.search:  # повторный запрос с тем же текстом не нужен
+            self.init_table(self.items_filter.replace(search=search))
+
+    def on_search_typed(self) -> None:
+        """Поиск после паузы в наборе; короткие подстроки ищутся перебором, поэтому только по Enter или кнопке"""
+        text = self.search_bar.text().strip()
+        if not text or len(text) >= SEARCH_MIN_LENGTH:
+            self.to_search()
+
+    @debug_action
     def to_add_item(self) -> None:
         """Добавление записи"""
-        self.new_window = ItemAction(self, 'add')  # открытие интерфейса для добавления записи
-        self.new_window.show()
+        self.new_window = self.forms.show(ItemAction, 'add')  # открытие интерфейса для добавления записи
 
+    @debug_action
     def to_delete_item(self) -> None:
         """Удаление выбранных записей"""
-        item_list = self.get_checked_items()
-        if len(item_list) == 0:  # если записи не выбраны, то выкидываем ошибку
-            self.error_window = MessageForm(self, 'Выберите хотя бы один элемент!')
-            self.error_window.show()
+        ids = self.table_model.checked_ids()
+        if len(ids) == 0:  # если записи не выбраны, то выкидываем ошибку
+            self.error_window = self.forms.show(MessageForm, 'Выберите хотя бы один элемент!')
             return
-        for item in item_list:
-            db_sess.delete(item)  # удаляем запись из базы данных
-            db_sess.commit()
-        self.init_table()
+        self.undo_buffer.push(service.delete_items(db_sess, ids))  # удаляем все записи одной транзакцией
+        self.statusBar().showMessage(f'Удалено записей: {len(ids)} (Ctrl+Z - отменить)', 5000)
+
+    @debug_action
+    def to_undo_delete(self) -> None:
+        """Отмена последнего удаления"""
+        try:
+            restored = self.undo_buffer.undo(db_sess)
+        except Exception as error:  # удаление остаётся в буфере
+            self.on_query_failed(error)
+            return
+        if restored:
+            self.statusBar().showMessage(f'Восстановлено записей: {restored}', 5000)
 
+    @debug_action
     def to_edit_item(self) -> None:
         """Изменение выбранных записей"""
         item_list = self.get_checked_items()
         if len(item_list) > 1 or len(item_list) == 0:  # если запись не выбрана или выбрано больше одной записи
-            self.error_window = MessageForm(self, 'Выберите один элемент!')  # выкидываем ошибку
-            self.error_window.show()
+            self.error_window = self.forms.show(MessageForm, 'Выберите один элемент!')  # выкидываем ошибку
         elif len(item_list) == 1:
-            self.new_window = ItemAction(self, 'edit', item_list[0])  # открытие интерфейса для изменения записи
-            self.new_window.show()
+            self.new_window = self.forms.show(ItemAction, 'edit', item_list[0])  # открытие интерфейса для изменения
 
+    @debug_action
     def to_filter(self) -> None:
         """Открытие окна с выбором фильтров"""
-        self.new_window = FilterForm(self)
-        self.new_window.show()
+        self.new_window = self.forms.show(FilterForm)
 
+    @debug_action
     def to_get_file(self) -> None:
-        """Формирование excel файла"""
-        wb = openpyxl.Workbook()  # создание книги
-        list = wb.active  # выбор листа
-        list.title = 'Отчёт'
-        items, labels = [], []
-        for i in db_sess.query(Item):
-            items.append(tuple([i.name, i.category.name, i.price, i.purchase_date, i.about]))
-        for i in range(1, self.shopping_list.columnCount() - 1):
-            labels.append(self.shopping_list.horizontalHeaderItem(i).text())
-        labels.append('Описание')
-        list.append(tuple(labels))
-        for item in items:
-            list.append(item)  # добавляем на лист все записи
-        list["G1"] = 'ПРОГРАММА ДЛЯ КОНТРОЛЯ ДЕНЕЖНЫХ СРЕДСТВ'
-        list["G2"] = f'ОТЧЁТ ОТ {datetime.datetime.today().strftime("%H:%M %d.%m.%Y")}'
-        wb.save(f'reports/report_{datetime.datetime.today().strftime("%H_%M_%d_%m_%Y")}.xlsx')  # сохраняем файл
-        self.message = MessageForm(self, 'Файл успешно сформирован! (см. папку reports)', label='Сообщение')
-        self.message.show()  # выкидываем сообщение, что всё сформировано успешно
+        """Формирование файла выбранного формата в фоновом потоке"""
+        if self.export_worker is not None and self.export_worker.isRunning():
+            return
+        exporter = EXPORTERS[self.export_format.currentData() or 'xlsx']
+        self.export_worker = ExportWorker(exporter.name, self.items_filter, report_path(exporter.extension),
+                                          self, self.snapshot)  # выгружаем текущую выборку
+        self.export_progress = QProgressDialog('Формирование файла...', 'Отмена', 0, 100, self)
+        self.export_progress.setWindowTitle('Выгрузка')
+        self.export_progress.setWindowModality(Qt.WindowModal)
+        self.export_progress.setMinimumDuration(500)  # для небольших выгрузок окно не появляется
+        self.export_progress.canceled.connect(self.export_worker.requestInterruption)
+        self.export_worker.progress.connect(self.export_progress.setValue)
+        self.export_worker.done.connect(self.on_file_ready)
+        self.export_worker.failed.connect(self.on_file_failed)
+        self.export_worker.finished.connect(self.export_progress.reset)
+        self.export_worker.start()
+
+    def on_file_ready(self, path) -> None:
+        """Сообщение об успешной выгрузке"""
+        self.message = self.forms.show(MessageForm, 'Файл успешно сформирован! (см. папку reports)',
+                                       label='Сообщение')  # выкидываем сообщение, что всё сформировано успешно
+
+    def on_file_failed(self, error) -> None:
+        """Сообщение об ошибке выгрузки или загрузки"""
+        self.error_window = self.forms.show(MessageForm, f'Ошибка при работе с файлом: {error}')
+
+    def on_debug_toggled(self, visible) -> None:
+        """Замеры действий ведутся, пока открыта панель отладки (или всегда при "DEBUG": true и --profile)"""
+        recorder.enabled = visible or bool(settings.get('DEBUG')) or profiling
+        if visible:
+            self.action_model.set_records(recorder.actions)
+
+    def on_action_recorded(self, record) -> None:
+        if self.debug_dock.isVisible():
+            self.action_model.set_records(recorder.actions)
+
+    def to_save_actions(self) -> None:
+        """Сохранение итогов замеров в JSON в папку reports"""
+        self.save_records(recorder.dump_json, 'actions')
+
+    def to_save_trace(self) -> None:
+        """Сохранение интервалов замеров в формате Chrome trace в папку reports"""
+        self.save_records(recorder.dump_trace, 'trace')
+
+    def save_records(self, dump, name) -> None:
+        try:
+            path = dump(report_path('json', name))
+        except OSError as error:
+            self.on_file_failed(error)
+            return
+        self.statusBar().showMessage(f'Замеры сохранены: {path}', 5000)
+
+    def to_clear_actions(self) -> None:
+        recorder.clear()
+        self.action_model.set_records([])
+
+    @debug_action
+    def to_load_file(self, path=None) -> None:
+        """Загрузка покупок из файла CSV или xlsx в фоновом потоке"""
+        if self.import_worker is not None and self.import_worker.isRunning():
+            return
+        if not path:
+            path = QFileDialog.getOpenFileName(self, 'Загрузка покупок', '', 'CSV, Excel (*.csv *.xlsx)')[0]
+            if not path:
+                return
+        self.import_worker = ImportWorker(path, self)
+        self.import_progress = QProgressDialog('Загрузка покупок...', None, 0, 0, self)  # число строк неизвестно
+        self.import_progress.setWindowTitle('Загрузка')
+        self.import_progress.setWindowModality(Qt.WindowModal)
+        self.import_progress.setMinimumDuration(500)
+        self.import_worker.progress.connect(self.on_import_progress)
+        self.import_worker.done.connect(self.on_file_loaded)
+        self.import_worker.failed.connect(self.on_file_failed)
+        self.import_worker.finished.connect(self.import_progress.reset)
+        self.import_worker.start()
+
+    def on_import_progress(self, imported) -> None:
+        self.import_progress.setLabelText(f'Загружено записей: {imported}')
+
+    def on_file_loaded(self, imported, skipped) -> None:
+        """Перезагрузка таблицы после массовой загрузки"""
+        if self.snapshot is not None:
+            self.snapshot.invalidate()  # загрузка из файла не оповещает об изменениях
+        self.init_table()
+        self.message = self.forms.show(MessageForm, f'Загружено записей: {imported}, пропущено: {skipped}',
+                                       label='Сообщение')
 
     def get_checked_items(self) -> list:
         """Получение выбранных записей"""
-        items = db_sess.query(Item)
-        checked_list = []
-        for i in range(self.shopping_list.rowCount()):
-            box = self.shopping_list.cellWidget(i, 5).layout().itemAt(0).widget()
-            if box.isChecked():  # проверка состояния чекбокса
-                item = items.filter(Item.id == int(self.shopping_list.item(i, 0).text())).first()  # ищем запись по id
-                checked_list.append(item)  # добавляем запись в список
-        return checked_list
+        return [self.table_model.item(row) for row in self.table_model.checked_rows()]
 
     def add_item_to_table(self, item) -> None:
         """Добавление записи в таблицу"""
-        self.shopping_list.insertRow(0)  # всегда добавляем запись в начало
-        self.shopping_list.setItem(0, 0, QTableWidgetItem(str(item.id)))  # id
-        self.shopping_list.item(0, 0).setFlags(Qt.ItemIsEnabled)  # блокируем
-        self.shopping_list.setItem(0, 1, QTableWidgetItem(item.name))  # название покупки
-        self.shopping_list.item(0, 1).setFlags(Qt.ItemIsEnabled)
-        self.shopping_list.setItem(0, 2, QTableWidgetItem(item.category.name))  # категория покупки
-        self.shopping_list.item(0, 2).setFlags(Qt.ItemIsEnabled)
-        cell_widget, price = QWidget(), QDoubleSpinBox()
-        price.setMinimum(0)
-        price.setMaximum(10 ** 10)
-        price.setValue(item.price)
-        lay_out = QHBoxLayout(cell_widget)
-        lay_out.addWidget(price)
-        lay_out.setAlignment(Qt.AlignCenter)
-        lay_out.setContentsMargins(0, 0, 0, 0)
-        cell_widget.setLayout(lay_out)
-        self.shopping_list.setCellWidget(0, 3, cell_widget)  # цена
-        self.shopping_list.cellWidget(0, 3).setEnabled(False)  # блокируем
-        cell_widget, date = QWidget(), QDateEdit()
-        date.setMinimumDate(datetime.date(2022, 1, 1))
-        date.setMaximumDate(datetime.date.today())
-        date.setDate(item.purchase_date)
-        lay_out = QHBoxLayout(cell_widget)
-        lay_out.addWidget(date)
-        lay_out.setAlignment(Qt.AlignCenter)
-        lay_out.setContentsMargins(0, 0, 0, 0)
-        cell_widget.setLayout(lay_out)
-        self.shopping_list.setCellWidget(0, 4, cell_widget)  # дата
-        self.shopping_list.cellWidget(0, 4).setEnabled(False)
-        cell_widget, ch_box = QWidget(), QCheckBox()
-        lay_out = QHBoxLayout(cell_widget)
-        lay_out.addWidget(ch_box)
-        lay_out.setAlignment(Qt.AlignCenter)
-        lay_out.setContentsMargins(0, 0, 0, 0)
-        cell_widget.setLayout(lay_out)
-        self.shopping_list.setCellWidget(0, 5, cell_widget)  # чекбокс
+        self.table_model.insert_item(0, item)  # всегда добавляем запись в начало
 
     def toggle(self) -> None:
         """Меняем состояние записей"""
-        if self.shopping_list.cellWidget(0, 5).layout().itemAt(0).widget().checkState():  # если первая выбрана
-            for i in range(self.shopping_list.rowCount()):  # выбираем ни одну
-                self.shopping_list.cellWidget(i, 5).layout().itemAt(0).widget().setCheckState(False)
+        if not self.table_model.rowCount():
+            return
+        self.table_model.set_all_checked(not self.table_model.is_checked(0))  # если первая выбрана, снимаем все
+
+
+class ExportWorker(QThread):
+    """Выгрузка записей в файл в отдельном потоке со своей сессией"""
+    progress = pyqtSignal(int)  # процент выполнения
+    done = pyqtSignal(str)  # путь к файлу
+    failed = pyqtSignal(str)
+
+    def __init__(self, exporter, items_filter, path, parent=None, snapshot=None):
+        super().__init__(parent)
+        self.exporter, self.items_filter, self.path = exporter, items_filter, path
+        self.snapshot = snapshot  # строки берутся из снимка в памяти, если он включён
+        self.total = 0
+
+    def run(self) -> None:
+        session = db_session.create_session()
+        try:
+            self.total = count_rows(session, self.items_filter)
+            if self.snapshot is not None:
+                rows = self.snapshot.export_chunks(session, self.items_filter)
+            else:
+                rows = iter_chunks(session, self.items_filter)
+            export(self.exporter, self.path, rows, progress=self.on_progress)
+            self.done.emit(self.path)
+        except ExportCancelled:
+            pass
+        except Exception as error:  # ошибки потока передаются в окно сигналом
+            self.failed.emit(str(error))
+        finally:
+            session.close()
+
+    def on_progress(self, written) -> bool:
+        """Передача прогресса; False прерывает выгрузку"""
+        self.progress.emit(written * 100 // self.total if self.total else 100)
+        return not self.isInterruptionRequested()
+
+
+class ImportWorker(QThread):
+    """Загрузка покупок из файла в отдельном потоке со своей сессией"""
+    progress = pyqtSignal(int)  # число загруженных записей
+    done = pyqtSignal(int, int)  # загружено, пропущено
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+
+    def run(self) -> None:
+        session = db_session.create_session()
+        try:
+            result = import_file(session, self.path, progress=self.progress.emit)
+            self.done.emit(result.imported, result.skipped)
+        except Exception as error:  # ошибки потока передаются в окно сигналом
+            self.failed.emit(str(error))
+        finally:
+            session.close()
+
+
+class DbTask(QRunnable):
+    """Запрос к базе в потоке из пула со своей сессией"""
+
+    def __init__(self, executor, function, on_done, on_failed=None, key=None):
+        super().__init__()
+        self.executor, self.function, self.key = executor, function, key
+        self.on_done, self.on_failed = on_done, on_failed
+        self.cancelled = False
+        self.connection = None  # соединение SQLite выполняющегося запроса
+        self.record = recorder.current()  # замер действия, запустившего задачу
+
+    def run(self) -> None:
+        result = error = None
+        if not self.cancelled:
+            session = db_session.create_session()
+            try:
+                with recorder.resume(self.record, self.key or 'task'):
+                    self.connection = session.connection().connection.dbapi_connection
+                    if not self.cancelled:
+                        result = self.function(session)
+            except Exception as exception:  # ошибки потока передаются в окно сигналом
+                error = str(exception)
+            finally:
+                self.connection = None
+                session.close()  # загруженные объекты остаются доступными без сессии
+        self.executor.finished.emit(self, result, error)
+
+    def cancel(self) -> None:
+        """Отмена задачи: результат не будет доставлен, выполняющийся запрос прерывается"""
+        self.cancelled = True
+        connection = self.connection
+        if connection is not None:
+            connection.interrupt()
+
+
+class DbExecutor(QObject):
+    """Выполнение запросов к базе в пуле потоков с доставкой результатов в поток интерфейса"""
+    finished = pyqtSignal(object, object, object)  # задача, результат, текст ошибки
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self._tasks = set()  # ссылки на задачи до доставки результата
+        self._current = {}  # ключ -> последняя задача с этим ключом
+        self.finished.connect(self._deliver)  # сигнал из потока пула доставляется через очередь событий
+
+    def submit(self, function, on_done, on_failed=None, key=None) -> DbTask:
+        """Выполнение function(session) в фоне; новая задача с тем же ключом отменяет предыдущую"""
+        task = DbTask(self, function, on_done, on_failed, key)
+        if key is not None:
+            previous = self._current.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._current[key] = task
+        self._tasks.add(task)
+        self.pool.start(task)
+        return task
+
+    def cancel(self, key) -> None:
+        """Отмена последней задачи с ключом key"""
+        task = self._current.get(key)
+        if task is not None:
+            task.cancel()
+
+    def pending(self, key) -> bool:
+        """Есть ли невыполненная задача с ключом key"""
+        return key in self._current
+
+    def wait(self) -> None:
+        """Ожидание всех задач и доставка их результатов (для тестов и закрытия окна)"""
+        while self._tasks:
+            self.pool.waitForDone()
+            QApplication.processEvents()
+
+    def _deliver(self, task, result, error) -> None:
+        self._tasks.discard(task)
+        if task.key is not None:
+            if self._current.get(task.key) is not task:  # результат устаревшего запроса
+                return
+            del self._current[task.key]
+        if task.cancelled:
+            return
+        with recorder.resume(task.record, task.key or 'task', 'delivery'):
+            if error is None:
+                task.on_done(result)
+            elif task.on_failed is not None:
+                task.on_failed(error)
+            repaint_table(self.parent(), task.record)
+
+
+class FormPool:
+    """Вспомогательные окна главного окна: каждое создаётся один раз, при повторном открытии сбрасывается"""
+
+    def __init__(self, main_window):
+        self.main_window = weakref.ref(main_window)  # пул хранится в главном окне
+        self._forms = {}  # класс окна -> экземпляр
+
+    def get(self, form_class, *args, **kwargs):
+        """Окно form_class, подготовленное к показу: новое или прежнее после form.reset(*args, **kwargs)"""
+        form = self._forms.get(form_class)
+        if form is None:
+            form = self._forms[form_class] = form_class(self.main_window(), *args, **kwargs)
         else:
-            for i in range(self.shopping_list.rowCount()):  # выбираем все
-                self.shopping_list.cellWidget(i, 5).layout().itemAt(0).widget().setCheckState(True)
+            form.reset(*args, **kwargs)
+        return form
+
+    def show(self, form_class, *args, **kwargs):
+        """Показ окна form_class поверх остальных"""
+        form = self.get(form_class, *args, **kwargs)
+        form.show()
+        form.raise_()
+        return form
 
 
 class ItemAction(QWidget, Ui_ItemAction):
@@ -184,96 +602,80 @@ class ItemAction(QWidget, Ui_ItemAction):
     def __init__(self, main_window, mode, item=None):
         super().__init__()
         self.setupUi(self)
-        self.main_window, self.item = main_window, item  # главное окно и запись
+        self.main_window = main_window  # главное окно
+        self.buttonBox.buttons()[0].clicked.connect(self.save_item)
         self.buttonBox.buttons()[1].clicked.connect(self.close)
+        self.reset(mode, item)
+
+    def reset(self, mode, item=None) -> None:
+        """Подготовка окна к добавлению записи или изменению item (окно используется повторно)"""
+        self.mode = mode
+        self.item = item  # строка таблицы (ItemRow)
         if mode == 'add':
             self.setWindowTitle('Добавление записи')
             self.title.setText('Добавление записи')
-            self.buttonBox.buttons()[0].clicked.connect(self.add_item)
+            self.name_line.clear()  # поля как у нового окна
+            self.category_line.clear()
+            self.about_line.clear()
+            self.price_line.setValue(0)
+            self.date_line.setDate(self.date_line.minimumDate())
         elif mode == 'edit':
             self.setWindowTitle('Редактирование записи')
             self.title.setText('Редактирование записи')
             self.name_line.setText(self.item.name)  # при редактировании устанавливаем в поля значения переданной записи
-            self.category_line.setText(self.item.category.name)
-            self.about_line.setText(self.item.about)
+            self.category_line.setText(self.item.category)
+            self.about_line.setText(self.item.about or '')
             self.price_line.setValue(self.item.price)
             self.date_line.setDate(self.item.purchase_date)
-            self.buttonBox.buttons()[0].clicked.connect(self.edit_item)
 
+    def save_item(self) -> None:
+        """Кнопка подтверждения: добавление или изменение в зависимости от режима окна"""
+        if self.mode == 'add':
+            self.add_item()
+        else:
+            self.edit_item()
+
+    def values(self) -> dict:
+        """Значения полей окна в виде записи для data.service"""
+        return {
+            'name': self.name_line.text(),
+            'category': self.category_line.text(),
+            'price': self.price_line.value(),
+            'purchase_date': self.date_line.date().toPyDate(),
+            'about': self.about_line.toPlainText(),
+        }
+
+    @debug_action
     def add_item(self) -> None:
         """Добавление записи"""
         if self.check_item():  # если данные некорректны, то выходим
             return
-        category = None
-        for i in db_sess.query(Category):  # проверка, существует ли уже данная категория
-            if i.name.lower() == self.category_line.text().strip().lower():
-                category = i
-        if not category:  # если нет, создаем новую
-            category = Category(name=self.category_line.text().strip())
-            db_sess.add(category)  # добавляем в базу данных
-            db_sess.commit()
-        item = Item(
-            name=self.name_line.text().strip(),
-            price=self.price_line.value(),
-            about=self.about_line.toPlainText().strip(),
-            purchase_date=self.date_line.date().toPyDate()
-        )  # создание новой записи
-        category.items.append(item)  # добавляем в категорию запись
-        db_sess.merge(category)  # сохраняе изменения категории
-        db_sess.commit()
-        self.main_window.init_table()
+        service.add_items(db_sess, [self.values()],
+                          max_price=service.MAX_PRICE)  # таблица обновится по оповещению об изменении записей
         self.close()
 
+    @debug_action
     def edit_item(self) -> None:
         """Изменение записи"""
         if self.check_item():
             return
-        category = None
-        for i in db_sess.query(Category):
-            if i.name.lower() == self.category_line.text().strip().lower():
-                category = i
-        if category and category.name.lower() != self.item.category.name.lower():  # если категория изменилась на сущ.
-            prev_category = self.item.category
-            prev_category.items.remove(self.item)  # удаляем запись из прошлой категории
-            db_sess.merge(prev_category)
-            category.items.append(self.item)  # и добавляем в новую
-            db_sess.merge(category)
-            db_sess.commit()
-        elif not category:  # если новой категории не существует, то создаём её
-            category = Category(name=self.category_line.text().strip())
-            db_sess.add(category)
-            db_sess.commit()
-            prev_category = self.item.category
-            self.item.category_id = category.id
-            db_sess.merge(prev_category)
-            db_sess.merge(category)
-            db_sess.commit()
-        self.item.name = self.name_line.text().strip()  # меняем все данные записи
-        self.item.price = self.price_line.value()
-        self.item.about = self.about_line.toPlainText().strip()
-        self.item.purchase_date = self.date_line.date().toPyDate()
-        db_sess.commit()
-        self.main_window.init_table()
+        service.edit_items(db_sess, [{'id': self.item.id, **self.values()}],
+                           max_price=service.MAX_PRICE)  # дорогие покупки уже проверены в check_item
         self.close()
 
     def check_item(self) -> bool:
         """Проверка корректности данных"""
-        if len(self.name_line.text().strip()) < 3:  # если название короче 3 символов, выкидываем ошибку
-            self.error_window = MessageForm(self.main_window, 'Слишком короткое название покупки!')
-            self.error_window.show()
-            return True
-        if len(self.category_line.text().strip()) < 3:  # если категория короче 3 символов, выкидываем ошибку
-            self.error_window = MessageForm(self.main_window, 'Слишком короткое название категории!')
-            self.error_window.show()
+        try:
+            service.check_record(self.values())  # названия, цена и дата; дорогие покупки - ниже
+        except service.ValidationError as error:
+            self.error_window = self.main_window.forms.show(MessageForm, str(error))
             return True
         if self.price_line.value() > 10 ** 8 and settings['ABRAMOVICH'] == -1:  # если цена слишком высокая, спрашиваем
-            self.error_window = PriceErrorForm(self.main_window, self)  # является ли пользователь Абрамовичем
-            self.error_window.show()
+            self.error_window = self.main_window.forms.show(PriceErrorForm, self)  # является ли он Абрамовичем
             return True
         if self.price_line.value() > 10 ** 8 and settings['ABRAMOVICH'] == 0:  # если не является, то выкидываем ошибку
-            self.error_window = MessageForm(self.main_window, 'Слишком дорогая покупка! '
-                                                              'Смиритесь, у вас нет столько денег...')
-            self.error_window.show()
+            self.error_window = self.main_window.forms.show(MessageForm, 'Слишком дорогая покупка! '
+                                                                         'Смиритесь, у вас нет столько денег...')
             return True
         return False
 
@@ -284,27 +686,40 @@ class FilterForm(QWidget, Ui_FilterForm):
         super().__init__()
         self.setupUi(self)
         self.main_window = main_window
-        for category in db_sess.query(Category):  # добавляем все категории
-            self.category_box.addItem(category.name)
+        self.categories_version = None  # версия кэша категорий, из которой заполнен список
         self.buttonBox.buttons()[0].clicked.connect(self.add_filter)
         self.buttonBox.buttons()[1].clicked.connect(self.close)
-
+        self.reset()
+
+    def reset(self) -> None:
+        """Сброс выбора, как у нового окна; список категорий перезаполняется, только если они изменились"""
+        categories.load(db_sess)
+        if self.categories_version != categories.version:
+            self.category_box.clear()
+            self.category_box.addItems(categories.names(db_sess))  # добавляем все категории из кэша
+            self.categories_version = categories.version
+        self.for_category.setChecked(True)
+        for box in (self.category_box, self.price_box, self.date_box):
+            box.setCurrentIndex(0)
+        self.start_date.setDate(self.start_date.minimumDate())
+        self.end_date.setDate(self.end_date.minimumDate())
+
+    @debug_action
     def add_filter(self) -> None:
         """Добавляем выбранный фильтр"""
+        items_filter = ItemFilter(search=self.main_window.items_filter.search)  # поиск сохраняется
         if self.for_category.isChecked():  # если выбрано "по категории"
-            category = self.category_box.currentText()
-            self.main_window.init_table(key=lambda x: x.category.name == category, mode='filter')
+            items_filter = items_filter.replace(category=self.category_box.currentText())
         elif self.for_price.isChecked():  # если выбрано "по цене"
-            d = {'по возрастанию': True, 'по убыванию': False}
-            self.main_window.init_table(key=lambda x: x.price, reverse=d[self.price_box.currentText()], mode='sort')
+            d = {'по возрастанию': False, 'по убыванию': True}
+            items_filter = items_filter.replace(sort='price', descending=d[self.price_box.currentText()])
         elif self.for_date.isChecked():  # если выбрано по дате
-            d = {'сначала старые': True, 'сначала новые': False}
-            self.main_window.init_table(key=lambda x: x.purchase_date, reverse=d[self.date_box.currentText()],
-                                        mode='sort')
+            d = {'сначала старые': False, 'сначала новые': True}
+            items_filter = items_filter.replace(sort='date', descending=d[self.date_box.currentText()])
         elif self.for_period.isChecked():  # если выбрано по периоду
-            start_date, end_date = self.start_date.date().toPyDate(), self.end_date.date().toPyDate()
-            dt = end_date - start_date
-            self.main_window.init_table(key=lambda x: x.purchase_date - start_date <= dt, mode='filter')
+            items_filter = items_filter.replace(start_date=self.start_date.date().toPyDate(),
+                                                end_date=self.end_date.date().toPyDate())
+        self.main_window.init_table(items_filter)
         self.close()
 
 
@@ -313,6 +728,9 @@ class MessageForm(QWidget, Ui_MessageForm):
     def __init__(self, main_window, text, label='Ошибка'):
         super().__init__()
         self.setupUi(self)
+        self.reset(text, label)
+
+    def reset(self, text, label='Ошибка') -> None:
         self.setWindowTitle(label)
         self.error_msg.setText(text)  # устанавливаем текст сообщения
 
@@ -323,9 +741,12 @@ class PriceErrorForm(QWidget, Ui_PriceErrorForm):
         super().__init__()
         self.setupUi(self)
         self.main_window = main_window
-        self.main_wigdet = widget
         self.buttonBox.buttons()[0].clicked.connect(self.yes)
         self.buttonBox.buttons()[1].clicked.connect(self.no)
+        self.reset(widget)
+
+    def reset(self, widget) -> None:
+        self.main_wigdet = widget  # окно добавления записи, ожидающее ответа
 
     def yes(self) -> None:
         """Если пользователь является Абрамовичем"""
@@ -333,7 +754,7 @@ class PriceErrorForm(QWidget, Ui_PriceErrorForm):
         settings['ABRAMOVICH'] = 1  # меняем настройки
         with open('settings.json', mode='w') as file:
             json.dump(settings, file)  # и загружаем в json-файл
-        self.main_wigdet.add_item()  # добавляем запись
+        self.main_wigdet.save_item()  # добавляем или изменяем запись
         self.close()
 
     def no(self) -> None:
@@ -342,9 +763,8 @@ class PriceErrorForm(QWidget, Ui_PriceErrorForm):
         settings['ABRAMOVICH'] = 0
         with open('settings.json', mode='w') as file:
             json.dump(settings, file)
-        self.error_window = MessageForm(self.main_window, 'Слишком дорогая покупка! '
-                                                          'Смиритесь, у вас нет столько денег...')
-        self.error_window.show()  # выкидываем ошибку
+        self.error_window = self.main_window.forms.show(MessageForm, 'Слишком дорогая покупка! '
+                                                                     'Смиритесь, у вас нет столько денег...')
         self.close()
 
 
@@ -357,11 +777,68 @@ def excepthook(exc_type, exc_value, exc_tb):
     # or QtWidgets.QApplication.exit(0)
 
 
+def parse_args(argv):
+    """Аргументы запуска; нераспознанные передаются Qt"""
+    parser = argparse.ArgumentParser(description='Программа для контроля собственных денежных средств')
+    parser.add_argument('--db', default=None, help='файл базы данных (по умолчанию db/notebook.db, кроме --replay)')
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='DIR',
+                        help='профилирование действий (по умолчанию в папку reports/profile_<время>)')
+    parser.add_argument('--profiler', choices=('auto', 'cprofile', 'py-spy'), default='auto',
+                        help='auto - py-spy, если установлен, иначе cProfile по действиям')
+    parser.add_argument('--replay', nargs='?', const='', default=None, metavar='SCRIPT',
+                        help='выполнить сценарий действий без окна и выйти (по умолчанию benchmarks/replay.json)')
+    args, qt_args = parser.parse_known_args(argv)
+    if args.db is None:
+        if args.replay is not None:  # сценарий добавляет и удаляет записи: рабочая база не берётся по умолчанию
+            parser.error('для --replay укажите базу явно: --db')
+        args.db = 'db/notebook.db'
+    return args, qt_args
+
+
+def start_profiling(directory, kind):
+    """Включение замеров всех действий и профилировщика; возвращает функцию сохранения результатов"""
+    from data.profiling import ActionProfiler, SamplingProfiler
+    global profiling
+
+    profiling = recorder.enabled = True
+    sampler = None
+    if kind == 'py-spy' or kind == 'auto' and SamplingProfiler.available():
+        sampler = SamplingProfiler(directory)
+        sampler.start()
+    else:
+        recorder.profiler = ActionProfiler(directory)
+
+    def finish():
+        os.makedirs(directory, exist_ok=True)
+        paths = [sampler.stop()] if sampler is not None else recorder.profiler.save()
+        recorder.dump_json(os.path.join(directory, 'actions.json'))
+        recorder.dump_trace(os.path.join(directory, 'trace.json'))
+        print(f'Профили действий ({len(paths)}) и замеры сохранены в {directory}')
+    return finish
+
+
 if __name__ == '__main__':
     sys.excepthook = excepthook  # устанавливаем хук на ошибки
-    db_session.global_init('db/notebook.db')  # инициализируем базу данных
+    args, qt_args = parse_args(sys.argv[1:])
+    if args.replay is not None:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')  # сценарий выполняется без дисплея
+    finish_profiling = None
+    if args.profile is not None:
+        finish_profiling = start_profiling(args.profile or report_path(None, 'profile'), args.profiler)
+    db_session.global_init(args.db, settings.get('DB_PROFILE', 'default'),
+                           settings.get('SQL_ECHO', False))  # инициализируем базу данных
     db_sess = db_session.create_session()  # создаем сессию
-    app = QApplication(sys.argv)  # создаем приложение
+    app = QApplication(sys.argv[:1] + qt_args)  # создаем приложение
     ex = Notebook()
     ex.show()
-    sys.exit(app.exec())
+    try:
+        if args.replay is not None:
+            from benchmarks.replay import SCRIPT, load_steps, replay
+            replay(ex, load_steps(args.replay or SCRIPT), log=print)
+            code = 0
+        else:
+            code = app.exec()
+    finally:
+        if finish_profiling is not None:
+            finish_profiling()
+    sys.exit(code)
@@ -1,40 +1,137 @@
+import datetime
+import io
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
 from unittest.mock import MagicMock, patch
+import openpyxl
+import sqlalchemy as sa
+from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication
-from main import Notebook, Item, db_sess
+import main
+from main import Notebook, Item
+from data import bulk, db_session, migrations, notifications, service
+from data.catergories import Category
+from data.queries import PAGE_SIZE, ItemFilter, ItemRow, count_items, query_items, query_rows
+from data.category_registry import categories
+from data import export
+from data.importers import import_file
+from data import analytics, generator
+from data.snapshot import ItemSnapshot
+from data.instrumentation import recorder
+from data.profiling import ActionProfiler
+from benchmarks import replay, sqlite_profiles, startup, suite
+from ui.table_model import CHECK_COLUMN, SUMMARY_PERCENTILES
+
+
+def setUpModule():
+    """Тестовая база данных во временном файле"""
+    global tmp_dir
+    tmp_dir = tempfile.TemporaryDirectory()
+    db_session.global_init(os.path.join(tmp_dir.name, 'notebook.db'))
+    main.db_sess = db_session.create_session()
+
+
+def tearDownModule():
+    main.db_sess.close()
+    tmp_dir.cleanup()
+
+
+def clear_db() -> None:
+    """Очистка базы данных и кэша категорий"""
+    main.db_sess.query(Item).delete()
+    main.db_sess.query(Category).delete()
+    main.db_sess.commit()
+    categories.invalidate()
+
+
+def fill_db(*items) -> None:
+    """Заполнение базы данных записями вида (название, категория, цена, дата)"""
+    categories = {category.name: category for category in main.db_sess.query(Category)}
+    for name, category, price, date in items:
+        if category not in categories:
+            categories[category] = Category(name=category)
+            main.db_sess.add(categories[category])
+        categories[category].items.append(Item(name=name, price=price, purchase_date=date))
+    main.db_sess.commit()
+
+
+def add_items(*items) -> list:
+    """Добавление записей вида (название, категория, цена, дата) через data.service с оповещением об изменениях"""
+    return service.add_items(main.db_sess, [{'name': name, 'category': category, 'price': price, 'purchase_date': date}
+                                            for name, category, price, date in items])
+
+
+def load_table(notebook, items_filter=None) -> None:
+    """Загрузка таблицы с ожиданием фонового запроса"""
+    notebook.init_table(items_filter)
+    notebook.executor.wait()
+
+
+def show_window(notebook) -> None:
+    """Показ окна с ожиданием первой загрузки таблицы (она начинается после отрисовки)"""
+    notebook.show()
+    QApplication.processEvents()
+    notebook.executor.wait()
+
+
+def fetch_all(notebook) -> None:
+    """Чтение всех страниц таблицы, как при прокрутке до конца"""
+    while notebook.table_model.canFetchMore():
+        notebook.table_model.fetchMore()
+        notebook.executor.wait()
+
+
+def read_pages(read_page, size=2) -> list:
+    """Все записи выборки, прочитанные страницами по size записей"""
+    rows, after = [], None
+    while True:
+        page = read_page(after, size)
+        rows.extend(page)
+        if len(page) < size:
+            return rows
+        after = page[-1]
+
 
 class TestNotebook(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        cls.app = QApplication([])
+        cls.app = QApplication.instance() or QApplication([])
 
     def setUp(self):
+        clear_db()
         self.notebook = Notebook()
+        self.notebook.executor.wait()  # первая загрузка таблицы
 
     def test_init_table_empty(self):
         """Тест инициализации таблицы с пустой базой данных"""
-        db_sess.query = MagicMock(return_value=[])
-        self.notebook.init_table()
-        self.assertEqual(self.notebook.shopping_list.rowCount(), 0, "Таблица должна быть пустой.")
+        load_table(self.notebook)
+        self.assertEqual(self.notebook.table_model.rowCount(), 0, "Таблица должна быть пустой.")
 
     def test_add_item_to_table(self):
         """Тест добавления элемента в таблицу"""
-        item = Item(id=1, name="Test Item", category=MagicMock(name="Category"), price=10.0, purchase_date="2023-12-11")
+        item = ItemRow(id=1, name="Test Item", category_id=1, category="Category", price=10.0,
+                       purchase_date=datetime.date(2023, 12, 11), about='')
         self.notebook.add_item_to_table(item)
-        self.assertEqual(self.notebook.shopping_list.rowCount(), 1, "В таблице должен быть один элемент.")
-        self.assertEqual(self.notebook.shopping_list.item(0, 1).text(), "Test Item")
+        self.assertEqual(self.notebook.table_model.rowCount(), 1, "В таблице должен быть один элемент.")
+        self.assertEqual(self.notebook.table_model.index(0, 1).data(), "Test Item")
+        self.assertEqual(self.notebook.table_model.index(0, 2).data(), "Category")
 
     def test_get_checked_items(self):
         """Тест получения выбранных элементов"""
-        db_sess.query = MagicMock(return_value=[Item(id=1), Item(id=2)])
-        self.notebook.init_table()
-        # Выбираем первый элемент
-        checkbox = self.notebook.shopping_list.cellWidget(0, 5).layout().itemAt(0).widget()
-        checkbox.setChecked(True)
+        fill_db(('first', 'food', 1.0, datetime.date(2023, 1, 1)), ('second', 'food', 2.0, datetime.date(2023, 1, 2)))
+        load_table(self.notebook)
+        # Выбираем первый элемент (последняя добавленная запись отображается первой)
+        self.notebook.table_model.setData(self.notebook.table_model.index(0, 5), Qt.Checked, Qt.CheckStateRole)
         checked_items = self.notebook.get_checked_items()
         self.assertEqual(len(checked_items), 1)
-        self.assertEqual(checked_items[0].id, 1)
+        self.assertEqual(checked_items[0].name, 'second')
 
     @patch('openpyxl.Workbook')
     def test_to_get_file(self, mock_workbook):
@@ -42,28 +139,1151 @@ class TestNotebook(unittest.TestCase):
         mock_save = MagicMock()
         mock_workbook.return_value.save = mock_save
         self.notebook.to_get_file()
+        self.notebook.export_worker.wait()
         mock_save.assert_called_once()
         self.assertTrue(mock_save.call_args[0][0].startswith('reports/report_'), "Имя файла должно быть корректным.")
 
+    def test_export_streams_current_selection(self):
+        """Тест выгрузки только отфильтрованных записей в текущем порядке"""
+        fill_db(('cheap', 'food', 1.0, datetime.date(2023, 1, 1)), ('dear', 'food', 5.0, datetime.date(2023, 1, 2)),
+                ('film', 'fun', 4.0, datetime.date(2023, 1, 3)))
+        load_table(self.notebook, ItemFilter(category='food', sort='price', descending=True))
+        path = os.path.join(tmp_dir.name, 'report.xlsx')
+        with patch('main.report_path', return_value=path):
+            self.notebook.to_get_file()
+        self.notebook.export_worker.wait()
+        sheet = openpyxl.load_workbook(path).active
+        self.assertEqual([row[0].value for row in sheet.iter_rows(min_row=2)], ['dear', 'cheap'])
+        self.assertTrue(sheet['G2'].value.startswith('ОТЧЁТ ОТ'))
+
+    def test_load_file_reloads_table(self):
+        """Тест загрузки покупок из файла через главное окно"""
+        path = os.path.join(tmp_dir.name, 'load.csv')
+        with open(path, mode='w', encoding='utf-8') as file:
+            file.write('name,category,price,purchase_date\nbread,food,1.5,2023-01-01\nfilm,fun,4,2023-01-02\n')
+        self.notebook.to_load_file(path)
+        self.notebook.import_worker.wait()
+        QApplication.processEvents()  # сигнал о завершении доставляется через очередь событий
+        self.notebook.executor.wait()
+        self.assertEqual(self.notebook.table_model.rowCount(), 2)
+
     def test_toggle(self):
         """Тест смены состояния чекбоксов"""
-        db_sess.query = MagicMock(return_value=[Item(id=1), Item(id=2)])
-        self.notebook.init_table()
+        fill_db(('first', 'food', 1.0, datetime.date(2023, 1, 1)), ('second', 'food', 2.0, datetime.date(2023, 1, 2)))
+        load_table(self.notebook)
         # Изначально все чекбоксы сняты
         self.notebook.toggle()
-        for i in range(self.notebook.shopping_list.rowCount()):
-            checkbox = self.notebook.shopping_list.cellWidget(i, 5).layout().itemAt(0).widget()
-            self.assertTrue(checkbox.isChecked(), "Все чекбоксы должны быть установлены.")
+        for i in range(self.notebook.table_model.rowCount()):
+            self.assertTrue(self.notebook.table_model.is_checked(i), "Все чекбоксы должны быть установлены.")
 
         # Снова вызываем toggle, все чекбоксы должны быть сняты
         self.notebook.toggle()
-        for i in range(self.notebook.shopping_list.rowCount()):
-            checkbox = self.notebook.shopping_list.cellWidget(i, 5).layout().itemAt(0).widget()
-            self.assertFalse(checkbox.isChecked(), "Все чекбоксы должны быть сняты.")
+        for i in range(self.notebook.table_model.rowCount()):
+            self.assertFalse(self.notebook.table_model.is_checked(i), "Все чекбоксы должны быть сняты.")
+
+    def test_cells_are_painted_by_delegates(self):
+        """Тест отсутствия виджетов в ячейках таблицы"""
+        fill_db(('first', 'food', 1.5, datetime.date(2023, 1, 1)))
+        load_table(self.notebook)
+        self.assertIsNone(self.notebook.shopping_list.indexWidget(self.notebook.table_model.index(0, 3)))
+        delegate = self.notebook.shopping_list.itemDelegateForColumn(3)
+        self.assertEqual(delegate.displayText(self.notebook.table_model.index(0, 3).data(), None), '1.50')
+
+    def test_rendering_issues_constant_number_of_statements(self):
+        """Тест отсутствия запроса на каждую строку при отрисовке таблицы"""
+        fill_db(*((f'item {i}', f'category {i % 10}', float(i), datetime.date(2023, 1, 1)) for i in range(1000)))
+        main.db_sess.expunge_all()
+        categories.invalidate()
+        with db_session.count_statements() as counter:
+            load_table(self.notebook)  # запрос выборки выполняется в потоке пула
+            fetch_all(self.notebook)
+            model = self.notebook.table_model
+            cells = [model.index(row, column).data() for row in range(model.rowCount()) for column in range(5)]
+        self.assertEqual(len(cells), 5000)
+        self.assertLessEqual(counter.count, 2 + 1000 // PAGE_SIZE + 1)  # категории, COUNT и запрос на страницу
+
+    def test_newer_search_supersedes_older(self):
+        """Тест отмены устаревшего фонового запроса"""
+        fill_db(('bread', 'food', 1.0, datetime.date(2023, 1, 1)), ('film', 'fun', 4.0, datetime.date(2023, 1, 3)))
+        delivered = []
+        slow = self.notebook.executor.submit(
+            lambda session: session.execute(sa.text('WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n '
+                                                    'WHERE i < 3000000) SELECT count(*) FROM n')).scalar(),
+            delivered.append, delivered.append, key='test')
+        self.notebook.executor.submit(lambda session: 'new', delivered.append, key='test')
+        for text in ('bre', 'fil'):
+            self.notebook.search_bar.setText(text)
+            self.notebook.to_search()
+        self.notebook.executor.wait()
+        self.assertTrue(slow.cancelled)
+        self.assertEqual(delivered, ['new'])
+        self.assertEqual([self.notebook.table_model.item(row).name
+                          for row in range(self.notebook.table_model.rowCount())], ['film'])
+
+    def test_search_as_you_type(self):
+        """Тест поиска при вводе после паузы в наборе"""
+        fill_db(('bread', 'food', 1.0, datetime.date(2023, 1, 1)), ('film', 'fun', 4.0, datetime.date(2023, 1, 3)))
+        for text in ('f', 'fi', 'fil'):
+            self.notebook.search_bar.setText(text)
+        self.assertTrue(self.notebook.search_timer.isActive())
+        with patch.object(self.notebook, 'init_table', wraps=self.notebook.init_table) as init_table:
+            self.notebook.search_timer.timeout.emit()
+            self.notebook.executor.wait()
+        init_table.assert_called_once()  # один запрос на всю серию нажатий
+        self.assertEqual(self.notebook.table_model.item(0).name, 'film')
+        self.assertEqual(self.notebook.table_model.rowCount(), 1)
+
+    def test_filter_form_sorts_in_display_order(self):
+        """Тест сортировки по цене через форму фильтра"""
+        fill_db(('cheap', 'food', 1.0, datetime.date(2023, 1, 1)), ('dear', 'food', 5.0, datetime.date(2023, 1, 2)))
+        form = main.FilterForm(self.notebook)
+        form.for_price.setChecked(True)
+        form.price_box.setCurrentText('по возрастанию')
+        form.add_filter()
+        self.notebook.executor.wait()
+        self.assertEqual(self.notebook.table_model.index(0, 1).data(), 'cheap')
+
+    def test_changes_update_only_affected_rows(self):
+        """Тест точечного обновления таблицы после добавления, изменения и удаления записей"""
+        fill_db(('cheap', 'food', 1.0, datetime.date(2023, 1, 1)), ('dear', 'food', 5.0, datetime.date(2023, 1, 2)))
+        load_table(self.notebook, ItemFilter(sort='price'))
+        with patch.object(self.notebook, 'init_table') as init_table:
+            add_items(('middle', 'food', 3.0, datetime.date(2023, 1, 3)),
+                      ('film', 'fun', 4.0, datetime.date(2023, 1, 3)))
+            model = self.notebook.table_model
+            self.assertEqual([model.item(row).name for row in range(model.rowCount())],
+                             ['cheap', 'middle', 'film', 'dear'])
+            cheap = model.item(0).id
+            service.edit_items(main.db_sess, [{'id': cheap, 'price': 10.0}])
+            self.assertEqual(model.item(model.rowCount() - 1).name, 'cheap')
+            service.delete_items(main.db_sess, [cheap])
+            self.assertEqual([model.item(row).name for row in range(model.rowCount())], ['middle', 'film', 'dear'])
+            init_table.assert_not_called()
+
+    def test_item_action_add_and_edit(self):
+        """Тест добавления и редактирования записи через форму"""
+        form = main.ItemAction(self.notebook, 'add')
+        form.name_line.setText('Хлеб')
+        form.category_line.setText('Продукты')
+        form.price_line.setValue(50)
+        form.add_item()
+        self.assertEqual(self.notebook.table_model.index(0, 2).data(), 'Продукты')
+        form = main.ItemAction(self.notebook, 'edit', self.notebook.table_model.item(0))
+        form.category_line.setText('продукты питания')
+        form.edit_item()
+        self.assertEqual(self.notebook.table_model.rowCount(), 1)
+        self.assertEqual(self.notebook.table_model.index(0, 2).data(), 'продукты питания')
+        form = main.ItemAction(self.notebook, 'edit', self.notebook.table_model.item(0))
+        form.category_line.setText('ПРОДУКТЫ')
+        form.edit_item()
+        self.assertEqual(self.notebook.table_model.index(0, 2).data(), 'Продукты')
+
+    def test_main_window_matches_ui_file(self):
+        """Тест соответствия ui/main_window.py описанию окна в ui/main_window.ui"""
+        from PyQt5 import uic
+
+        generated = io.StringIO()
+        uic.compileUi(os.path.join('ui', 'main_window.ui'), generated)
+        code = lambda text: [line for line in text.splitlines() if not line.startswith('#')]
+        with open(os.path.join('ui', 'main_window.py'), encoding='utf-8') as file:
+            self.assertEqual(code(file.read()), code(generated.getvalue()))
+
+    def test_forms_are_reused(self):
+        """Тест повторного открытия окон: окно создаётся один раз, сбрасывается и обновляет только новые категории"""
+        fill_db(('Хлеб', 'Продукты', 50.0, datetime.date(2023, 1, 10)))
+        load_table(self.notebook)
+        self.notebook.to_add_item()
+        form = self.notebook.new_window
+        form.name_line.setText('Черновик')
+        self.notebook.table_model.setData(self.notebook.table_model.index(0, CHECK_COLUMN), Qt.Checked,
+                                          Qt.CheckStateRole)
+        self.notebook.to_edit_item()
+        self.assertIs(self.notebook.new_window, form)
+        self.assertEqual((form.mode, form.name_line.text()), ('edit', 'Хлеб'))
+        self.notebook.to_add_item()
+        self.assertIs(self.notebook.new_window, form)
+        self.assertEqual((form.mode, form.name_line.text()), ('add', ''))
+        self.notebook.to_filter()
+        filter_form = self.notebook.new_window
+        filter_form.for_price.setChecked(True)
+        with patch.object(categories, 'names', wraps=categories.names) as names:
+            self.notebook.to_filter()
+            names.assert_not_called()  # категории не менялись
+            fill_db(('Кино', 'Развлечения', 300.0, datetime.date(2023, 1, 11)))
+            self.notebook.to_filter()
+            names.assert_called_once()
+        self.assertIs(self.notebook.new_window, filter_form)
+        self.assertTrue(filter_form.for_category.isChecked())
+        self.assertEqual([filter_form.category_box.itemText(i) for i in range(filter_form.category_box.count())],
+                         categories.names(main.db_sess))
+
+    def test_delete_and_undo(self):
+        """Тест удаления выбранных записей одной транзакцией и его отмены"""
+        fill_db(*((f'item {i}', 'food', float(i), datetime.date(2023, 1, 1)) for i in range(2000)))
+        load_table(self.notebook)
+        fetch_all(self.notebook)
+        self.notebook.toggle()
+        self.notebook.table_model.setData(self.notebook.table_model.index(0, 5), Qt.Unchecked, Qt.CheckStateRole)
+        commits = MagicMock()
+        sa.event.listen(main.db_sess, 'after_commit', commits)
+        try:
+            self.notebook.to_delete_item()
+        finally:
+            sa.event.remove(main.db_sess, 'after_commit', commits)
+        commits.assert_called_once()
+        self.assertEqual(self.notebook.table_model.rowCount(), 1)
+        self.assertEqual(main.db_sess.query(Item).count(), 1)
+        self.notebook.to_undo_delete()
+        self.assertEqual(self.notebook.table_model.rowCount(), 2000)
+        self.assertEqual(self.notebook.table_model.item(1).name, 'item 1998')
+
+    def test_undo_after_id_reused(self):
+        """Тест отмены удаления последней записи, id которой уже занят новой записью"""
+        fill_db(('first', 'food', 1.0, datetime.date(2023, 1, 1)), ('last', 'food', 2.0, datetime.date(2023, 1, 2)))
+        load_table(self.notebook)
+        self.notebook.table_model.setData(self.notebook.table_model.index(0, CHECK_COLUMN), Qt.Checked,
+                                          Qt.CheckStateRole)
+        self.notebook.to_delete_item()
+        service.add_items(main.db_sess, [{'name': 'new', 'category': 'food', 'price': 3,
+                                          'purchase_date': '2023-01-03'}])
+        self.notebook.to_undo_delete()
+        self.assertEqual(len(self.notebook.undo_buffer), 0)
+        self.assertEqual(sorted(item.name for item in main.db_sess.query(Item)), ['first', 'last', 'new'])
+        self.assertEqual(self.notebook.table_model.rowCount(), 3)
+        with patch.object(bulk, 'restore_items', side_effect=sa.exc.OperationalError('INSERT', (), None)), \
+                patch.object(self.notebook, 'on_query_failed') as failed:
+            self.notebook.undo_buffer.push([{'id': 10 ** 6}])
+            self.notebook.to_undo_delete()
+        failed.assert_called_once()
+        self.assertEqual(len(self.notebook.undo_buffer), 1)  # удаление не потеряно
+
+    def test_rows_are_fetched_by_pages(self):
+        """Тест чтения таблицы страницами при прокрутке и подсчёта записей отдельным запросом"""
+        fill_db(*((f'item {i}', 'food', float(i + 1), datetime.date(2023, 1, 1)) for i in range(PAGE_SIZE + 10)))
+        load_table(self.notebook, ItemFilter(sort='price'))
+        model = self.notebook.table_model
+        self.assertEqual(model.rowCount(), PAGE_SIZE)
+        self.assertEqual(self.notebook.count_label.text(), f'Записей: {PAGE_SIZE + 10}')
+        self.assertTrue(model.canFetchMore())
+        add_items(('late', 'food', 10000.0, datetime.date(2023, 1, 1)),
+                  ('early', 'food', 0.5, datetime.date(2023, 1, 1)))
+        self.notebook.executor.wait()
+        self.assertEqual(model.rowCount(), PAGE_SIZE + 1)  # запись после прочитанных придёт со следующей страницей
+        fetch_all(self.notebook)
+        self.assertFalse(model.canFetchMore())
+        names = [model.item(row).name for row in range(model.rowCount())]
+        self.assertEqual(len(names), PAGE_SIZE + 12)
+        self.assertEqual((names[0], names[-1]), ('early', 'late'))
+        self.assertEqual(self.notebook.count_label.text(), f'Записей: {PAGE_SIZE + 12}')
+
+    def test_failed_page_is_fetched_again(self):
+        """Тест повторного запроса страницы после ошибки её чтения"""
+        fill_db(*((f'item {i}', 'food', float(i), datetime.date(2023, 1, 1)) for i in range(PAGE_SIZE + 10)))
+        load_table(self.notebook)
+        model = self.notebook.table_model
+
+        def read_page(session):
+            raise sa.exc.OperationalError('SELECT', {}, Exception('database is locked'))
+
+        with patch.object(self.notebook, 'page_loader', return_value=read_page), \
+                patch.object(self.notebook, 'on_query_failed') as failed:
+            model.fetchMore()
+            self.notebook.executor.wait()
+        failed.assert_called_once()
+        self.assertEqual(model.rowCount(), PAGE_SIZE)
+        self.assertTrue(model.canFetchMore())  # страница не потеряна
+        fetch_all(self.notebook)
+        self.assertEqual(model.rowCount(), PAGE_SIZE + 10)
+
+    def test_changes_respect_filter(self):
+        """Тест того, что новые записи вне фильтра не попадают в таблицу"""
+        self.notebook.init_table(ItemFilter(category='food'))
+        fill_db(('bread', 'food', 1.0, datetime.date(2023, 1, 1)), ('film', 'fun', 4.0, datetime.date(2023, 1, 3)))
+        self.notebook.executor.wait()
+        self.assertEqual(self.notebook.table_model.rowCount(), 1)
+        self.assertEqual(self.notebook.table_model.item(0).name, 'bread')
+
+    def test_actions_are_recorded(self):
+        """Тест замера действия вместе с его фоновыми запросами и выгрузки замеров"""
+        fill_db(('bread', 'food', 1.0, datetime.date(2023, 1, 1)), ('film', 'fun', 4.0, datetime.date(2023, 1, 3)))
+        show_window(self.notebook)
+        recorder.clear()
+        recorder.enabled = True
+        try:
+            self.notebook.search_bar.setText('bread')
+            self.notebook.to_search()  # вызывает init_table: замер один
+            self.notebook.executor.wait()
+        finally:
+            recorder.enabled = False
+        self.assertEqual([record.name for record in recorder.actions], ['Notebook.to_search'])
+        record = recorder.actions[0]
+        self.assertGreaterEqual(record.count, 3)  # категории, страница и COUNT
+        self.assertGreaterEqual(record.rows, 2)
+        self.assertGreater(record.repaint, 0)
+        self.assertGreaterEqual(record.duration, record.elapsed)
+        self.assertIn('task', {span[0] for span in record.spans})
+        path = recorder.dump_json(os.path.join(tmp_dir.name, 'actions.json'))
+        with open(path, encoding='utf-8') as file:
+            self.assertEqual(json.load(file)[0]['statements'], record.count)
+        path = recorder.dump_trace(os.path.join(tmp_dir.name, 'trace.json'))
+        with open(path, encoding='utf-8') as file:
+            events = json.load(file)['traceEvents']
+        self.assertEqual(sum(event.get('cat') == 'sql' for event in events), record.count)
+        self.assertTrue(all(event['ph'] in ('X', 'M') for event in events))
+
+    def test_replay_with_profiler(self):
+        """Тест воспроизведения сценария действий с профилированием каждого действия"""
+        fill_db(('bread', 'food', 1.0, datetime.date(2023, 1, 1)), ('film', 'fun', 4.0, datetime.date(2023, 1, 3)))
+        steps = [{'action': 'search', 'text': 'bread'}, {'action': 'reset'},
+                 {'action': 'filter', 'sort': 'price', 'descending': True},
+                 {'action': 'add', 'name': 'butter', 'category': 'food', 'price': 2.0, 'date': '2023-01-05'},
+                 {'action': 'delete', 'count': 1}, {'action': 'undo'}]
+        profiler = ActionProfiler(os.path.join(tmp_dir.name, 'profile'))
+        recorder.clear()
+        recorder.enabled, recorder.profiler = True, profiler
+        try:
+            timings = replay.replay(self.notebook, steps)
+        finally:
+            recorder.enabled, recorder.profiler = False, None
+        self.assertEqual(len(timings), len(steps))
+        model = self.notebook.table_model
+        self.assertEqual([model.item(row).name for row in range(model.rowCount())], ['film', 'butter', 'bread'])
+        paths = profiler.save()
+        self.assertEqual(len(paths), len(recorder.actions))
+        self.assertTrue(os.path.basename(paths[0]).startswith('0001_Notebook.to_search'))
+        self.assertGreater(pstats.Stats(os.path.join(profiler.directory, 'session.prof')).total_calls, 0)
+
+    def test_replay_script(self):
+        """Тест чтения сценария действий: файл сценария по умолчанию и отказ для файла другого формата"""
+        self.assertEqual(len(replay.load_steps(replay.SCRIPT)), 12)
+        with self.assertRaises(ValueError):
+            replay.load_steps(suite.BASELINE)  # не сценарий
+
+    def test_replay_requires_database(self):
+        """Тест запуска сценария только на явно указанной базе (рабочая база не изменяется)"""
+        with patch('sys.stderr'), self.assertRaises(SystemExit):
+            main.parse_args(['--replay'])
+        self.assertEqual(main.parse_args(['--replay', '--db', 'bench.db'])[0].db, 'bench.db')
+        self.assertEqual(main.parse_args([])[0].db, 'db/notebook.db')
+
+    def test_profiler_skips_background_threads_on_new_python(self):
+        """Тест профилирования только потока интерфейса, когда cProfile может быть включён один (Python 3.12+)"""
+        profiler = ActionProfiler(os.path.join(tmp_dir.name, 'profile_threads'))
+        record = MagicMock(started=0.0)
+
+        def background():
+            with profiler.profile(record):
+                sum(range(1000))
+
+        with patch('data.profiling.MAIN_THREAD_ONLY', True), profiler.profile(record):
+            worker = threading.Thread(target=background)
+            worker.start()
+            worker.join()
+        self.assertEqual(len(profiler._profiles), 1)  # профиль потока интерфейса
 
     @classmethod
     def tearDownClass(cls):
         cls.app.quit()
 
+
+class TestItemQueries(unittest.TestCase):
+
+    def setUp(self):
+        clear_db()
+        fill_db(('Хлеб', 'Продукты', 50.0, datetime.date(2023, 1, 10)),
+                ('Молоко', 'Продукты', 80.0, datetime.date(2023, 2, 1)),
+                ('Кино', 'Досуг', 300.0, datetime.date(2023, 3, 5)))
+
+    def names(self, items_filter):
+        return [item.name for item in query_items(main.db_sess, items_filter)]
+
+    def test_default_order_is_newest_first(self):
+        """Тест порядка по умолчанию"""
+        self.assertEqual(self.names(ItemFilter()), ['Кино', 'Молоко', 'Хлеб'])
+
+    def test_category_and_sort(self):
+        """Тест фильтра по категории и сортировки по цене"""
+        self.assertEqual(self.names(ItemFilter(category='Продукты', sort='price', descending=True)),
+                         ['Молоко', 'Хлеб'])
+
+    def test_period(self):
+        """Тест фильтра по периоду (границы включительно)"""
+        self.assertEqual(self.names(ItemFilter(start_date=datetime.date(2023, 1, 10),
+                                               end_date=datetime.date(2023, 2, 1), sort='date')),
+                         ['Хлеб', 'Молоко'])
+
+    def test_loading_strategies(self):
+        """Тест загрузки записей категорий вторым запросом на всю выборку"""
+        main.db_sess.expunge_all()
+        with db_session.count_statements() as counter:
+            loaded = {category.name: len(category.items)
+                      for category in db_session.query(main.db_sess, Category, 'categories')}
+        self.assertEqual(loaded, {'Продукты': 2, 'Досуг': 1})
+        self.assertEqual(counter.count, 2)
+        main.db_sess.expunge_all()
+        item = db_session.query(main.db_sess, Item, category='raise').first()
+        with self.assertRaises(sa.exc.InvalidRequestError):
+            item.category
+
+    def test_rows_match_orm(self):
+        """Тест совпадения строк только для чтения с объектами ORM"""
+        fill_db(('Подарок', 'Досуг', None, None))
+        for items_filter in (ItemFilter(), ItemFilter(sort='price'), ItemFilter(category='Продукты', sort='date'),
+                             ItemFilter(search='моло')):
+            expected = [ItemRow(item.id, item.name, item.category_id, item.category.name, item.price,
+                                item.purchase_date, item.about) for item in query_items(main.db_sess, items_filter)]
+            with db_session.count_statements() as counter:
+                self.assertEqual(query_rows(main.db_sess, items_filter), expected, items_filter)
+            self.assertEqual(counter.count, 1)
+        ids = [row.id for row in query_rows(main.db_sess)][:2]
+        self.assertEqual([row.id for row in query_rows(main.db_sess, ids=ids)], ids)
+
+    def test_keyset_pages(self):
+        """Тест постраничного чтения: страницы складываются в ту же выборку, что и один запрос"""
+        fill_db(('Подарок', 'Досуг', None, None), ('Сок', 'Продукты', 80.0, datetime.date(2023, 2, 1)),
+                ('Чай', 'Продукты', None, datetime.date(2023, 1, 10)))
+        for items_filter in (ItemFilter(), ItemFilter(sort='price'), ItemFilter(sort='price', descending=True),
+                             ItemFilter(sort='date'), ItemFilter(sort='date', descending=True, category='Продукты'),
+                             ItemFilter(search='о')):
+            expected = query_rows(main.db_sess, items_filter)
+            self.assertEqual(read_pages(lambda after, size: query_rows(main.db_sess, items_filter, after=after,
+                                                                       limit=size)), expected, items_filter)
+            self.assertEqual(count_items(main.db_sess, items_filter), len(expected), items_filter)
+
+    def test_search_is_case_insensitive(self):
+        """Тест поиска без учёта регистра для кириллицы"""
+        self.assertEqual(self.names(ItemFilter(search='МОЛ')), ['Молоко'])
+        self.assertEqual(self.names(ItemFilter(search='100%')), [])
+        self.assertEqual(self.names(ItemFilter(search='хл')), ['Хлеб'])  # короче триграммы - без индекса
+
+    def test_search_index_follows_changes(self):
+        """Тест обновления поискового индекса при добавлении, изменении и удалении записей"""
+        item = main.db_sess.query(Item).filter(Item.name == 'Кино').one()
+        item.about = 'Вечерний сеанс'
+        main.db_sess.commit()
+        self.assertEqual(self.names(ItemFilter(search='СЕАНС')), ['Кино'])
+        item.name = 'Театр'
+        main.db_sess.commit()
+        self.assertEqual(self.names(ItemFilter(search='кино')), [])
+        self.assertEqual(self.names(ItemFilter(search='теат')), ['Театр'])
+        main.db_sess.delete(item)
+        main.db_sess.commit()
+        self.assertEqual(self.names(ItemFilter(search='сеанс')), [])
+        self.assertEqual(self.names(ItemFilter(search='"мол')), [])  # кавычки не ломают запрос
+
+
+class TestAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        clear_db()
+        fill_db(('Хлеб', 'Продукты', 50.0, datetime.date(2023, 1, 10)),
+                ('Молоко', 'Продукты', 80.0, datetime.date(2023, 2, 1)),
+                ('Сыр', 'Продукты', 350.0, datetime.date(2023, 2, 20)),
+                ('Кино', 'Досуг', 300.0, datetime.date(2023, 2, 5)))
+
+    def test_summary_by_category(self):
+        """Тест итогов по категориям с перцентилями"""
+        rows = analytics.summarize(main.db_sess, group_by='category', percentiles=(50, 90))
+        self.assertEqual([(row.key, row.count, row.total) for row in rows],
+                         [('Досуг', 1, 300.0), ('Продукты', 3, 480.0)])
+        self.assertEqual(rows[1].average, 160.0)
+        self.assertEqual((rows[1].minimum, rows[1].maximum), (50.0, 350.0))
+        self.assertEqual(rows[1].percentiles[0], 80.0)
+        self.assertAlmostEqual(rows[1].percentiles[1], 296.0)
+
+    def test_summary_by_month_respects_filter(self):
+        """Тест итогов по месяцам с учётом фильтра и периода"""
+        items_filter = ItemFilter(category='Продукты', start_date=datetime.date(2023, 2, 1))
+        rows = analytics.summarize(main.db_sess, items_filter, group_by='month', percentiles=(50,))
+        self.assertEqual([(row.key, row.count, row.total, row.percentiles) for row in rows],
+                         [('2023-02', 2, 430.0, (215.0,))])
+        rows = analytics.summarize(main.db_sess, ItemFilter(search='мол'), group_by='period')
+        self.assertEqual([(row.count, row.total) for row in rows], [(1, 80.0)])
+
+    def test_percentiles_without_numpy(self):
+        """Тест расчёта перцентилей без NumPy"""
+        expected = analytics.group_percentiles(main.db_sess, ItemFilter(), 'week', (25, 50, 75))
+        with patch.object(analytics, '_numpy', return_value=None):
+            self.assertEqual(analytics.group_percentiles(main.db_sess, ItemFilter(), 'week', (25, 50, 75)), expected)
+
+    def test_summary_panel(self):
+        """Тест панели итогов главного окна"""
+        app = QApplication.instance() or QApplication([])
+        notebook = Notebook()
+        show_window(notebook)
+        self.assertEqual(notebook.summary_model.rowCount(), 2)
+        notebook.summary_group.setCurrentIndex(notebook.summary_group.findData('period'))
+        notebook.executor.wait()
+        self.assertEqual(notebook.summary_model.index(0, 2).data(), '780.00')
+        with patch.object(main, 'summarize', wraps=main.summarize) as summarize:
+            add_items(('Чай', 'Продукты', 20.0, datetime.date(2023, 3, 1)))
+            notebook.executor.wait()
+            self.assertEqual(notebook.summary_model.index(0, 1).data(), '5')
+            self.assertEqual([len(call.args) for call in summarize.call_args_list], [3])  # без перцентилей
+            self.assertTrue(notebook.summary_view.isColumnHidden(4))
+            notebook.summary_percentiles.setChecked(True)
+            notebook.executor.wait()
+        self.assertFalse(notebook.summary_view.isColumnHidden(4))
+        self.assertEqual(summarize.call_args_list[-1].args[3], SUMMARY_PERCENTILES)
+        self.assertNotEqual(notebook.summary_model.index(0, 4).data(), '')
+
+
+class TestMonthlyTotals(unittest.TestCase):
+
+    def setUp(self):
+        clear_db()
+        fill_db(('Хлеб', 'Продукты', 50.0, datetime.date(2023, 1, 10)),
+                ('Молоко', 'Продукты', 80.0, datetime.date(2023, 2, 1)),
+                ('Кино', 'Досуг', 300.0, datetime.date(2023, 2, 5)))
+
+    def totals(self, group_by, items_filter=None):
+        return [(row.key, row.count, row.total) for row in analytics.summarize(main.db_sess, items_filter, group_by)]
+
+    def test_totals_follow_changes(self):
+        """Тест обновления итогов триггерами при изменении, удалении и массовой загрузке записей"""
+        item = main.db_sess.query(Item).filter(Item.name == 'Кино').one()
+        item.price, item.purchase_date = 350.0, datetime.date(2023, 3, 1)
+        item.category = main.db_sess.query(Category).filter(Category.name == 'Продукты').one()
+        main.db_sess.commit()
+        self.assertEqual(self.totals('month'), [('2023-01', 1, 50.0), ('2023-02', 1, 80.0), ('2023-03', 1, 350.0)])
+        main.db_sess.delete(item)
+        main.db_sess.commit()
+        path = os.path.join(tmp_dir.name, 'totals.csv')
+        with open(path, mode='w', encoding='utf-8') as file:
+            file.write('name,category,price,purchase_date\nчай,Продукты,20,2023-01-15\n')
+        import_file(main.db_sess, path)
+        self.assertEqual(self.totals('category'), [('Продукты', 3, 150.0)])
+        self.assertEqual(analytics.check_totals(main.db_sess), [])
+
+    def test_totals_match_items(self):
+        """Тест совпадения итогов из monthly_totals с подсчётом по записям"""
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        engine = main.db_sess.get_bind()
+        for group_by, items_filter in (('category', None), ('year', None),
+                                       ('period', ItemFilter(category='Продукты', start_date=datetime.date(2023, 2, 1),
+                                                             end_date=datetime.date(2023, 2, 28)))):
+            self.assertTrue(analytics.uses_totals(items_filter or ItemFilter(), group_by))
+            sa.event.listen(engine, 'before_cursor_execute', listener)
+            try:
+                fast = self.totals(group_by, items_filter)
+            finally:
+                sa.event.remove(engine, 'before_cursor_execute', listener)
+            self.assertFalse([statement for statement in statements if 'FROM items' in statement])
+            with patch.object(analytics, 'uses_totals', return_value=False):
+                self.assertEqual(fast, self.totals(group_by, items_filter))
+        self.assertFalse(analytics.uses_totals(ItemFilter(start_date=datetime.date(2023, 2, 2)), 'month'))
+        self.assertFalse(analytics.uses_totals(ItemFilter(search='мол'), 'month'))
+
+    def test_totals_agree_with_group_by(self):
+        """Тест одинаковых итогов из monthly_totals и GROUP BY по записям без даты, категории или цены"""
+        main.db_sess.execute(sa.text(
+            "INSERT INTO items (name, price, purchase_date, category_id) VALUES "
+            "('Без даты', 10.0, NULL, (SELECT id FROM categories WHERE name = 'Продукты')), "
+            "('Без категории', 20.0, '2023-02-10', NULL), "
+            "('Без цены', NULL, '2023-01-20', (SELECT id FROM categories WHERE name = 'Досуг'))"))
+        main.db_sess.commit()
+        filters = (ItemFilter(), ItemFilter(category='Продукты'), ItemFilter(start_date=datetime.date(2023, 2, 1)),
+                   ItemFilter(end_date=datetime.date(2023, 1, 31)),
+                   ItemFilter(start_date=datetime.date(2023, 1, 1), end_date=datetime.date(2023, 2, 28)))
+        fields = lambda rows: [(row.key, row.count, row.total, row.average) for row in rows]
+        for group_by in analytics.TOTALS_GROUPS:
+            for items_filter in filters:
+                with self.subTest(group_by=group_by, items_filter=items_filter):
+                    self.assertTrue(analytics.uses_totals(items_filter, group_by))
+                    fast = analytics.summarize(main.db_sess, items_filter, group_by)
+                    with patch.object(analytics, 'uses_totals', return_value=False):
+                        slow = analytics.summarize(main.db_sess, items_filter, group_by)
+                    self.assertEqual(fields(fast), fields(slow))
+        self.assertEqual(sum(row.count for row in analytics.summarize(main.db_sess, group_by='period')),
+                         count_items(main.db_sess))
+
+    def test_check_totals_repairs(self):
+        """Тест обнаружения расхождений и пересчёта итогов"""
+        main.db_sess.execute(sa.text("UPDATE monthly_totals SET total = total + 1 WHERE month = '2023-01'"))
+        main.db_sess.execute(sa.text("INSERT INTO monthly_totals VALUES (999, '2020-01', 1, 1.0)"))
+        main.db_sess.commit()
+        self.assertEqual(len(analytics.check_totals(main.db_sess)), 2)
+        self.assertEqual(analytics.check_totals(main.db_sess), [])
+        self.assertEqual(self.totals('month'), [('2023-01', 1, 50.0), ('2023-02', 2, 380.0)])
+
+
+@unittest.skipUnless(ItemSnapshot.available(), 'NumPy не установлен')
+class TestItemSnapshot(unittest.TestCase):
+
+    FILTERS = (ItemFilter(), ItemFilter(category='Продукты'), ItemFilter(sort='price'),
+               ItemFilter(sort='price', descending=True), ItemFilter(sort='date'),
+               ItemFilter(sort='date', descending=True, category='Продукты'),
+               ItemFilter(start_date=datetime.date(2023, 1, 15), end_date=datetime.date(2023, 2, 28)),
+               ItemFilter(search='моло'), ItemFilter(search='к'), ItemFilter(category='Нет такой'))
+
+    def setUp(self):
+        clear_db()
+        fill_db(('Хлеб', 'Продукты', 50.0, datetime.date(2023, 1, 10)),
+                ('Молоко', 'Продукты', 80.0, datetime.date(2023, 2, 1)),
+                ('Кефир', 'Продукты', 80.0, datetime.date(2023, 2, 1)),
+                ('Подарок', 'Досуг', None, None),
+                ('Кино', 'Досуг', 300.0, datetime.date(2023, 3, 5)))
+        self.snapshot = ItemSnapshot()
+
+    def assertSameAsQuery(self):
+        for items_filter in self.FILTERS:
+            self.assertEqual(self.snapshot.rows(main.db_sess, items_filter), query_rows(main.db_sess, items_filter),
+                             items_filter)
+
+    def test_rows_match_query(self):
+        """Тест совпадения фильтров и сортировки снимка с SQL-запросом"""
+        self.assertSameAsQuery()
+
+    def test_pages_match_query(self):
+        """Тест постраничного чтения снимка"""
+        for items_filter in self.FILTERS:
+            page = lambda after, size: self.snapshot.page(main.db_sess, items_filter, after, size)
+            self.assertEqual(read_pages(page), query_rows(main.db_sess, items_filter), items_filter)
+            self.assertEqual(self.snapshot.count(main.db_sess, items_filter), count_items(main.db_sess, items_filter))
+
+    def test_apply_changes(self):
+        """Тест заплаток снимка при добавлении, изменении и удалении записей"""
+        self.snapshot.load(main.db_sess)
+        changes = MagicMock()
+        main.notifications.subscribe(changes)
+        try:
+            add_items(('Сыр', 'Продукты', 350.0, datetime.date(2023, 2, 20)))
+            item = main.db_sess.query(Item).filter(Item.name == 'Хлеб').one()
+            service.edit_items(main.db_sess, [{'id': item.id, 'price': 10.0, 'name': 'Батон'}])
+            service.delete_items(main.db_sess, [main.db_sess.query(Item).filter(Item.name == 'Кино').one().id])
+        finally:
+            main.notifications.unsubscribe(changes)
+        for call in changes.call_args_list:
+            self.snapshot.apply(main.db_sess, *call.args)
+        self.assertSameAsQuery()
+
+    def test_export_chunks(self):
+        """Тест выгрузки строк из снимка"""
+        items_filter = ItemFilter(sort='price', descending=True)
+        expected = [tuple(row) for chunk in export.iter_chunks(main.db_sess, items_filter) for row in chunk]
+        self.assertEqual([row for chunk in self.snapshot.export_chunks(main.db_sess, items_filter, chunk_size=2)
+                          for row in chunk], expected)
+
+    def test_notebook_uses_snapshot(self):
+        """Тест главного окна со снимком в памяти"""
+        app = QApplication.instance() or QApplication([])
+        with patch.dict(main.settings, IN_MEMORY_SNAPSHOT=True):
+            notebook = Notebook()
+        self.assertEqual(notebook.table_model.rowCount(), 0)  # до показа окна база не читается
+        show_window(notebook)
+        self.assertIsNotNone(notebook.snapshot)
+        self.assertEqual(notebook.table_model.rowCount(), 5)
+        self.assertNotIsInstance(notebook.table_model.item(0), Item)
+        load_table(notebook, ItemFilter(sort='price'))
+        add_items(('Сыр', 'Продукты', 60.0, datetime.date(2023, 2, 20)))
+        notebook.executor.wait()
+        model = notebook.table_model
+        self.assertEqual([model.item(row).name for row in range(model.rowCount())],
+                         ['Подарок', 'Хлеб', 'Сыр', 'Молоко', 'Кефир', 'Кино'])
+
+    def test_import_refreshes_snapshot(self):
+        """Тест сброса снимка после загрузки файла, которая не оповещает об изменениях"""
+        app = QApplication.instance() or QApplication([])
+        with patch.dict(main.settings, IN_MEMORY_SNAPSHOT=True):
+            notebook = Notebook()
+        show_window(notebook)
+        path = os.path.join(tmp_dir.name, 'snapshot.csv')
+        with open(path, mode='w', encoding='utf-8') as file:
+            file.write('name,category,price,purchase_date\nСыр,Продукты,60,2023-02-20\n')
+        notebook.to_load_file(path)
+        notebook.import_worker.wait()
+        QApplication.processEvents()  # сигнал о завершении доставляется через очередь событий
+        notebook.executor.wait()
+        self.assertEqual(notebook.table_model.rowCount(), 6)
+        self.assertEqual(notebook.snapshot.count(main.db_sess), count_items(main.db_sess))
+
+    def test_concurrent_selections_load_once(self):
+        """Тест одной загрузки таблицы при одновременных выборках из нескольких потоков"""
+        import threading
+        from data import snapshot as snapshot_module
+
+        loads = []
+        from_rows = snapshot_module.Columns.from_rows
+
+        def slow_from_rows(rows):
+            loads.append(len(rows))
+            threading.Event().wait(0.05)  # остальные потоки успевают начать выборку
+            return from_rows(rows)
+
+        def select():
+            session = db_session.create_session()
+            try:
+                results.append(self.snapshot.count(session))
+            finally:
+                session.close()
+
+        results = []
+        with patch.object(snapshot_module.Columns, 'from_rows', side_effect=slow_from_rows):
+            threads = [threading.Thread(target=select) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual((loads, results), ([5], [5] * 4))
+
+
+class TestExporters(unittest.TestCase):
+
+    def setUp(self):
+        clear_db()
+        fill_db(('Хлеб', 'Продукты', 50.0, datetime.date(2023, 1, 10)),
+                ('Кино', 'Досуг', 300.0, datetime.date(2023, 3, 5)))
+
+    def export_to(self, name):
+        path = os.path.join(tmp_dir.name, f'report.{export.EXPORTERS[name].extension}')
+        written = export.export(name, path, export.iter_chunks(main.db_sess, ItemFilter(sort='price'), chunk_size=1))
+        self.assertEqual(written, 2)
+        return path
+
+    def test_csv(self):
+        """Тест выгрузки в CSV"""
+        with open(self.export_to('csv'), encoding='utf-8') as file:
+            self.assertEqual(file.read().splitlines()[1], 'Хлеб,Продукты,50.0,2023-01-10,')
+
+    def test_jsonl(self):
+        """Тест выгрузки в JSON Lines"""
+        import json
+        with open(self.export_to('jsonl'), encoding='utf-8') as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual(rows[1], {'name': 'Кино', 'category': 'Досуг', 'price': 300.0,
+                                   'purchase_date': '2023-03-05', 'about': None})
+
+    @unittest.skipUnless('columnar' in export.EXPORTERS, 'нет pyarrow и numpy')
+    def test_columnar(self):
+        """Тест колоночной выгрузки"""
+        path = self.export_to('columnar')
+        if path.endswith('.npz'):
+            import numpy
+            data = numpy.load(path)
+            self.assertEqual(list(data['price']), [50.0, 300.0])
+            self.assertEqual(list(data['categories'][data['category_code']]), ['Продукты', 'Досуг'])
+
+    def test_cancel_removes_file(self):
+        """Тест отмены выгрузки"""
+        path = os.path.join(tmp_dir.name, 'cancelled.csv')
+        with self.assertRaises(export.ExportCancelled):
+            export.export('csv', path, export.iter_chunks(main.db_sess, ItemFilter(), chunk_size=1),
+                          progress=lambda written: False)
+        self.assertFalse(os.path.exists(path))
+
+
+class TestImporters(unittest.TestCase):
+
+    def setUp(self):
+        clear_db()
+        fill_db(('Хлеб', 'Продукты', 50.0, datetime.date(2023, 1, 10)))
+
+    def test_csv_with_semicolons(self):
+        """Тест загрузки CSV с существующими и новыми категориями"""
+        path = os.path.join(tmp_dir.name, 'statement.csv')
+        with open(path, mode='w', encoding='utf-8-sig') as file:
+            file.write('name;category;price;purchase_date\n'
+                       'Молоко;продукты;79,90;01.02.2023\n'
+                       'Кино;Досуг;300;2023-03-05\n'
+                       ';Досуг;1;2023-03-05\n'
+                       'Такси;Транспорт;дорого;2023-03-05\n')
+        categories.load(main.db_sess)
+        with patch.object(categories, 'invalidate') as invalidate:
+            result = import_file(main.db_sess, path, chunk_size=2)
+        invalidate.assert_not_called()  # новые категории попадают в общий кэш при фиксации
+        self.assertIsNotNone(categories.find(main.db_sess, 'досуг'))
+        self.assertEqual(result, (2, 2))
+        self.assertEqual(main.db_sess.query(Category).count(), 2)
+        milk = main.db_sess.query(Item).filter(Item.name == 'Молоко').one()
+        self.assertEqual((milk.category.name, milk.price, milk.purchase_date),
+                         ('Продукты', 79.9, datetime.date(2023, 2, 1)))
+
+    def test_large_import_uses_bulk_load(self):
+        """Тест перехода на bulk_load, когда загружается много строк относительно таблицы"""
+        path = os.path.join(tmp_dir.name, 'large.csv')
+        with open(path, mode='w', encoding='utf-8') as file:
+            file.write('name,category,price,purchase_date\n' + ''.join(
+                f'Кофе {i},Продукты,{100 + i},2023-02-0{i + 1}\n' for i in range(5)))
+        schema = lambda: main.db_sess.execute(sa.text('SELECT type, name FROM sqlite_master ORDER BY name')).all()
+        before = schema()
+        with patch.object(bulk, 'bulk_load', wraps=bulk.bulk_load) as bulk_load:
+            self.assertEqual(import_file(main.db_sess, path, chunk_size=2), (5, 0))
+            bulk_load.assert_not_called()  # 5 строк меньше BULK_MIN_ROWS
+            with patch.object(bulk, 'BULK_MIN_ROWS', 3):
+                self.assertEqual(import_file(main.db_sess, path, chunk_size=2), (5, 0))
+            bulk_load.assert_called_once()
+        self.assertEqual(schema(), before)
+        self.assertEqual(analytics.check_totals(main.db_sess, repair=False), [])
+        self.assertEqual(count_items(main.db_sess, ItemFilter(search='кофе')), 10)
+
+    def test_category_added_by_another_connection(self):
+        """Тест загрузки, когда категорию уже добавило другое соединение, а кэш об этом не знает"""
+        categories.load(main.db_sess)
+        with db_session.create_session() as other:
+            other.execute(sa.text("INSERT INTO categories (name) VALUES ('Досуг')"))
+            other.commit()
+        path = os.path.join(tmp_dir.name, 'concurrent.csv')
+        with open(path, mode='w', encoding='utf-8') as file:
+            file.write('name,category,price,purchase_date\nКино,Досуг,300,2023-03-05\n')
+        self.assertEqual(import_file(main.db_sess, path), (1, 0))
+        self.assertEqual(main.db_sess.query(Category).filter(Category.name == 'Досуг').count(), 1)
+        self.assertIsNotNone(categories.find(main.db_sess, 'досуг'))
+
+    def test_xlsx_report_round_trip(self):
+        """Тест загрузки файла, сформированного выгрузкой в xlsx"""
+        path = os.path.join(tmp_dir.name, 'round_trip.xlsx')
+        export.export('xlsx', path, export.iter_chunks(main.db_sess, ItemFilter()))
+        self.assertEqual(import_file(main.db_sess, path), (1, 0))
+        self.assertEqual(main.db_sess.query(Item).filter(Item.name == 'Хлеб').count(), 2)
+
+
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        clear_db()
+        fill_db(('Хлеб', 'Продукты', 50.0, datetime.date(2023, 1, 10)))
+
+    def test_batch_add_edit_delete(self):
+        """Тест пачек добавления, изменения и удаления: id по порядку, оповещения и откат при ошибке"""
+        changes = []
+        callback = lambda added, updated, removed: changes.append((added, updated, removed))
+        notifications.subscribe(callback)
+        try:
+            ids = service.add_items(main.db_sess, ({'name': f'Кофе {i}', 'category': 'продукты', 'price': str(i + 1),
+                                                    'purchase_date': '2023-02-01'} for i in range(5)),
+                                    chunk_size=2)
+            self.assertEqual([row.name for row in query_rows(main.db_sess, ids=ids)],
+                             [f'Кофе {i}' for i in reversed(range(5))])
+            self.assertEqual(changes[-1], (ids, [], []))
+            self.assertEqual(service.edit_items(main.db_sess, [{'id': ids[0], 'price': 10, 'category': 'Досуг'},
+                                                               {'id': ids[1], 'name': 'Чай'}]), 2)
+            rows = {row.id: row for row in query_rows(main.db_sess, ids=ids[:2])}
+            self.assertEqual((rows[ids[0]].price, rows[ids[0]].category, rows[ids[1]].name), (10.0, 'Досуг', 'Чай'))
+            self.assertEqual(changes[-1], ([], sorted(ids[:2]), []))
+            with self.assertRaisesRegex(service.ValidationError, 'Запись 2: Слишком короткое название покупки'):
+                service.add_items(main.db_sess, [{'name': 'Сыр', 'category': 'Продукты', 'price': 300,
+                                                  'purchase_date': '2023-02-01'}, {'name': 'ы'}])
+            self.assertEqual(count_items(main.db_sess), 6)  # пачка не добавлена целиком
+            self.assertEqual(len(service.delete_items(main.db_sess, ids)), 5)
+        finally:
+            notifications.unsubscribe(callback)
+        self.assertEqual(analytics.check_totals(main.db_sess, repair=False), [])
+
+    def test_records_checked_like_item_form(self):
+        """Тест проверки цены и даты по правилам окна записи"""
+        record = {'name': 'Кофе', 'category': 'Продукты', 'price': 100, 'purchase_date': '2023-02-01'}
+        self.assertEqual(service.check_record(record)['price'], 100.0)
+        for field, value in (('price', 'nan'), ('price', -50), ('price', 0), ('price', 'inf'), ('price', None),
+                             ('purchase_date', ''), ('purchase_date', '1900-01-01'), ('purchase_date', '2099-01-01')):
+            with self.subTest(field=field, value=value), self.assertRaises(service.ValidationError):
+                service.check_record({**record, field: value})
+        with self.assertRaises(service.ValidationError):
+            service.check_record({'price': '1e12'}, partial=True)
+        with self.assertRaisesRegex(service.ValidationError, 'Слишком дорогая'):
+            service.check_record({'price': '1e9'}, partial=True, max_price=service.EXPENSIVE_PRICE)
+        for abramovich, allowed in ((1, True), (0, False), (-1, False)):
+            with self.subTest(abramovich=abramovich), patch.object(service, 'settings',
+                                                                   return_value={'ABRAMOVICH': abramovich}):
+                self.assertEqual(service.price_limit() > 10 ** 9, allowed)
+        with patch.object(service, 'settings', return_value={'ABRAMOVICH': 0}), \
+                self.assertRaisesRegex(service.ValidationError, 'Запись 1: Слишком дорогая'):
+            service.add_items(main.db_sess, [{**record, 'price': 10 ** 9}])
+        self.assertEqual(count_items(main.db_sess), 1)
+
+    def test_categories_resolved_through_registry(self):
+        """Тест сохранения записей без перечитывания всех категорий: новые попадают в общий кэш"""
+        categories.load(main.db_sess)
+        purchase = {'price': 100, 'purchase_date': '2023-02-01'}
+        with patch.object(categories, 'invalidate') as invalidate:
+            ids = service.add_items(main.db_sess, [{'name': 'Билет', 'category': 'Досуг', **purchase},
+                                                   {'name': 'Батон', 'category': 'ПРОДУКТЫ', **purchase}])
+            service.edit_items(main.db_sess, [{'id': ids[1], 'category': 'Выпечка'}])
+        invalidate.assert_not_called()
+        self.assertTrue(categories._loaded)
+        self.assertEqual({row.id: row.category for row in query_rows(main.db_sess, ids=ids)},
+                         {ids[0]: 'Досуг', ids[1]: 'Выпечка'})
+        self.assertEqual(categories.find(main.db_sess, 'досуг'), main.db_sess.query(Category.id).filter(
+            Category.name == 'Досуг').scalar())
+        self.assertIsNotNone(categories.find(main.db_sess, 'выпечка'))
+
+    def test_find_items_pages(self):
+        """Тест постраничного поиска по id последней записи страницы"""
+        service.add_items(main.db_sess, [{'name': f'Покупка {i}', 'category': 'Разное', 'price': i + 1,
+                                          'purchase_date': '2023-02-01'} for i in range(7)])
+        items_filter = service.parse_filter({'category': 'Разное', 'sort': 'price', 'descending': 'true'})
+        rows, after_id = [], None
+        while True:
+            page = service.find_items(main.db_sess, items_filter, after_id, limit=3)
+            rows.extend(page)
+            if len(page) < 3:
+                break
+            after_id = page[-1].id
+        self.assertEqual([row.price for row in rows], [7, 6, 5, 4, 3, 2, 1])
+        with self.assertRaises(service.ValidationError):
+            service.parse_filter({'sort': 'name'})
+
+    def test_http_api(self):
+        """Тест HTTP API: загрузка пачки, поиск, итоги, выгрузка и ошибки"""
+        import http.client
+        import threading
+        import urllib.parse
+        from data import server
+
+        http_server = server.Server(('127.0.0.1', 0))
+        quiet = patch.object(server.Handler, 'log_message')  # без журнала запросов в выводе тестов
+        quiet.start()
+        self.addCleanup(quiet.stop)
+        thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+        thread.start()
+        connection = http.client.HTTPConnection('127.0.0.1', http_server.server_port, timeout=10)
+
+        def request(method, path, body=None):
+            connection.request(method, path, None if body is None else json.dumps(body))
+            response = connection.getresponse()
+            data = response.read()
+            return response.status, json.loads(data) if 'json' in response.getheader('Content-Type') else data
+
+        try:
+            records = [{'name': f'Такси {i}', 'category': 'Транспорт', 'price': 100 + i,
+                        'purchase_date': '2023-03-01'} for i in range(2000)]
+            status, result = request('POST', '/items', records)
+            self.assertEqual((status, len(result['ids'])), (201, 2000))
+            ids = result['ids']
+            query = urllib.parse.urlencode({'category': 'Транспорт'})
+            self.assertEqual(request('GET', f'/items/count?{query}'), (200, {'count': 2000}))
+            status, result = request('GET', '/items?sort=price&limit=2')
+            self.assertEqual([item['price'] for item in result['items']], [50.0, 100.0])
+            status, result = request('GET', '/summary?group_by=category&percentiles=50')
+            self.assertEqual({group['key']: group['count'] for group in result['groups']},
+                             {'Продукты': 1, 'Транспорт': 2000})
+            query = urllib.parse.urlencode({'format': 'csv', 'category': 'Продукты'})
+            status, data = request('GET', f'/export?{query}')
+            self.assertEqual(data.decode('utf-8').splitlines()[1], 'Хлеб,Продукты,50.0,2023-01-10,')
+            self.assertEqual(request('PATCH', '/items', [{'id': item_id, 'price': 1} for item_id in ids[:2]]),
+                             (200, {'updated': 2}))
+            status, result = request('POST', '/items', [{'name': 'Такси', 'category': 'Т'}])
+            self.assertEqual(status, 400)
+            self.assertIn('категории', result['error'])
+            self.assertEqual(request('GET', '/nothing')[0], 404)
+            status, result = request('DELETE', '/items', {'ids': ids})
+            self.assertEqual((status, result['deleted']), (200, 2000))
+        finally:
+            connection.close()
+            http_server.shutdown()
+            http_server.server_close()
+
+    def test_cli(self):
+        """Тест командной строки: загрузка JSON Lines и поиск"""
+        path = os.path.join(tmp_dir.name, 'records.jsonl')
+        with open(path, mode='w', encoding='utf-8') as file:
+            file.write('{"name": "Молоко", "category": "Продукты", "price": "79,90", "purchase_date": "01.02.2023"}\n\n'
+                       '{"name": "Кино", "category": "Досуг", "price": 300, "purchase_date": "2023-02-01"}\n')
+        with patch('sys.stderr'):
+            self.assertEqual(service.main(['add', path]), 0)
+        with patch('sys.stdout') as stdout:
+            self.assertEqual(service.main(['search', '--category', 'Продукты', '--sort', 'price']), 0)
+        lines = [json.loads(call.args[0]) for call in stdout.write.call_args_list if call.args[0].strip()]
+        self.assertEqual([(line['name'], line['price']) for line in lines], [('Хлеб', 50.0), ('Молоко', 79.9)])
+
+    def test_cli_stdout_has_only_results(self):
+        """Тест вывода командной строки: сообщения о подключении и миграциях не попадают в stdout"""
+        process = subprocess.run([sys.executable, '-m', 'data.service', '--db', os.path.join(tmp_dir.name, 'cli.db'),
+                                  'count'], check=True, capture_output=True, text=True)
+        self.assertEqual(process.stdout, '0\n')
+        self.assertIn('профиль performance', process.stderr)  # тот же профиль, что у окна
+
+
+class TestGenerator(unittest.TestCase):
+
+    def setUp(self):
+        clear_db()
+        fill_db(('Хлеб', 'Продукты', 50.0, datetime.date(2023, 1, 10)))
+
+    def test_generated_rows(self):
+        """Тест генерации записей: категории, период, цены и воспроизводимость"""
+        start, end = datetime.date(2023, 1, 1), datetime.date(2023, 3, 31)
+        self.assertEqual(generator.generate(main.db_sess, 3000, categories=12, start=start, end=end, seed=1,
+                                            chunk_size=1000), 3000)
+        self.assertEqual(main.db_sess.query(Item).count(), 3001)
+        self.assertEqual(set(categories.names(main.db_sess)), set(generator.category_names(12)))
+        dates = main.db_sess.query(sa.func.min(Item.purchase_date), sa.func.max(Item.purchase_date)) \
+            .filter(Item.name != 'Хлеб').one()
+        self.assertTrue(start <= dates[0] <= dates[1] <= end)
+        self.assertEqual(main.db_sess.query(Item).filter(Item.price <= 0).count(), 0)
+        counts = dict(main.db_sess.query(Category.name, sa.func.count(Item.id)).join(Item.category)
+                      .group_by(Category.name))
+        self.assertGreater(counts['Продукты'], counts['Электроника'])  # популярность категорий убывает
+        query = 'SELECT name, price, purchase_date FROM items WHERE name != :name ORDER BY id'
+        first = main.db_sess.execute(sa.text(query), {'name': 'Хлеб'}).all()
+        clear_db()
+        generator.generate(main.db_sess, 3000, categories=12, start=start, end=end, seed=1, chunk_size=1000)
+        self.assertEqual(main.db_sess.execute(sa.text(query), {'name': 'Хлеб'}).all(), first)
+
+    def test_indexes_and_derived_tables_are_restored(self):
+        """Тест восстановления индексов и триггеров после массовой вставки"""
+        def schema():
+            return set(main.db_sess.execute(sa.text("SELECT name FROM sqlite_master WHERE tbl_name = 'items'"))
+                       .scalars())
+        before = schema()
+        generator.generate(main.db_sess, 500, seed=2)
+        self.assertEqual(schema(), before)
+        self.assertEqual(analytics.check_totals(main.db_sess, repair=False), [])
+        self.assertEqual(count_items(main.db_sess, ItemFilter(search='кофе')),
+                         main.db_sess.query(Item).filter(Item.name == 'кофе').count())
+        fill_db(('Кофе в зёрнах', 'Продукты', 900.0, datetime.date(2023, 1, 10)))  # триггеры снова работают
+        self.assertEqual(analytics.check_totals(main.db_sess, repair=False), [])
+        self.assertIn('Кофе в зёрнах', [row.name for row in query_rows(main.db_sess, ItemFilter(search='в зёр'))])
+
+
+class TestCategoryRegistry(unittest.TestCase):
+
+    def setUp(self):
+        clear_db()
+        fill_db(('Хлеб', 'Продукты', 50.0, datetime.date(2023, 1, 10)))
+
+    def test_lookup_is_case_insensitive(self):
+        """Тест поиска категории без учёта регистра"""
+        category_id = categories.find(main.db_sess, 'продукты')
+        self.assertEqual(categories.resolve(main.db_sess, [' ПРОДУКТЫ ', 'продукты']), {'продукты': category_id})
+        self.assertEqual(main.db_sess.query(Category).count(), 1)
+
+    def test_cache_follows_commits(self):
+        """Тест согласованности кэша при добавлении, переименовании, удалении и откате"""
+        categories.load(main.db_sess)
+        with patch.object(categories, 'invalidate') as invalidate:
+            categories.resolve(main.db_sess, ['Досуг'])
+            main.db_sess.rollback()
+            self.assertIsNone(categories.find(main.db_sess, 'досуг'))
+            category_id = categories.resolve(main.db_sess, ['Досуг', 'досуг'])['досуг']
+            main.db_sess.commit()
+            self.assertEqual(categories.find(main.db_sess, 'досуг'), category_id)
+            category = main.db_sess.get(Category, category_id)
+            category.name = 'Отдых'
+            main.db_sess.commit()
+            self.assertIsNone(categories.find(main.db_sess, 'досуг'))
+            self.assertEqual(categories.name(category_id), 'Отдых')
+            invalidate.assert_not_called()
+            self.assertTrue(categories._loaded)  # кэш не перечитывается из базы
+        main.db_sess.delete(category)
+        main.db_sess.commit()
+        self.assertNotIn('Отдых', categories.names(main.db_sess))
+
+
+class TestMigrations(unittest.TestCase):
+
+    def test_upgrade_adds_indexes_without_data_loss(self):
+        """Тест миграции базы данных, созданной до появления индексов"""
+        engine = sa.create_engine(f"sqlite:///{os.path.join(tmp_dir.name, 'old.db')}")
+        with engine.begin() as connection:
+            connection.execute(sa.text('CREATE TABLE categories (id INTEGER PRIMARY KEY, name VARCHAR UNIQUE, '
+                                       'created_date DATETIME)'))
+            connection.execute(sa.text('CREATE TABLE items (id INTEGER PRIMARY KEY, name VARCHAR, price FLOAT, '
+                                       'purchase_date DATE, about VARCHAR, created_date DATETIME, '
+                                       'category_id INTEGER REFERENCES categories (id))'))
+            connection.execute(sa.text('CREATE INDEX ix_categories_name_nocase ON categories (name COLLATE NOCASE)'))
+            connection.execute(sa.text("INSERT INTO categories (id, name) VALUES (1, 'food')"))
+            connection.execute(sa.text("INSERT INTO items (name, price, category_id) VALUES ('bread', 1.0, 1)"))
+        self.assertEqual(migrations.upgrade(engine), len(migrations.MIGRATIONS))
+        with engine.connect() as connection:
+            indexes = set(connection.execute(sa.text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+            self.assertIn('ix_items_category_id_purchase_date_price', indexes)
+            self.assertNotIn('ix_categories_name_nocase', indexes)  # не используется запросами (версия 5)
+            self.assertEqual(connection.execute(sa.text('SELECT count(*) FROM items')).scalar(), 1)
+            self.assertEqual(migrations.get_version(connection), len(migrations.MIGRATIONS))
+        engine.dispose()
+
+
+class TestEngineProfiles(unittest.TestCase):
+
+    def test_performance_profile_pragmas(self):
+        """Тест применения настроек профиля к каждому соединению"""
+        engine = db_session.create_engine(os.path.join(tmp_dir.name, 'profile.db'), 'performance')
+        with engine.connect() as connection:
+            pragma = lambda name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+            self.assertEqual(pragma('journal_mode'), 'wal')
+            self.assertEqual(pragma('synchronous'), 1)  # NORMAL
+            self.assertEqual(pragma('temp_store'), 2)  # MEMORY
+            self.assertEqual(pragma('busy_timeout'), 5000)
+            self.assertEqual(connection.exec_driver_sql("SELECT casefold('ПРИВЕТ')").scalar(), 'привет')
+        engine.dispose()
+
+    def test_default_profile_shares_wal_database(self):
+        """Тест работы профиля default с базой, открытой другим соединением в режиме WAL"""
+        path = os.path.join(tmp_dir.name, 'shared.db')
+        wal, default = db_session.create_engine(path, 'performance'), db_session.create_engine(path, 'default')
+        with wal.connect() as connection:
+            connection.exec_driver_sql('CREATE TABLE IF NOT EXISTS t (x)')
+            connection.exec_driver_sql('SELECT * FROM t').all()
+            with default.connect() as other:
+                self.assertEqual(other.exec_driver_sql('SELECT count(*) FROM t').scalar(), 0)
+                self.assertEqual(other.exec_driver_sql('PRAGMA journal_mode').scalar(), 'wal')
+                self.assertEqual(other.exec_driver_sql('PRAGMA busy_timeout').scalar(), 5000)
+        wal.dispose()
+        default.dispose()
+
+    def test_unknown_profile(self):
+        """Тест ошибки при неизвестном профиле"""
+        with self.assertRaises(Exception):
+            db_session.create_engine(os.path.join(tmp_dir.name, 'profile.db'), 'turbo')
+
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_compare_with_baseline(self):
+        """Тест сравнения результатов замеров с эталоном"""
+        baseline = {'results': {'1000': {'init_table': {'median': 10.0}, 'to_search': {'median': 0.2},
+                                         'to_get_file_csv': {'median': 50.0}}}}
+        current = {'results': {'1000': {'init_table': {'median': 20.0}, 'to_search': {'median': 0.5},
+                                        'to_get_file_csv': {'median': 55.0}},
+                               '100000': {'init_table': {'median': 30.0}}}}
+        regressed = {case: flag for _, case, _, _, _, flag in suite.compare(current, baseline)}
+        self.assertEqual(regressed, {'init_table': True, 'to_search': False, 'to_get_file_csv': False})
+
+    def test_sqlite_profile_measure(self):
+        """Тест замера профиля SQLite на новой базе со схемой после миграций"""
+        directory = tempfile.mkdtemp(dir=tmp_dir.name)
+        with patch('sys.stdout'):
+            result = sqlite_profiles.measure(directory, 'safe', commits=3, rows=200)
+        self.assertTrue(all(value > 0 for value in result.values()))
+
+    def test_suite_writes_results(self):
+        """Тест запуска замеров на маленькой базе с сохранением результатов в JSON"""
+        path = os.path.join(tmp_dir.name, 'results.json')
+        subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--sizes', '200', '--repeat', '1', '--reports', 'csv',
+                        '--output', path, '--baseline', os.path.join(tmp_dir.name, 'no_baseline.json')],
+                       check=True, capture_output=True, env={**os.environ, 'QT_QPA_PLATFORM': 'offscreen'})
+        with open(path) as file:
+            results = json.load(file)['results']['200']
+        self.assertLessEqual({'init_table', 'filter_period', 'to_search', 'to_delete_item', 'get_checked_items',
+                              'to_get_file_csv'}, results.keys())
+
+    def test_startup_import_times(self):
+        """Тест разбора вывода -X importtime: только main и модули, импортированные им напрямую"""
+        stderr = ('import time: self [us] | cumulative | imported package\n'
+                  'import time:       100 |        100 |   json.decoder\n'
+                  'import time:       200 |        300 | json\n'
+                  'import time:      1000 |       1000 |     sqlalchemy.sql\n'
+                  'import time:       500 |       1500 |   sqlalchemy\n'
+                  'import time:       300 |        300 |   data.queries\n'
+                  'import time:      2000 |       3800 | main\n')
+        self.assertEqual(startup.import_times(stderr), {'main': 3.8, 'sqlalchemy': 1.5, 'data.queries': 0.3})
+
+    def test_startup_stages(self):
+        """Тест замера этапов запуска окна в отдельном процессе"""
+        path = os.path.join(tmp_dir.name, 'startup.json')
+        subprocess.run([sys.executable, '-m', 'benchmarks.startup', '--rows', '200', '--repeat', '1', '--output', path,
+                        '--baseline', os.path.join(tmp_dir.name, 'no_baseline.json')], check=True, capture_output=True)
+        with open(path) as file:
+            results = json.load(file)
+        stages = [results['results']['startup'][case]['median'] for case in startup.CASES]
+        self.assertEqual(stages, sorted(stages))  # окно отрисовывается раньше, чем приходит первая страница
+        self.assertIn('data.export', results['meta']['imports'])
+        process = subprocess.run([sys.executable, '-c', 'import sys, main; print(sorted({"openpyxl", "numpy"} '
+                                  '& sys.modules.keys()))'], check=True, capture_output=True, text=True)
+        self.assertEqual(process.stdout.strip(), '[]')  # загружаются при первой выгрузке или расчёте итогов
+
+
 if __name__ == "__main__":
     unittest.main()
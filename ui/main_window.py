@@ -2,7 +2,7 @@
 
 # Form implementation generated from reading ui file 'main_window.ui'
 #
-# Created by: PyQt5 UI code generator 5.15.7
+# Created by: PyQt5 UI code generator 5.15.11
 #
 # WARNING: Any manual changes made to this file will be lost when pyuic5 is
 # run again.  Do not edit this file unless you know what you are doing.
@@ -12,18 +12,15 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 
 
 class Ui_MainWindow(object):
-    """Интерфейс главного окна"""
     def setupUi(self, MainWindow):
         MainWindow.setObjectName("MainWindow")
         MainWindow.resize(1120, 867)
-
         self.centralwidget = QtWidgets.QWidget(MainWindow)
         self.centralwidget.setObjectName("centralwidget")
         self.verticalLayout_2 = QtWidgets.QVBoxLayout(self.centralwidget)
         self.verticalLayout_2.setObjectName("verticalLayout_2")
         self.verticalLayout = QtWidgets.QVBoxLayout()
         self.verticalLayout.setObjectName("verticalLayout")
-
         self.title = QtWidgets.QLabel(self.centralwidget)
         font = QtGui.QFont()
         font.setFamily("Calibri")
@@ -33,11 +30,9 @@ class Ui_MainWindow(object):
         self.title.setFont(font)
         self.title.setAlignment(QtCore.Qt.AlignCenter)
         self.title.setObjectName("title")
-
         self.verticalLayout.addWidget(self.title)
         self.horizontalLayout = QtWidgets.QHBoxLayout()
         self.horizontalLayout.setObjectName("horizontalLayout")
-
         self.search_bar = QtWidgets.QLineEdit(self.centralwidget)
         self.search_bar.setEnabled(True)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Ignored)
@@ -50,7 +45,6 @@ class Ui_MainWindow(object):
         font.setPointSize(10)
         self.search_bar.setFont(font)
         self.search_bar.setObjectName("search_bar")
-
         self.horizontalLayout.addWidget(self.search_bar)
         self.search = QtWidgets.QPushButton(self.centralwidget)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Fixed)
@@ -63,7 +57,6 @@ class Ui_MainWindow(object):
         self.verticalLayout.addLayout(self.horizontalLayout)
         self.horizontalLayout_2 = QtWidgets.QHBoxLayout()
         self.horizontalLayout_2.setObjectName("horizontalLayout_2")
-
         self.add_item = QtWidgets.QPushButton(self.centralwidget)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Preferred)
         sizePolicy.setHorizontalStretch(0)
@@ -76,7 +69,6 @@ class Ui_MainWindow(object):
         self.add_item.setFont(font)
         self.add_item.setObjectName("add_item")
         self.horizontalLayout_2.addWidget(self.add_item)
-
         self.edit_item = QtWidgets.QPushButton(self.centralwidget)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Preferred)
         sizePolicy.setHorizontalStretch(0)
@@ -89,7 +81,6 @@ class Ui_MainWindow(object):
         self.edit_item.setFont(font)
         self.edit_item.setObjectName("edit_item")
         self.horizontalLayout_2.addWidget(self.edit_item)
-
         self.delete_item = QtWidgets.QPushButton(self.centralwidget)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Preferred)
         sizePolicy.setHorizontalStretch(0)
@@ -102,7 +93,6 @@ class Ui_MainWindow(object):
         self.delete_item.setFont(font)
         self.delete_item.setObjectName("delete_item")
         self.horizontalLayout_2.addWidget(self.delete_item)
-
         self.filter = QtWidgets.QPushButton(self.centralwidget)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Preferred)
         sizePolicy.setHorizontalStretch(0)
@@ -115,91 +105,96 @@ class Ui_MainWindow(object):
         self.filter.setFont(font)
         self.filter.setObjectName("filter")
         self.horizontalLayout_2.addWidget(self.filter)
-
         self.verticalLayout.addLayout(self.horizontalLayout_2)
-        self.shopping_list = QtWidgets.QTableWidget(self.centralwidget)
+        self.shopping_list = QtWidgets.QTableView(self.centralwidget)
         self.shopping_list.setContextMenuPolicy(QtCore.Qt.DefaultContextMenu)
         self.shopping_list.setLayoutDirection(QtCore.Qt.LeftToRight)
         self.shopping_list.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
         self.shopping_list.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
         self.shopping_list.setSizeAdjustPolicy(QtWidgets.QAbstractScrollArea.AdjustToContents)
+        self.shopping_list.setAlternatingRowColors(True)
         self.shopping_list.setGridStyle(QtCore.Qt.SolidLine)
         self.shopping_list.setObjectName("shopping_list")
-        self.shopping_list.setColumnCount(6)
-        self.shopping_list.setRowCount(0)
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignCenter)
-        font = QtGui.QFont()
-        font.setFamily("Calibri")
-        font.setPointSize(12)
-        font.setBold(True)
-        font.setWeight(75)
-        item.setFont(font)
-        self.shopping_list.setHorizontalHeaderItem(0, item)
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignCenter)
-        font = QtGui.QFont()
-        font.setFamily("Calibri")
-        font.setPointSize(12)
-        font.setBold(True)
-        font.setWeight(75)
-        item.setFont(font)
-        self.shopping_list.setHorizontalHeaderItem(1, item)
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignCenter)
-        font = QtGui.QFont()
-        font.setFamily("Calibri")
-        font.setPointSize(12)
-        font.setBold(True)
-        font.setWeight(75)
-        item.setFont(font)
-        self.shopping_list.setHorizontalHeaderItem(2, item)
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignCenter)
+        self.shopping_list.verticalHeader().setDefaultSectionSize(20)
+        self.verticalLayout.addWidget(self.shopping_list)
+        self.horizontalLayout_3 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_3.setObjectName("horizontalLayout_3")
+        self.get_file = QtWidgets.QPushButton(self.centralwidget)
         font = QtGui.QFont()
         font.setFamily("Calibri")
         font.setPointSize(12)
-        font.setBold(True)
-        font.setWeight(75)
-        item.setFont(font)
-        self.shopping_list.setHorizontalHeaderItem(3, item)
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignCenter)
+        self.get_file.setFont(font)
+        self.get_file.setObjectName("get_file")
+        self.horizontalLayout_3.addWidget(self.get_file)
+        self.export_format = QtWidgets.QComboBox(self.centralwidget)
         font = QtGui.QFont()
         font.setFamily("Calibri")
         font.setPointSize(12)
-        font.setBold(True)
-        font.setWeight(75)
-        item.setFont(font)
-        self.shopping_list.setHorizontalHeaderItem(4, item)
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignCenter)
+        self.export_format.setFont(font)
+        self.export_format.setObjectName("export_format")
+        self.horizontalLayout_3.addWidget(self.export_format)
+        self.load_file = QtWidgets.QPushButton(self.centralwidget)
         font = QtGui.QFont()
         font.setFamily("Calibri")
         font.setPointSize(12)
-        font.setBold(True)
-        font.setWeight(75)
-        item.setFont(font)
-        self.shopping_list.setHorizontalHeaderItem(5, item)
-        self.shopping_list.setAlternatingRowColors(True)
-        self.shopping_list.verticalHeader().setDefaultSectionSize(20)
-        self.shopping_list.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeToContents)
-        self.shopping_list.horizontalHeader().setSectionResizeMode(1, QtWidgets.QHeaderView.Stretch)
-        self.shopping_list.horizontalHeader().setSectionResizeMode(2, QtWidgets.QHeaderView.ResizeToContents)
-        self.shopping_list.horizontalHeader().setSectionResizeMode(3, QtWidgets.QHeaderView.ResizeToContents)
-        self.shopping_list.horizontalHeader().setSectionResizeMode(4, QtWidgets.QHeaderView.ResizeToContents)
-        self.shopping_list.horizontalHeader().setSectionResizeMode(5, QtWidgets.QHeaderView.ResizeToContents)
-        self.verticalLayout.addWidget(self.shopping_list)
-
-        self.get_file = QtWidgets.QPushButton(self.centralwidget)
+        self.load_file.setFont(font)
+        self.load_file.setObjectName("load_file")
+        self.horizontalLayout_3.addWidget(self.load_file)
+        self.verticalLayout.addLayout(self.horizontalLayout_3)
+        self.verticalLayout_2.addLayout(self.verticalLayout)
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.summary_dock = QtWidgets.QDockWidget(MainWindow)
+        self.summary_dock.setFeatures(QtWidgets.QDockWidget.DockWidgetClosable|QtWidgets.QDockWidget.DockWidgetFloatable|QtWidgets.QDockWidget.DockWidgetMovable)
+        self.summary_dock.setObjectName("summary_dock")
+        self.summary_widget = QtWidgets.QWidget()
+        self.summary_widget.setObjectName("summary_widget")
+        self.verticalLayout_3 = QtWidgets.QVBoxLayout(self.summary_widget)
+        self.verticalLayout_3.setObjectName("verticalLayout_3")
+        self.summary_group = QtWidgets.QComboBox(self.summary_widget)
         font = QtGui.QFont()
         font.setFamily("Calibri")
         font.setPointSize(12)
-        self.get_file.setFont(font)
-        self.get_file.setObjectName("get_file")
-        self.verticalLayout.addWidget(self.get_file)
-        self.verticalLayout_2.addLayout(self.verticalLayout)
-        MainWindow.setCentralWidget(self.centralwidget)
+        self.summary_group.setFont(font)
+        self.summary_group.setObjectName("summary_group")
+        self.verticalLayout_3.addWidget(self.summary_group)
+        self.summary_percentiles = QtWidgets.QCheckBox(self.summary_widget)
+        self.summary_percentiles.setObjectName("summary_percentiles")
+        self.verticalLayout_3.addWidget(self.summary_percentiles)
+        self.summary_view = QtWidgets.QTableView(self.summary_widget)
+        self.summary_view.setAlternatingRowColors(True)
+        self.summary_view.setObjectName("summary_view")
+        self.summary_view.verticalHeader().setVisible(False)
+        self.summary_view.verticalHeader().setDefaultSectionSize(20)
+        self.verticalLayout_3.addWidget(self.summary_view)
+        self.summary_dock.setWidget(self.summary_widget)
+        MainWindow.addDockWidget(QtCore.Qt.DockWidgetArea(2), self.summary_dock)
+        self.debug_dock = QtWidgets.QDockWidget(MainWindow)
+        self.debug_dock.setFeatures(QtWidgets.QDockWidget.DockWidgetClosable|QtWidgets.QDockWidget.DockWidgetFloatable|QtWidgets.QDockWidget.DockWidgetMovable)
+        self.debug_dock.setObjectName("debug_dock")
+        self.debug_widget = QtWidgets.QWidget()
+        self.debug_widget.setObjectName("debug_widget")
+        self.verticalLayout_4 = QtWidgets.QVBoxLayout(self.debug_widget)
+        self.verticalLayout_4.setObjectName("verticalLayout_4")
+        self.debug_view = QtWidgets.QTableView(self.debug_widget)
+        self.debug_view.setAlternatingRowColors(True)
+        self.debug_view.setObjectName("debug_view")
+        self.debug_view.verticalHeader().setVisible(False)
+        self.debug_view.verticalHeader().setDefaultSectionSize(20)
+        self.verticalLayout_4.addWidget(self.debug_view)
+        self.horizontalLayout_4 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_4.setObjectName("horizontalLayout_4")
+        self.save_actions = QtWidgets.QPushButton(self.debug_widget)
+        self.save_actions.setObjectName("save_actions")
+        self.horizontalLayout_4.addWidget(self.save_actions)
+        self.save_trace = QtWidgets.QPushButton(self.debug_widget)
+        self.save_trace.setObjectName("save_trace")
+        self.horizontalLayout_4.addWidget(self.save_trace)
+        self.clear_actions = QtWidgets.QPushButton(self.debug_widget)
+        self.clear_actions.setObjectName("clear_actions")
+        self.horizontalLayout_4.addWidget(self.clear_actions)
+        self.verticalLayout_4.addLayout(self.horizontalLayout_4)
+        self.debug_dock.setWidget(self.debug_widget)
+        MainWindow.addDockWidget(QtCore.Qt.DockWidgetArea(8), self.debug_dock)
 
         self.retranslateUi(MainWindow)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
@@ -208,22 +203,17 @@ class Ui_MainWindow(object):
         _translate = QtCore.QCoreApplication.translate
         MainWindow.setWindowTitle(_translate("MainWindow", "Записная книжка"))
         self.title.setText(_translate("MainWindow", "Программа для контроля собственных денежных средств"))
-        self.search_bar.setText(_translate("Form", "Введите название покупки"))
+        self.search_bar.setPlaceholderText(_translate("MainWindow", "Введите название покупки"))
         self.search.setText(_translate("MainWindow", "🔎"))
         self.add_item.setText(_translate("MainWindow", "Добавить запись"))
-        self.delete_item.setText(_translate("MainWindow", "Удалить записи"))
         self.edit_item.setText(_translate("MainWindow", "Редактировать запись"))
+        self.delete_item.setText(_translate("MainWindow", "Удалить записи"))
         self.filter.setText(_translate("MainWindow", "Фильтр"))
-        item = self.shopping_list.horizontalHeaderItem(0)
-        item.setText(_translate("MainWindow", "id"))
-        item = self.shopping_list.horizontalHeaderItem(1)
-        item.setText(_translate("MainWindow", "Название покупки"))
-        item = self.shopping_list.horizontalHeaderItem(2)
-        item.setText(_translate("MainWindow", "Категория"))
-        item = self.shopping_list.horizontalHeaderItem(3)
-        item.setText(_translate("MainWindow", "Цена/руб."))
-        item = self.shopping_list.horizontalHeaderItem(4)
-        item.setText(_translate("MainWindow", "Дата покупки"))
-        item = self.shopping_list.horizontalHeaderItem(5)
-        item.setText(_translate("MainWindow", "✔"))
-        self.get_file.setText(_translate("MainWindow", "Выгрузить список покупок в формате xlsx (Excel)"))
+        self.get_file.setText(_translate("MainWindow", "Выгрузить список покупок в формате"))
+        self.load_file.setText(_translate("MainWindow", "Загрузить покупки из файла"))
+        self.summary_dock.setWindowTitle(_translate("MainWindow", "Итоги"))
+        self.summary_percentiles.setText(_translate("MainWindow", "Медиана и 90% цены (расчёт по всем записям выборки)"))
+        self.debug_dock.setWindowTitle(_translate("MainWindow", "Отладка"))
+        self.save_actions.setText(_translate("MainWindow", "Сохранить в JSON"))
+        self.save_trace.setText(_translate("MainWindow", "Сохранить Chrome trace"))
+        self.clear_actions.setText(_translate("MainWindow", "Очистить"))
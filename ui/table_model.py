@@ -0,0 +1,322 @@
+import datetime
+
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import Qt
+
+COLUMNS = ('id', 'Название покупки', 'Категория', 'Цена/руб.', 'Дата покупки', '✔')
+ID_COLUMN, NAME_COLUMN, CATEGORY_COLUMN, PRICE_COLUMN, DATE_COLUMN, CHECK_COLUMN = range(len(COLUMNS))
+
+
+class ItemTableModel(QtCore.QAbstractTableModel):
+    """Модель таблицы покупок (данные ячеек формируются только для видимых строк, записи читаются по страницам)"""
+    more_requested = QtCore.pyqtSignal()  # представление дошло до конца загруженных строк
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._items = []
+        self._checked = bytearray()  # состояние чекбоксов: один байт на строку
+        self._cursor = None  # последняя прочитанная запись: следующая страница начинается после неё
+        self._more = False  # в выборке есть ещё не прочитанные записи
+        self._fetching = False
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._items)
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        if index.column() == CHECK_COLUMN:
+            return Qt.ItemIsEnabled | Qt.ItemIsUserCheckable
+        return Qt.ItemIsEnabled
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if column == CHECK_COLUMN:
+            if role == Qt.CheckStateRole:
+                return Qt.Checked if self._checked[row] else Qt.Unchecked
+            return None
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        item = self._items[row]
+        if column == ID_COLUMN:
+            return str(item.id)
+        if column == NAME_COLUMN:
+            return item.name
+        if column == CATEGORY_COLUMN:  # название из JOIN запроса строк ItemRow
+            return item.category
+        if column == PRICE_COLUMN:
+            return item.price
+        return item.purchase_date
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()) -> bool:
+        return not parent.isValid() and self._more and not self._fetching
+
+    def fetchMore(self, parent=QtCore.QModelIndex()) -> None:
+        """Запрос следующей страницы (читается в фоне и добавляется через append_items)"""
+        if self.canFetchMore(parent):
+            self._fetching = True
+            self.more_requested.emit()
+
+    @property
+    def cursor(self):
+        return self._cursor
+
+    def setData(self, index, value, role=Qt.EditRole) -> bool:
+        if not index.isValid() or index.column() != CHECK_COLUMN or role != Qt.CheckStateRole:
+            return False
+        self._checked[index.row()] = value == Qt.Checked
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def set_items(self, items, more=False) -> None:
+        """Замена всех записей модели; more - выборка прочитана не полностью"""
+        self.beginResetModel()
+        self._items = list(items)
+        self._checked = bytearray(len(self._items))
+        self._cursor, self._more, self._fetching = self._items[-1] if self._items else None, more, False
+        self.endResetModel()
+
+    def fetch_failed(self) -> None:
+        """Ошибка чтения страницы: при следующей прокрутке страница запрашивается снова"""
+        self._fetching = False
+
+    def append_items(self, items, more=False) -> None:
+        """Добавление следующей страницы записей в конец таблицы"""
+        self._fetching = False
+        self._more = more
+        if not items:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), len(self._items), len(self._items) + len(items) - 1)
+        self._items.extend(items)
+        self._checked.extend(bytes(len(items)))
+        self._cursor = items[-1]
+        self.endInsertRows()
+
+    def insert_item(self, row, item) -> None:
+        """Вставка одной записи в указанную строку"""
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self._items.insert(row, item)
+        self._checked[row:row] = b'\x00'
+        self.endInsertRows()
+
+    def insert_sorted(self, item, key, reverse=False) -> int:
+        """Вставка записи с сохранением порядка строк по ключу сортировки
+
+        Запись после последней прочитанной не вставляется (-1): она придёт со следующей страницей."""
+        value, low, high = key(item), 0, len(self._items)
+        if self._more and self._cursor is not None and ((value < key(self._cursor)) if reverse
+                                                        else (value > key(self._cursor))):
+            return -1
+        while low < high:  # бинарный поиск позиции
+            middle = (low + high) // 2
+            current = key(self._items[middle])
+            if (current > value) if reverse else (current < value):
+                low = middle + 1
+            else:
+                high = middle
+        self.insert_item(low, item)
+        return low
+
+    def remove_ids(self, ids) -> None:
+        """Удаление строк с указанными id записей"""
+        ids = set(ids)
+        if not ids:
+            return
+        row = len(self._items) - 1
+        while row >= 0:  # удаляем подряд идущие строки одним диапазоном
+            if self._items[row].id not in ids:
+                row -= 1
+                continue
+            last = row
+            while row > 0 and self._items[row - 1].id in ids:
+                row -= 1
+            self.beginRemoveRows(QtCore.QModelIndex(), row, last)
+            del self._items[row:last + 1]
+            del self._checked[row:last + 1]
+            self.endRemoveRows()
+            row -= 1
+
+    def item(self, row):
+        """Запись, отображаемая в строке"""
+        return self._items[row]
+
+    def is_checked(self, row) -> bool:
+        return bool(self._checked[row])
+
+    def checked_rows(self) -> list:
+        """Номера выбранных строк"""
+        return [row for row, checked in enumerate(self._checked) if checked]
+
+    def checked_ids(self) -> list:
+        """id выбранных записей (за один проход по состоянию чекбоксов)"""
+        return [self._items[row].id for row in self.checked_rows()]
+
+    def set_all_checked(self, checked) -> None:
+        """Установка состояния всех чекбоксов"""
+        if not self._items:
+            return
+        self._checked[:] = (b'\x01' if checked else b'\x00') * len(self._checked)
+        self.dataChanged.emit(self.index(0, CHECK_COLUMN), self.index(len(self._items) - 1, CHECK_COLUMN),
+                              [Qt.CheckStateRole])
+
+
+SUMMARY_PERCENTILES = (50, 90)  # перцентили цены на панели итогов
+SUMMARY_COLUMNS = ('Группа', 'Покупок', 'Сумма/руб.', 'Средняя', 'Медиана', '90%')
+
+
+class SummaryTableModel(QtCore.QAbstractTableModel):
+    """Модель панели итогов: строка на группу записей (см. data.analytics.summarize)"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(SUMMARY_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return SUMMARY_COLUMNS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignLeft | Qt.AlignVCenter if index.column() == 0 else Qt.AlignRight | Qt.AlignVCenter
+        if role != Qt.DisplayRole:
+            return None
+        summary, column = self._rows[index.row()], index.column()
+        if column == 0:
+            key = summary.key
+            return key.strftime('%d.%m.%Y') if isinstance(key, datetime.date) else str(key)
+        if column == 1:
+            return str(summary.count)
+        value = (summary.total, summary.average) + tuple(summary.percentiles)
+        value = value[column - 2] if column - 2 < len(value) else None
+        return '' if value is None else f'{value:.2f}'
+
+    def set_rows(self, rows) -> None:
+        """Замена всех строк итогов"""
+        self.beginResetModel()
+        self._rows = list(rows)
+        self.endResetModel()
+
+    def row(self, row):
+        return self._rows[row]
+
+
+ACTION_COLUMNS = ('Действие', 'Время/мс', 'SQL', 'SQL/мс', 'Строк', 'Отрисовка/мс')
+
+
+class ActionTableModel(QtCore.QAbstractTableModel):
+    """Модель панели отладки: строка на замер действия (см. data.instrumentation), последние сверху"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._records = []
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._records)
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(ACTION_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return ACTION_COLUMNS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignLeft | Qt.AlignVCenter if index.column() == 0 else Qt.AlignRight | Qt.AlignVCenter
+        if role != Qt.DisplayRole:
+            return None
+        record, column = self._records[index.row()], index.column()
+        value = (record.name, record.duration * 1000, record.count, record.elapsed * 1000, record.rows,
+                 record.repaint * 1000)[column]
+        return f'{value:.1f}' if isinstance(value, float) else str(value)
+
+    def set_records(self, records) -> None:
+        """Замена всех строк замерами records (в порядке выполнения)"""
+        self.beginResetModel()
+        self._records = list(reversed(records))
+        self.endResetModel()
+
+    def record(self, row):
+        return self._records[row]
+
+
+class PriceDelegate(QtWidgets.QStyledItemDelegate):
+    """Отрисовка цены (вместо QDoubleSpinBox в каждой ячейке)"""
+
+    def displayText(self, value, locale) -> str:
+        try:
+            return f'{float(value):.2f}'
+        except (TypeError, ValueError):
+            return str(value)
+
+
+class DateDelegate(QtWidgets.QStyledItemDelegate):
+    """Отрисовка даты покупки (вместо QDateEdit в каждой ячейке)"""
+
+    def displayText(self, value, locale) -> str:
+        if isinstance(value, QtCore.QDate):
+            return value.toString('dd.MM.yyyy')
+        if isinstance(value, datetime.date):
+            return value.strftime('%d.%m.%Y')
+        return str(value)
+
+
+class CheckBoxDelegate(QtWidgets.QStyledItemDelegate):
+    """Отрисовка и переключение чекбокса по центру ячейки (вместо QCheckBox в каждой ячейке)"""
+
+    def paint(self, painter, option, index) -> None:
+        opt = QtWidgets.QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        style = opt.widget.style() if opt.widget else QtWidgets.QApplication.style()
+        opt.features &= ~QtWidgets.QStyleOptionViewItem.HasCheckIndicator
+        style.drawControl(QtWidgets.QStyle.CE_ItemViewItem, opt, painter, opt.widget)  # фон строки
+        check = QtWidgets.QStyleOptionViewItem(opt)
+        check.rect = self._check_rect(opt, style)
+        check.state = check.state & ~QtWidgets.QStyle.State_HasFocus
+        check.state |= QtWidgets.QStyle.State_On if index.data(Qt.CheckStateRole) == Qt.Checked \
+            else QtWidgets.QStyle.State_Off
+        style.drawPrimitive(QtWidgets.QStyle.PE_IndicatorItemViewItemCheck, check, painter, opt.widget)
+
+    def editorEvent(self, event, model, option, index) -> bool:
+        if not index.flags() & Qt.ItemIsUserCheckable:
+            return False
+        if event.type() == QtCore.QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            style = option.widget.style() if option.widget else QtWidgets.QApplication.style()
+            if not self._check_rect(option, style).contains(event.pos()):
+                return False
+        elif event.type() == QtCore.QEvent.MouseButtonDblClick:
+            return True  # двойной клик не должен переключать состояние дважды
+        elif not (event.type() == QtCore.QEvent.KeyPress and event.key() in (Qt.Key_Space, Qt.Key_Select)):
+            return False
+        state = Qt.Unchecked if index.data(Qt.CheckStateRole) == Qt.Checked else Qt.Checked
+        return model.setData(index, state, Qt.CheckStateRole)
+
+    @staticmethod
+    def _check_rect(option, style) -> QtCore.QRect:
+        """Прямоугольник чекбокса, выровненный по центру ячейки"""
+        opt = QtWidgets.QStyleOptionViewItem(option)
+        opt.features |= QtWidgets.QStyleOptionViewItem.HasCheckIndicator
+        size = style.subElementRect(QtWidgets.QStyle.SE_ItemViewItemCheckIndicator, opt, opt.widget).size()
+        return QtWidgets.QStyle.alignedRect(option.direction, Qt.AlignCenter, size, option.rect)